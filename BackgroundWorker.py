@@ -0,0 +1,126 @@
+"""
+Off-UI-thread execution for GUI actions.
+
+Calls run on a single worker thread, so actions still take effect in the
+order they were clicked. Results are handed back on the UI thread by a
+poll loop driven by the toolkit's timer (tkinter's root.after); this
+module does not import Tk itself.
+
+Requests submitted on a channel supersede the previous request of that
+channel: one that has not started yet is cancelled, one already running
+is left to finish but its result is dropped.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import threading
+
+
+class BackgroundWorker:
+    """
+    Runs callables off the UI thread and delivers their results on it.
+
+    Args:
+        schedule (callable): schedule(delay_ms, callback) on the UI thread,
+            e.g. root.after.
+        poll_ms (int): Interval between deliveries of finished results.
+    """
+
+    def __init__(self, schedule, poll_ms=50):
+        self._schedule = schedule
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ui-worker")
+        # (channel, future, on_done, on_error) of finished requests, in completion order
+        self._finished = queue.SimpleQueue()
+        # channel -> Future of its newest request
+        self._latest = {}
+        # Submitted requests not yet taken off _finished; polling stops at zero
+        self._outstanding = 0
+        self._lock = threading.Lock()
+        self._polling = False
+        self._closed = False
+
+    def submit(self, fn, *args, channel=None, on_done=None, on_error=None):
+        """
+        Run fn(*args) on the worker thread.
+
+        on_done(result) or on_error(exception) is called on the UI thread,
+        unless the request was cancelled or superseded on its channel.
+
+        Returns:
+            Future: The pending call.
+        """
+        with self._lock:
+            future = self._executor.submit(fn, *args)
+            self._outstanding += 1
+            previous = self._latest.get(channel) if channel is not None else None
+            if channel is not None:
+                self._latest[channel] = future
+        if previous is not None:
+            previous.cancel()
+        future.add_done_callback(
+            lambda f: self._finished.put((channel, f, on_done, on_error))
+        )
+        self.start()
+        return future
+
+    def cancel(self, channel):
+        """Drop the pending request of channel, cancelling it if it has not started."""
+        with self._lock:
+            future = self._latest.pop(channel, None)
+        if future is not None:
+            future.cancel()
+
+    def is_busy(self, channel):
+        """Return True if channel has a request whose result has not been delivered."""
+        return channel in self._latest
+
+    # ---------------- UI thread ----------------
+    def start(self):
+        """Start the delivery poll loop (idempotent; must be called on the UI thread)."""
+        if not self._polling and not self._closed:
+            self._polling = True
+            self._schedule(self.poll_ms, self.poll)
+
+    def poll(self):
+        """Deliver every finished result, then schedule the next poll while work is pending."""
+        self._polling = False
+        try:
+            while True:
+                try:
+                    channel, future, on_done, on_error = self._finished.get_nowait()
+                except queue.Empty:
+                    break
+                with self._lock:
+                    self._outstanding -= 1
+                if not self._claim(channel, future):
+                    continue
+                error = future.exception()
+                if error is None:
+                    if on_done:
+                        on_done(future.result())
+                elif on_error:
+                    on_error(error)
+                else:
+                    raise error
+        finally:
+            if self._outstanding:
+                self.start()
+
+    def _claim(self, channel, future):
+        """Return True if future's result should be delivered (not cancelled or superseded)."""
+        if future.cancelled() or self._closed:
+            return False
+        if channel is None:
+            return True
+        with self._lock:
+            if self._latest.get(channel) is not future:
+                return False
+            del self._latest[channel]
+        return True
+
+    def shutdown(self):
+        """Cancel queued requests and stop delivering results; a running call finishes on its own."""
+        self._closed = True
+        with self._lock:
+            self._latest.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,7 +1,41 @@
-from datetime import datetime
+from datetime import datetime, timezone, timedelta
 import math
 import Config
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; calculate_batch falls back to the scalar path
+    np = None
+
+_EPOCH_NAIVE = datetime(1970, 1, 1)
+_EPOCH_AWARE = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def _to_epoch_microseconds(times):
+    """Convert datetimes or a datetime64 array to an int64 array of epoch microseconds."""
+    if isinstance(times, np.ndarray) and np.issubdtype(times.dtype, np.datetime64):
+        return times.astype("datetime64[us]").astype(np.int64)
+    return np.fromiter(
+        ((t - (_EPOCH_NAIVE if t.tzinfo is None else _EPOCH_AWARE)) // _ONE_MICROSECOND for t in times),
+        dtype=np.int64
+    )
+
+
+def _round2(values):
+    """
+    Vectorized round(x, 2) matching Python's round() exactly.
+
+    np.round scales by 100 first, which can flip results that sit within
+    float error of a half-cent tie; those few elements use Python's round().
+    """
+    scaled = values * 100
+    rounded = np.round(values, 2)
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_tie):
+        rounded[i] = round(float(values[i]), 2)
+    return rounded
+
 class ParkingBillingService:
     def __init__(self):
         self.hourly_rate = Config.PARKING_RATE_PER_HOUR
@@ -11,6 +45,13 @@ class ParkingBillingService:
         hours = math.ceil(duration_seconds / 3600)
         return hours * self.hourly_rate
 
+    def calculate_batch(self, start_times, end_times):
+        """Vectorized calculate(): parking fee for arrays of start/end times."""
+        duration_us = _to_epoch_microseconds(end_times) - _to_epoch_microseconds(start_times)
+        # Same float steps as timedelta.total_seconds() / 3600 in the scalar path
+        hours = np.ceil(duration_us / 1e6 / 3600)
+        return hours * self.hourly_rate
+
 
 class ChargingBillingService:
     def __init__(self):
@@ -19,6 +60,10 @@ class ChargingBillingService:
     def calculate(self, kwh_delivered: float) -> float:
         return round(kwh_delivered * self.rate_per_kwh, 2)
 
+    def calculate_batch(self, kwh_delivered):
+        """Vectorized calculate(): charging fee for an array of kWh values."""
+        return _round2(np.asarray(kwh_delivered, dtype=np.float64) * self.rate_per_kwh)
+
 
 class ExitBillingService:
     def __init__(self):
@@ -42,3 +87,38 @@ class ExitBillingService:
             "charging_fee": charging_fee,
             "total": parking_fee + charging_fee
         }
+
+    def calculate_batch(self, start_times, end_times, kwh, is_ev):
+        """
+        Bill many sessions at once, e.g. for nightly reconciliation.
+
+        Args:
+            start_times, end_times: Sequences of datetimes or datetime64 arrays.
+            kwh: kWh delivered per session (ignored where is_ev is False).
+            is_ev: Per-session EV flags.
+
+        Returns:
+            dict: 'parking_fee', 'charging_fee' and 'total' arrays, element-wise
+            equal to calculate_total(). Lists are returned when NumPy is not installed.
+        """
+        if np is None:
+            parking = [self.parking_billing.calculate(s, e) for s, e in zip(start_times, end_times)]
+            charging = [
+                self.charging_billing.calculate(k) if ev else 0.0
+                for k, ev in zip(kwh, is_ev)
+            ]
+            return {
+                "parking_fee": parking,
+                "charging_fee": charging,
+                "total": [p + c for p, c in zip(parking, charging)]
+            }
+
+        parking = self.parking_billing.calculate_batch(start_times, end_times)
+        is_ev = np.asarray(is_ev, dtype=bool)
+        kwh = np.where(is_ev, np.asarray(kwh, dtype=np.float64), 0.0)
+        charging = np.where(is_ev, self.charging_billing.calculate_batch(kwh), 0.0)
+        return {
+            "parking_fee": parking,
+            "charging_fee": charging,
+            "total": parking + charging
+        }
@@ -0,0 +1,336 @@
+"""
+Fixed-layout binary snapshot of the parking lot.
+
+The file can be mmap'ed by SnapshotView, which answers occupancy queries
+straight from the mapped bytes without building any domain objects.
+
+Layout (little-endian, sections 8-byte aligned):
+    header     HEADER
+    levels     n_levels    x LEVEL
+    slots      slots_total x int32   vehicle row per slot, -1 when free
+                                      (per level: regular slots, then EV slots)
+    vehicles   n_vehicles  x VEHICLE
+    sessions   n_sessions  x SESSION
+    strings    (n_strings + 1) x uint32 offsets, then UTF-8 bytes
+"""
+from array import array
+import math
+import mmap
+import struct
+import sys
+
+from CompactStorage import VEHICLE_TYPES
+
+MAGIC = b"EPSNAP\x00\x01"
+# 2: sessions carry the charger rating (max_rate_kw); version 1 files are still read
+FORMAT_VERSION = 2
+
+# magic, version, n_levels, n_vehicles, n_sessions, n_strings, last_seq, slots_total,
+# offsets of levels, slots, vehicles, sessions, strings
+HEADER = struct.Struct("<8sIIIIIQQQQQQQ")
+# city, site, level_number, num_regular, num_ev, chargers, flags (LEVEL_COMPACT | LEVEL_POOLED),
+# occupied_regular, occupied_ev, slot_base
+LEVEL = struct.Struct("<IIiiiiBiiQ")
+# regnum, make, model, color, type code, is_ev, level index, slot_number,
+# start_ts, battery_capacity_kwh, charge_kwh, kwh_delivered_this_session
+VEHICLE = struct.Struct("<IIIIbBIidddd")
+# charger_id, vehicle row, slot_number, start_ts, last_update_ts, kwh_delivered, rate_kw,
+# max_rate_kw (NaN when unknown)
+SESSION = struct.Struct("<IIiddddd")
+SESSION_V1 = struct.Struct("<IIidddd")  # without max_rate_kw
+LEVEL_COMPACT = 1
+LEVEL_POOLED = 2
+_SLOT = struct.Struct("<i")
+_U32 = struct.Struct("<I")
+
+_TYPE_CODES = {cls.__name__: code for code, cls in enumerate(VEHICLE_TYPES)}
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def encode_state(state):
+    """
+    Encode a ParkingPersistence state dict into the binary snapshot layout.
+
+    Returns:
+        bytes: The complete snapshot file contents.
+    """
+    strings = {}
+
+    def sid(value):
+        index = strings.get(value)
+        if index is None:
+            index = strings[value] = len(strings)
+        return index
+
+    level_index = {}
+    level_bases = []
+    slots_total = 0
+    for i, spec in enumerate(state["levels"]):
+        level_index[(spec["city_name"], spec["site_name"], spec["level_number"])] = i
+        level_bases.append(slots_total)
+        slots_total += spec["num_regular"] + spec["num_ev"]
+
+    slots = array("i", [-1]) * slots_total
+    occupied = [[0, 0] for _ in state["levels"]]
+    vehicle_rows = {}
+    vehicles = bytearray()
+    for row, (regnum, record) in enumerate(state["vehicles"].items()):
+        li = level_index[(record["city_name"], record["site_name"], record["level_number"])]
+        spec = state["levels"][li]
+        is_ev = bool(record["is_ev"])
+        offset = spec["num_regular"] if is_ev else 0
+        slots[level_bases[li] + offset + record["slot_number"] - 1] = row
+        occupied[li][is_ev] += 1
+        vehicle_rows[regnum] = row
+        try:
+            type_code = _TYPE_CODES[record["vehicle_type"]]
+        except KeyError:
+            raise ValueError(f"Vehicle type {record['vehicle_type']} cannot be snapshotted") from None
+        vehicles += VEHICLE.pack(
+            sid(regnum), sid(record["make"]), sid(record["model"]), sid(record["color"]),
+            type_code, is_ev, li, record["slot_number"], record["start_ts"],
+            record.get("battery_capacity_kwh", 0.0), record.get("charge_kwh", 0.0),
+            record.get("kwh_delivered_this_session", 0.0)
+        )
+
+    levels = bytearray()
+    for i, spec in enumerate(state["levels"]):
+        levels += LEVEL.pack(
+            sid(spec["city_name"]), sid(spec["site_name"]), spec["level_number"],
+            spec["num_regular"], spec["num_ev"], spec["chargers"],
+            (LEVEL_COMPACT if spec.get("compact") else 0) | (LEVEL_POOLED if spec.get("pooled_chargers") else 0),
+            occupied[i][0], occupied[i][1], level_bases[i]
+        )
+
+    sessions = bytearray()
+    n_sessions = 0
+    for charger_id, spec in state["sessions"].items():
+        row = vehicle_rows.get(spec["regnum"])
+        if row is None:
+            continue
+        sessions += SESSION.pack(
+            sid(charger_id), row, spec["slot_number"], spec["start_ts"],
+            spec["last_update_ts"], spec["kwh_delivered"], spec["rate_kw"],
+            spec.get("max_rate_kw", math.nan)
+        )
+        n_sessions += 1
+
+    encoded = [value.encode("utf-8") for value in strings]
+    string_offsets = array("I", [0])
+    for value in encoded:
+        string_offsets.append(string_offsets[-1] + len(value))
+
+    if sys.byteorder == "big":
+        slots.byteswap()
+        string_offsets.byteswap()
+
+    sections = [levels, slots.tobytes(), vehicles, sessions,
+                string_offsets.tobytes() + b"".join(encoded)]
+    offsets = []
+    position = _align(HEADER.size)
+    for section in sections:
+        offsets.append(position)
+        position = _align(position + len(section))
+
+    out = bytearray(position)
+    out[:HEADER.size] = HEADER.pack(
+        MAGIC, FORMAT_VERSION, len(state["levels"]), len(vehicle_rows), n_sessions,
+        len(strings), state["last_seq"], slots_total, *offsets
+    )
+    for offset, section in zip(offsets, sections):
+        out[offset:offset + len(section)] = section
+    return bytes(out)
+
+
+class SnapshotView:
+    """
+    Read-only view of a binary snapshot through mmap.
+
+    Occupancy and slot queries read the mapped bytes directly, so a
+    restarted process can answer them before the domain is rebuilt.
+    to_state() decodes the whole snapshot for ParkingPersistence.rebuild_state.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.n_levels, self.n_vehicles, self.n_sessions, self.n_strings,
+         self.last_seq, self.slots_total, self._off_levels, self._off_slots,
+         self._off_vehicles, self._off_sessions, self._off_strings) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version not in (1, FORMAT_VERSION):
+            self.close()
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} parking snapshot")
+        self._session = SESSION if version == FORMAT_VERSION else SESSION_V1
+        self._string_data = self._off_strings + (self.n_strings + 1) * _U32.size
+        self._level_index = None
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------------- Raw records ----------------
+    def string(self, index):
+        start, end = struct.unpack_from("<II", self._map, self._off_strings + index * _U32.size)
+        return self._map[self._string_data + start:self._string_data + end].decode("utf-8")
+
+    def _level(self, index):
+        return LEVEL.unpack_from(self._map, self._off_levels + index * LEVEL.size)
+
+    def _vehicle(self, row):
+        return VEHICLE.unpack_from(self._map, self._off_vehicles + row * VEHICLE.size)
+
+    def _slot_row(self, position):
+        return _SLOT.unpack_from(self._map, self._off_slots + position * _SLOT.size)[0]
+
+    def _find_level(self, city_name, site_name, level_number):
+        if self._level_index is None:
+            self._level_index = {}
+            for i in range(self.n_levels):
+                city, site, number = self._level(i)[:3]
+                self._level_index[(self.string(city), self.string(site), number)] = i
+        try:
+            return self._level_index[(city_name, site_name, level_number)]
+        except KeyError:
+            raise KeyError(f"Level {level_number} not found at {city_name}/{site_name}") from None
+
+    def _vehicle_info(self, row):
+        regnum, make, model, color, type_code = self._vehicle(row)[:5]
+        return {
+            "regnum": self.string(regnum),
+            "make": self.string(make),
+            "model": self.string(model),
+            "color": self.string(color),
+            "type": VEHICLE_TYPES[type_code].__name__
+        }
+
+    # ---------------- Queries ----------------
+    def level_keys(self):
+        """Return (city_name, site_name, level_number) for every level."""
+        keys = []
+        for i in range(self.n_levels):
+            city, site, number = self._level(i)[:3]
+            keys.append((self.string(city), self.string(site), number))
+        return keys
+
+    def get_occupancy(self, city_name, site_name, level_number):
+        """
+        Returns slot counts of a level.
+
+        Returns:
+            dict: Occupied and free regular / EV slot counts.
+        """
+        record = self._level(self._find_level(city_name, site_name, level_number))
+        num_regular, num_ev = record[3], record[4]
+        occupied_regular, occupied_ev = record[7], record[8]
+        return {
+            "regular_occupied": occupied_regular,
+            "regular_free": num_regular - occupied_regular,
+            "ev_occupied": occupied_ev,
+            "ev_free": num_ev - occupied_ev
+        }
+
+    def get_vehicle_in_slot(self, city_name, site_name, level_number, slot_number, is_ev=False):
+        """Return vehicle details for a slot, or None if it is free."""
+        record = self._level(self._find_level(city_name, site_name, level_number))
+        num_regular, num_ev, base = record[3], record[4], record[9]
+        if not 1 <= slot_number <= (num_ev if is_ev else num_regular):
+            return None
+        row = self._slot_row(base + (num_regular if is_ev else 0) + slot_number - 1)
+        return None if row < 0 else self._vehicle_info(row)
+
+    def get_parking_status(self, city_name, site_name, level_number):
+        """
+        Same result shape as ParkingLot.get_parking_status.
+
+        Returns:
+            dict: {'regular': [...], 'ev': [...]}, each with vehicle details.
+        """
+        try:
+            record = self._level(self._find_level(city_name, site_name, level_number))
+        except KeyError:
+            return {"regular": [], "ev": []}
+        num_regular, num_ev, base = record[3], record[4], record[9]
+        status = {"regular": [], "ev": []}
+        for key, offset, count in (("regular", 0, num_regular), ("ev", num_regular, num_ev)):
+            for slot_number in range(1, count + 1):
+                row = self._slot_row(base + offset + slot_number - 1)
+                if row >= 0:
+                    info = self._vehicle_info(row)
+                    info["slot"] = slot_number
+                    status[key].append(info)
+        return status
+
+    def to_state(self):
+        """Decode the snapshot into a ParkingPersistence state dict."""
+        levels = []
+        for i in range(self.n_levels):
+            city, site, number, num_regular, num_ev, chargers, flags = self._level(i)[:7]
+            levels.append({
+                "city_name": self.string(city),
+                "site_name": self.string(site),
+                "level_number": number,
+                "num_regular": num_regular,
+                "num_ev": num_ev,
+                "chargers": chargers,
+                "compact": bool(flags & LEVEL_COMPACT),
+                "pooled_chargers": bool(flags & LEVEL_POOLED)
+            })
+
+        vehicles = {}
+        regnums = []
+        for row, values in enumerate(VEHICLE.iter_unpack(
+                self._map[self._off_vehicles:self._off_vehicles + self.n_vehicles * VEHICLE.size])):
+            (regnum, make, model, color, type_code, is_ev, li, slot_number,
+             start_ts, capacity, charge, session_kwh) = values
+            level = levels[li]
+            record = {
+                "make": self.string(make),
+                "model": self.string(model),
+                "color": self.string(color),
+                "vehicle_type": VEHICLE_TYPES[type_code].__name__,
+                "city_name": level["city_name"],
+                "site_name": level["site_name"],
+                "level_number": level["level_number"],
+                "slot_number": slot_number,
+                "is_ev": bool(is_ev),
+                "start_ts": start_ts
+            }
+            if is_ev:
+                record["battery_capacity_kwh"] = capacity
+                record["charge_kwh"] = charge
+                record["kwh_delivered_this_session"] = session_kwh
+            regnums.append(self.string(regnum))
+            vehicles[regnums[-1]] = record
+
+        sessions = {}
+        session = self._session
+        for values in session.iter_unpack(
+                self._map[self._off_sessions:self._off_sessions + self.n_sessions * session.size]):
+            charger, row, slot_number, start_ts, last_update_ts, kwh_delivered, rate_kw = values[:7]
+            spec = sessions[self.string(charger)] = {
+                "regnum": regnums[row],
+                "slot_number": slot_number,
+                "start_ts": start_ts,
+                "last_update_ts": last_update_ts,
+                "kwh_delivered": kwh_delivered,
+                "rate_kw": rate_kw
+            }
+            if len(values) > 7 and not math.isnan(values[7]):
+                spec["max_rate_kw"] = values[7]
+
+        return {
+            "version": FORMAT_VERSION,
+            "last_seq": self.last_seq,
+            "levels": levels,
+            "vehicles": vehicles,
+            "sessions": sessions
+        }
@@ -1,10 +1,126 @@
 from datetime import datetime, timezone
+import threading
+
+import Config
+from ChargingScheduler import ChargingScheduler
+from ChargerStateTable import ChargerStateTable, IDLE, STOPPED
+from DomainEvents import EventBus
+from Instrumentation import Instrumentation, instrumented
+from PowerBudget import allocate
+
+
+class ChargingSession:
+    """
+    Slotted record of one charging session.
+
+    Supports the mapping accessors of the former session dict
+    (session["status"], session.get("vehicle_reg")); vehicle_reg and
+    session_id are derived from the vehicle instead of being stored, and
+    last_update is formatted from the state table's epoch only when read.
+    """
+    __slots__ = ("vehicle", "slot", "start_time", "_last_update", "kwh_delivered",
+                 "rate_kw", "max_rate_kw", "handle", "table", "status", "end_time")
+
+    def __init__(self, vehicle, slot, start_time, rate_kw, handle, status="charging", max_rate_kw=None,
+                 table=None):
+        self.vehicle = vehicle
+        self.slot = slot
+        self.start_time = start_time        # ISO-8601
+        self.table = table                  # ChargerStateTable holding the row
+        self._last_update = None if table is not None else start_time
+        self.kwh_delivered = 0.0
+        self.rate_kw = rate_kw              # current rate, lowered under a site power budget
+        self.max_rate_kw = rate_kw if max_rate_kw is None else max_rate_kw
+        self.handle = handle                # row in ChargerStateTable
+        self.status = status                # charging | full | stopped
+        self.end_time = None
+
+    @property
+    def last_update(self):
+        """ISO-8601 time of the last kWh update, formatted from the state table on demand."""
+        if self._last_update is not None:
+            return self._last_update
+        return datetime.fromtimestamp(float(self.table.last_update[self.handle]), timezone.utc).isoformat()
+
+    @last_update.setter
+    def last_update(self, value):
+        self._last_update = value
+
+    def detach(self):
+        """Freeze last_update once the session's table row may be reused by the charger."""
+        self._last_update = self.last_update
+
+    @property
+    def vehicle_reg(self):
+        return self.vehicle.get_regnum()
+
+    @property
+    def session_id(self):
+        return f"S-{self.vehicle.get_regnum()}"
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if isinstance(key, str) else default
+
+    def __contains__(self, key):
+        return isinstance(key, str) and hasattr(self, key)
+
+    def __repr__(self):
+        return (f"ChargingSession(vehicle_reg={self.vehicle_reg!r}, slot={self.slot}, "
+                f"status={self.status!r}, kwh_delivered={self.kwh_delivered})")
 
 
 class ChargerController:
-    def __init__(self):
-        # charger_id -> session dict
+    def __init__(self, clock=None, events=None, instruments=None):
+        # charger_id -> ChargingSession
         self.charger_usage = {}
+        # Numeric session state (rate, kWh, headroom, last update epoch) per charger handle
+        self.state_table = ChargerStateTable()
+        self.scheduler = ChargingScheduler(clock)
+        self.clock = self.scheduler.clock
+        # Called with charger_id after a session completes and the charger is released
+        self.on_charger_released = None
+        # Called with (charger_id, session, state) when the EV on a charger starts
+        # charging ("charging"), fills up ("full") or is stopped early ("waiting").
+        # Runs under the charger lock, so it must only take leaf locks.
+        self.on_session_state = None
+        # charging_started / charging_rate_changed / charging_stopped / charging_full /
+        # charger_released events
+        self.events = events if events is not None else EventBus()
+        self.instruments = instruments if instruments is not None else Instrumentation()
+        # charger_id -> RLock serializing that charger's session lifecycle
+        self._charger_locks = {}
+        self._charger_locks_guard = threading.Lock()
+        # charger_id -> SitePowerBudget of the charger's site, if capped
+        self.power_budgets = {}
+
+    def charger_lock(self, charger_id):
+        """Return the lock of charger_id, creating it on first use."""
+        lock = self._charger_locks.get(charger_id)
+        if lock is None:
+            with self._charger_locks_guard:
+                lock = self._charger_locks.setdefault(charger_id, threading.RLock())
+        return lock
+
+    def _notify_released(self, charger_id):
+        """
+        Run the on_charger_released callback. Always called with the charger
+        lock released, because the callback takes the level lock.
+        """
+        if self.on_charger_released:
+            self.on_charger_released(charger_id)
+
+    def _notify_state(self, charger_id, session, state):
+        if self.on_session_state:
+            self.on_session_state(charger_id, session, state)
 
     def get_charger_status(self, charger_id):
         session = self.charger_usage.get(charger_id)
@@ -17,7 +133,7 @@ class ChargerController:
             }
 
         charger_status = (
-            "charging" if session["status"] == "charging"
+            "charging" if session.status == "charging"
             else "occupied"   # full or stopped but still plugged
         )
 
@@ -27,73 +143,400 @@ class ChargerController:
             "current_session": session
         }
 
-    def start_charging(self, charger_id, vehicle, slot_number):
-        if charger_id in self.charger_usage:
-            raise Exception(f"Charger {charger_id} already in use")
-
-        now = datetime.now(timezone.utc)
-
-        session = {
-            "session_id": f"S-{vehicle.get_regnum()}",
-            "vehicle": vehicle,                     # 🔥 required
-            "vehicle_reg": vehicle.get_regnum(),
-            "slot": slot_number,
-            "start_time": now.isoformat(),
-            "last_update": now.isoformat(),
-            "kwh_delivered": 0.0,
-            "status": "charging"                    # charging | full | stopped
-        }
+    def start_charging(self, charger_id, vehicle, slot_number, rate_kw=None):
+        with self.charger_lock(charger_id):
+            if charger_id in self.charger_usage:
+                raise Exception(f"Charger {charger_id} already in use")
+
+            now = self.clock()
+            rate_kw = Config.CHARGER_RATE_KW if rate_kw is None else rate_kw
+            ev = vehicle.ev_behavior
+            headroom = ev.battery_capacity_kwh - ev.charge_kwh
+            budget = self.power_budgets.get(charger_id)
+            # Under a power budget the session starts idle and gets its share below
+            opening_rate = 0.0 if budget else rate_kw
+
+            session = ChargingSession(
+                vehicle=vehicle,
+                slot=slot_number,
+                start_time=now.isoformat(),
+                rate_kw=opening_rate,
+                handle=self.state_table.open_session(charger_id, opening_rate, headroom, now.timestamp()),
+                max_rate_kw=rate_kw,
+                table=self.state_table
+            )
+
+            self.charger_usage[charger_id] = session
+            if budget:
+                self._join_budget(budget, charger_id, session, now)
+            self._schedule_completion(charger_id, session, now)
+            self._notify_state(charger_id, session, "charging")
+            if self.events:
+                self.events.publish(
+                    "charging_started",
+                    charger_id=charger_id,
+                    regnum=vehicle.get_regnum(),
+                    slot_number=slot_number,
+                    rate_kw=session.rate_kw,
+                    max_rate_kw=session.max_rate_kw,
+                    charge_kwh=ev.charge_kwh,
+                    ts=now.timestamp()
+                )
+
+    def restore_session(self, charger_id, vehicle, slot_number, start_time, last_update,
+                        kwh_delivered, rate_kw, max_rate_kw=None):
+        """
+        Re-open a charging session after recovery without emitting events.
 
+        The vehicle's EVBehavior must already hold the charge as of last_update;
+        charging resumes from last_update. max_rate_kw is the journaled charger
+        rating; None (records written before it was journaled) assumes
+        Config.CHARGER_RATE_KW.
+        """
+        if max_rate_kw is None:
+            max_rate_kw = max(rate_kw, Config.CHARGER_RATE_KW)
+        ev = vehicle.ev_behavior
+        table = self.state_table
+        with table.lock:
+            handle = table.open_session(
+                charger_id, rate_kw, ev.battery_capacity_kwh - ev.charge_kwh, last_update.timestamp()
+            )
+            table.kwh[handle] = kwh_delivered
+            table.kwh_synced[handle] = kwh_delivered
+        session = ChargingSession(vehicle, slot_number, start_time.isoformat(), rate_kw, handle,
+                                  max_rate_kw=max_rate_kw, table=table)
+        session.kwh_delivered = round(kwh_delivered, 3)
         self.charger_usage[charger_id] = session
+        budget = self.power_budgets.get(charger_id)
+        if budget:
+            self._join_budget(budget, charger_id, session, last_update)
+        self._schedule_completion(charger_id, session, last_update)
+        self._notify_state(charger_id, session, "charging")
+        return session
 
-    def update_kwh(self, charger_id, rate_kw=7):
-        session = self.charger_usage.get(charger_id)
-        if not session or session["status"] != "charging":
+    def _publish_session_event(self, event_type, charger_id, session, now):
+        self.events.publish(
+            event_type,
+            charger_id=charger_id,
+            regnum=session.vehicle_reg,
+            kwh_delivered=float(self.state_table.kwh[session.handle]),
+            charge_kwh=session.vehicle.ev_behavior.charge_kwh,
+            kwh_delivered_this_session=session.vehicle.ev_behavior.kwh_delivered_this_session,
+            ts=now.timestamp()
+        )
+
+    def _schedule_completion(self, charger_id, session, from_time):
+        """Project when the session's battery will be full and schedule it."""
+        table = self.state_table
+        handle = session.handle
+        # Under the table lock, so a concurrent power rebalance cannot schedule
+        # from a different rate in between
+        with table.lock:
+            self.scheduler.schedule(
+                charger_id,
+                ChargingScheduler.project_full_time(
+                    from_time, float(table.headroom[handle]), float(table.rate[handle])
+                )
+            )
+
+    # ---------------- Site power budgets ----------------
+    def set_power_budget(self, charger_ids, budget):
+        """
+        Put chargers under a SitePowerBudget (None lifts the cap) and
+        reallocate the rates of their active sessions.
+        """
+        now = self.clock()
+        charger_ids = list(charger_ids)
+        previous = {self.power_budgets.get(charger_id) for charger_id in charger_ids} - {None, budget}
+        for charger_id in charger_ids:
+            if budget is None:
+                self.power_budgets.pop(charger_id, None)
+            else:
+                self.power_budgets[charger_id] = budget
+        for old in previous:
+            with old.lock:
+                for charger_id in charger_ids:
+                    old.active.pop(charger_id, None)
+                    old.rates.pop(charger_id, None)
+                self._rebalance(old, now)
+
+        if budget is None:
+            # Uncapped sessions go back to their charger's rating
+            for charger_id in charger_ids:
+                session = self.charger_usage.get(charger_id)
+                if session and session.status == "charging":
+                    self._apply_rate(charger_id, session, session.max_rate_kw, now)
             return
+        with budget.lock:
+            for charger_id in charger_ids:
+                session = self.charger_usage.get(charger_id)
+                if session and session.status == "charging":
+                    budget.active[charger_id] = session.max_rate_kw
+            self._rebalance(budget, now)
 
-        last_update = datetime.fromisoformat(session["last_update"])
-        now = datetime.now(timezone.utc)
+    def _join_budget(self, budget, charger_id, session, now):
+        """Add a starting session to its site's budget; its own rate change is not published."""
+        with budget.lock:
+            budget.active[charger_id] = session.max_rate_kw
+            self._rebalance(budget, now, quiet=charger_id)
 
-        elapsed_hours = (now - last_update).total_seconds() / 3600
-        if elapsed_hours <= 0:
+    def _leave_budget(self, charger_id, now):
+        """Hand a stopped session's power back to the rest of its site."""
+        budget = self.power_budgets.get(charger_id)
+        if budget is None:
             return
+        with budget.lock:
+            if budget.active.pop(charger_id, None) is None:
+                return
+            budget.rates.pop(charger_id, None)
+            self._rebalance(budget, now)
 
-        added_kwh = elapsed_hours * rate_kw
+    def _rebalance(self, budget, now, quiet=None, always=None):
+        """
+        Reallocate a site's power across its active sessions. Caller holds
+        budget.lock. Takes no charger locks: rates are switched in the state
+        table, so this may run under any charger lock. The quiet charger's
+        change is not published; the always charger's is, even if unchanged.
 
-        # EV decides how much energy it can accept
-        accepted = session["vehicle"].ev_behavior.add_charge(added_kwh)
+        A session that fills up by now refuses a new rate and keeps drawing
+        its current one until its completion fires; it is pinned at that
+        rate and the rest of the cap is allocated again without it.
+        """
+        table = self.state_table
+        pinned = {}  # charger_id -> rate kept by a finishing session
+        while True:
+            demands = []
+            with table.lock:
+                for charger_id, max_kw in budget.active.items():
+                    session = self.charger_usage.get(charger_id)
+                    if session is None or charger_id in pinned:
+                        continue
+                    ev = session.vehicle.ev_behavior
+                    capacity = ev.battery_capacity_kwh
+                    soc = 1.0 - float(table.headroom[session.handle]) / capacity if capacity > 0 else 1.0
+                    departure = ev.departure_time
+                    demands.append((charger_id, max_kw, departure.timestamp() if departure else None, soc))
+            limit_kw = budget.limit_kw
+            if limit_kw is not None:
+                limit_kw = max(0.0, limit_kw - sum(pinned.values()))
+            rates = allocate(limit_kw, demands, budget.policy)
+            budget.rebalances += 1
 
-        session["kwh_delivered"] = round(
-            session["kwh_delivered"] + accepted, 3
-        )
-        session["last_update"] = now.isoformat()
+            refused = False
+            for charger_id, rate_kw in rates.items():
+                if charger_id != always and abs(budget.rates.get(charger_id, -1.0) - rate_kw) < 1e-9:
+                    continue
+                session = self.charger_usage.get(charger_id)
+                if session is None:
+                    continue
+                if self._apply_rate(charger_id, session, rate_kw, now, publish=charger_id != quiet):
+                    budget.rates[charger_id] = rate_kw
+                    continue
+                with table.lock:
+                    pinned[charger_id] = float(table.rate[session.handle])
+                budget.rates[charger_id] = pinned[charger_id]
+                refused = True
+                break
+            if not refused:
+                return
 
-        # Auto stop when full
-        if session["vehicle"].ev_behavior.is_fully_charged():
-            session["status"] = "full"
-            session["end_time"] = now.isoformat()
-            charger_id_copy = charger_id  # safety
+    def _apply_rate(self, charger_id, session, rate_kw, now, publish=True):
+        """Switch a charging session to rate_kw from now on; returns False if it is finishing."""
+        table = self.state_table
+        with table.lock:
+            if not table.set_rate(session.handle, rate_kw, now.timestamp()):
+                return False
+            session.rate_kw = rate_kw
+            kwh = float(table.kwh[session.handle])
+            self._schedule_completion(charger_id, session, now)
+        if publish and self.events:
+            self.events.publish(
+                "charging_rate_changed",
+                charger_id=charger_id,
+                regnum=session.vehicle_reg,
+                rate_kw=rate_kw,
+                max_rate_kw=session.max_rate_kw,
+                kwh_delivered=kwh,
+                ts=now.timestamp()
+            )
+        return True
 
-            # 🔥 RELEASE charger so it becomes AVAILABLE
-            self.release_charger(charger_id_copy)
+    def _sync_session(self, session, now):
+        """Copy the table row into the session and hand new energy to the vehicle."""
+        table = self.state_table
+        handle = session.handle
+        with table.lock:
+            kwh = float(table.kwh[handle])
+            pending = kwh - float(table.kwh_synced[handle])
+            table.kwh_synced[handle] = kwh
+        if pending > 0:
+            session.vehicle.ev_behavior.add_charge(pending)
+        session.kwh_delivered = round(kwh, 3)
 
-            # 🔥 AUTO ASSIGN waiting EV
-            if hasattr(self, "parking_lot"):
-                self.parking_lot.auto_assign_waiting_vehicle(charger_id_copy)
+    def _complete_session(self, charger_id, session, now):
+        """
+        Mark a session full and release its charger. Caller holds the charger
+        lock and promotes the next waiting EV via _notify_released afterwards.
+        """
+        self._sync_session(session, now)
+        session.status = "full"
+        session.end_time = now.isoformat()
+        self._notify_state(charger_id, session, "full")
+        if self.events:
+            self._publish_session_event("charging_full", charger_id, session, now)
 
-    def stop_charging(self, charger_id):
+        # 🔥 RELEASE charger so it becomes AVAILABLE
+        self.release_charger(charger_id, now)
+
+    def get_session_kwh(self, charger_id, now=None):
+        """
+        Return the kWh delivered by the session so far, projected to now.
+        Read-only: the session and vehicle are not modified.
+        """
         session = self.charger_usage.get(charger_id)
         if not session:
-            return
+            return 0.0
+        now = now or self.clock()
+        return round(self.state_table.projected_kwh(session.handle, now.timestamp()), 3)
+
+    @instrumented("update_kwh", scoped=False)
+    def update_kwh(self, charger_id, rate_kw=None, now=None):
+        with self.charger_lock(charger_id):
+            became_full = self._update_locked(charger_id, rate_kw, now)
+        # 🔥 AUTO ASSIGN waiting EV
+        if became_full:
+            self._notify_released(charger_id)
+
+    def _update_locked(self, charger_id, rate_kw, now):
+        """update_kwh body; returns True if the session completed and was released."""
+        session = self.charger_usage.get(charger_id)
+        if not session or session.status != "charging":
+            return False
+
+        now = now or self.clock()
+        handle = session.handle
+        became_full = self.state_table.advance(handle, now.timestamp())
+
+        if rate_kw is not None and not became_full:
+            session.max_rate_kw = rate_kw
+            budget = self.power_budgets.get(charger_id)
+            if budget is None:
+                self._apply_rate(charger_id, session, rate_kw, now)
+            else:
+                # Under a site cap rate_kw is the charger's new rating, not its rate;
+                # its event is published even if its share is unchanged (journals the rating)
+                with budget.lock:
+                    budget.active[charger_id] = rate_kw
+                    self._rebalance(budget, now, always=charger_id)
+
+        # Auto stop when full
+        if became_full:
+            self._complete_session(charger_id, session, now)
+        else:
+            self._sync_session(session, now)
+            self._schedule_completion(charger_id, session, now)
+        return became_full
 
-        if session["status"] == "charging":
-            session["status"] = "stopped"
-            session["end_time"] = datetime.now(timezone.utc).isoformat()
+    def end_session(self, charger_id, regnum):
+        """
+        Settle, stop and release the session of vehicle regnum on charger_id
+        (vehicle exit). The caller promotes the next waiting EV afterwards.
 
-    def release_charger(self, charger_id):
+        Returns:
+            float or None: kWh delivered by the session, or None if regnum
+            has no session on the charger.
+        """
+        with self.charger_lock(charger_id):
+            session = self.charger_usage.get(charger_id)
+            if not session or session.vehicle_reg != regnum:
+                return None
+            # Settle energy up to now before unplugging
+            self._update_locked(charger_id, None, None)
+            # Stop and release charger (a completed session has already been released)
+            if self.charger_usage.get(charger_id) is session:
+                self.stop_charging(charger_id)
+                self.release_charger(charger_id)
+            return session.kwh_delivered
+
+    @instrumented("charger_tick", scoped=False)
+    def tick(self, now=None):
+        """
+        Advance every active session to now in one pass over the state table.
+        Only sessions that became full are copied back into their sessions.
+
+        Returns:
+            list: Charger IDs whose sessions became full.
+        """
+        now = now or self.clock()
+        completed = self.state_table.tick(now.timestamp())
+        for charger_id in completed:
+            with self.charger_lock(charger_id):
+                session = self.charger_usage.get(charger_id)
+                if session:
+                    self._complete_session(charger_id, session, now)
+            self._notify_released(charger_id)
+        return completed
+
+    def process_due_sessions(self, now=None):
+        """
+        Complete every session whose projected full time has passed.
+        Cost depends on the number of completing sessions, not on the number of chargers.
+
+        Returns:
+            list: Charger IDs whose sessions completed.
+        """
+        now = now or self.clock()
+        completed = []
+        for charger_id, full_time in self.scheduler.pop_due(now):
+            session = self.charger_usage.get(charger_id)
+            # Settle at the projected instant so the battery is exactly full
+            self.update_kwh(charger_id, now=full_time)
+            if session and session.status != "charging":
+                completed.append(charger_id)
+        return completed
+
+    def rewind_session(self, charger_id, hours):
+        """Move the session's last update back by hours (charging hardware simulation)."""
+        with self.charger_lock(charger_id):
+            session = self.charger_usage.get(charger_id)
+            if session:
+                with self.state_table.lock:
+                    self.state_table.last_update[session.handle] -= hours * 3600
+
+    def stop_charging(self, charger_id):
+        with self.charger_lock(charger_id):
+            session = self.charger_usage.get(charger_id)
+            if not session:
+                return
+
+            if session.status == "charging":
+                now = self.clock()
+                session.status = "stopped"
+                session.end_time = now.isoformat()
+                self.state_table.set_status(session.handle, STOPPED)
+                self.scheduler.cancel(charger_id)
+                self._leave_budget(charger_id, now)
+                self._notify_state(charger_id, session, "waiting")
+                if self.events:
+                    self._publish_session_event("charging_stopped", charger_id, session, now)
+
+    def release_charger(self, charger_id, now=None):
         """
         Called when the vehicle unplugs / exits parking.
         Billing should already be done before this.
+
+        now (datetime, optional) is when the charger freed up; the rest of a
+        power-capped site gets its share from then on. Defaults to the clock.
         """
-        if charger_id in self.charger_usage:
-            del self.charger_usage[charger_id]
\ No newline at end of file
+        with self.charger_lock(charger_id):
+            self.scheduler.cancel(charger_id)
+            session = self.charger_usage.pop(charger_id, None)
+            if session:
+                session.detach()
+                if session.status == "charging":
+                    # Unplugged mid-charge: the EV is back to waiting
+                    self._notify_state(charger_id, session, "waiting")
+                self.state_table.set_status(session.handle, IDLE)
+                self._leave_budget(charger_id, now or self.clock())
+                if self.events:
+                    self.events.publish("charger_released", charger_id=charger_id)
@@ -0,0 +1,185 @@
+from array import array
+import threading
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; fall back to a per-row loop over array('d')
+    np = None
+
+# Row status codes
+IDLE = 0
+CHARGING = 1
+FULL = 2
+STOPPED = 3
+
+# Remaining headroom below this is treated as a full battery (float rounding)
+FULL_EPSILON_KWH = 1e-6
+
+
+class ChargerStateTable:
+    """
+    Columnar numeric state of every charger, addressed by an integer handle.
+
+    Columns: status, rate (kW), kWh delivered, battery headroom (kWh) and
+    last-update time (epoch seconds). tick() advances all charging rows in a
+    single vectorized pass when NumPy is available.
+
+    Row updates and tick() hold self.lock; callers writing columns directly
+    must hold it too, since tick() rewrites every active row.
+    """
+
+    def __init__(self, capacity=64):
+        self.handles = {}        # charger_id -> handle
+        self.charger_ids = []    # handle -> charger_id
+        self._capacity = 0
+        self.status = self.rate = self.kwh = self.headroom = self.last_update = None
+        self.kwh_synced = None   # kWh already applied to the vehicle's EV behavior
+        self.lock = threading.RLock()
+        self._grow(max(1, capacity))
+
+    def _grow(self, new_capacity):
+        """Resize every column to new_capacity rows, keeping existing data."""
+        extra = new_capacity - self._capacity
+        if np is not None:
+            def extend(col, dtype):
+                fresh = np.zeros(extra, dtype=dtype)
+                return fresh if col is None else np.concatenate((col, fresh))
+            self.status = extend(self.status, np.int8)
+            self.rate = extend(self.rate, np.float64)
+            self.kwh = extend(self.kwh, np.float64)
+            self.headroom = extend(self.headroom, np.float64)
+            self.last_update = extend(self.last_update, np.float64)
+            self.kwh_synced = extend(self.kwh_synced, np.float64)
+        else:
+            def extend(col, typecode):
+                fresh = array(typecode, [0] * extra)
+                if col is None:
+                    return fresh
+                col.extend(fresh)
+                return col
+            self.status = extend(self.status, "b")
+            self.rate = extend(self.rate, "d")
+            self.kwh = extend(self.kwh, "d")
+            self.headroom = extend(self.headroom, "d")
+            self.last_update = extend(self.last_update, "d")
+            self.kwh_synced = extend(self.kwh_synced, "d")
+        self._capacity = new_capacity
+
+    def handle_for(self, charger_id):
+        """Return the handle of charger_id, allocating a row on first use."""
+        with self.lock:
+            handle = self.handles.get(charger_id)
+            if handle is None:
+                handle = len(self.charger_ids)
+                if handle >= self._capacity:
+                    self._grow(self._capacity * 2)
+                self.handles[charger_id] = handle
+                self.charger_ids.append(charger_id)
+            return handle
+
+    def open_session(self, charger_id, rate_kw, headroom_kwh, now_ts):
+        """Start a charging row for charger_id and return its handle."""
+        with self.lock:
+            handle = self.handle_for(charger_id)
+            self.status[handle] = CHARGING
+            self.rate[handle] = rate_kw
+            self.kwh[handle] = 0.0
+            self.kwh_synced[handle] = 0.0
+            self.headroom[handle] = max(0.0, headroom_kwh)
+            self.last_update[handle] = now_ts
+            return handle
+
+    def set_status(self, handle, status):
+        with self.lock:
+            self.status[handle] = status
+
+    def advance(self, handle, now_ts):
+        """
+        Advance a single charging row to now_ts.
+
+        Returns:
+            bool: True if the row became full.
+        """
+        with self.lock:
+            if self.status[handle] != CHARGING:
+                return False
+            elapsed_hours = (now_ts - self.last_update[handle]) / 3600
+            if elapsed_hours <= 0:
+                return False
+            added = min(elapsed_hours * self.rate[handle], self.headroom[handle])
+            self.kwh[handle] += added
+            self.headroom[handle] -= added
+            self.last_update[handle] = now_ts
+            if self.headroom[handle] < FULL_EPSILON_KWH:
+                self.kwh[handle] += self.headroom[handle]
+                self.headroom[handle] = 0.0
+                self.status[handle] = FULL
+                return True
+            return False
+
+    def set_rate(self, handle, rate_kw, now_ts):
+        """
+        Settle a charging row up to now_ts at its old rate, then switch it to rate_kw.
+
+        Returns:
+            bool: False if the row is not charging or fills up by now_ts; its
+            completion is then left to the scheduler and the rate is unchanged.
+        """
+        with self.lock:
+            if self.status[handle] != CHARGING:
+                return False
+            elapsed_hours = (now_ts - self.last_update[handle]) / 3600
+            if elapsed_hours > 0:
+                added = elapsed_hours * self.rate[handle]
+                if self.headroom[handle] - added < FULL_EPSILON_KWH:
+                    return False
+                self.kwh[handle] += added
+                self.headroom[handle] -= added
+                self.last_update[handle] = now_ts
+            self.rate[handle] = rate_kw
+            return True
+
+    def projected_kwh(self, handle, now_ts):
+        """Return the row's kWh delivered projected to now_ts without modifying it."""
+        with self.lock:
+            if self.status[handle] != CHARGING:
+                return float(self.kwh[handle])
+            elapsed_hours = max(0.0, (now_ts - self.last_update[handle]) / 3600)
+            return float(self.kwh[handle] + min(elapsed_hours * self.rate[handle], self.headroom[handle]))
+
+    def tick(self, now_ts):
+        """
+        Advance every charging row to now_ts.
+
+        Returns:
+            list: Charger IDs whose rows became full during this tick.
+        """
+        with self.lock:
+            n = len(self.charger_ids)
+            if np is None:
+                return [self.charger_ids[h] for h in range(n) if self.advance(h, now_ts)]
+
+            status = self.status[:n]
+            active = status == CHARGING
+            if not active.any():
+                return []
+            elapsed_hours = np.maximum(now_ts - self.last_update[:n][active], 0.0) / 3600
+            headroom = self.headroom[:n][active]
+            added = np.minimum(elapsed_hours * self.rate[:n][active], headroom)
+            headroom = headroom - added
+            kwh = self.kwh[:n][active] + added
+
+            full = headroom < FULL_EPSILON_KWH
+            kwh[full] += headroom[full]
+            headroom[full] = 0.0
+
+            self.kwh[:n][active] = kwh
+            self.headroom[:n][active] = headroom
+            self.last_update[:n][active] = now_ts
+
+            became_full = np.flatnonzero(active)[full]
+            status[became_full] = FULL
+            return [self.charger_ids[h] for h in became_full.tolist()]
+
+    def __len__(self):
+        return len(self.charger_ids)
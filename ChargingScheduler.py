@@ -0,0 +1,84 @@
+from datetime import datetime, timezone, timedelta
+import heapq
+import itertools
+import threading
+
+
+class ChargingScheduler:
+    """
+    Keeps the projected full-charge time of every active charging session in a
+    min-heap so completions can be fired when due instead of being polled.
+    """
+
+    def __init__(self, clock=None):
+        """
+        Args:
+            clock (callable, optional): Returns the current aware datetime.
+                Defaults to datetime.now(timezone.utc).
+        """
+        self.clock = clock or (lambda: datetime.now(timezone.utc))
+        self._heap = []          # (projected_full_time, seq, charger_id)
+        self._projected = {}     # charger_id -> projected_full_time of the live entry
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def project_full_time(from_time, headroom_kwh, rate_kw):
+        """Return when a session charging at rate_kw will have delivered headroom_kwh."""
+        if rate_kw <= 0:
+            return None
+        micros = max(0, headroom_kwh) / rate_kw * 3600 * 1_000_000
+        # Round up so the battery is really full at the projected instant
+        return from_time + timedelta(microseconds=int(-(-micros // 1)))
+
+    def schedule(self, charger_id, full_time):
+        """Schedule (or reschedule) completion of the session on charger_id."""
+        if full_time is None:
+            self.cancel(charger_id)
+            return
+        with self._lock:
+            self._projected[charger_id] = full_time
+            heapq.heappush(self._heap, (full_time, next(self._seq), charger_id))
+
+    def cancel(self, charger_id):
+        """Forget the pending completion of charger_id; stale heap entries are skipped lazily."""
+        with self._lock:
+            self._projected.pop(charger_id, None)
+
+    def projected_full_time(self, charger_id):
+        """Return the projected full time for charger_id, or None if not scheduled."""
+        return self._projected.get(charger_id)
+
+    def next_due_time(self):
+        """Return the earliest projected full time, or None if nothing is scheduled."""
+        with self._lock:
+            self._discard_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now=None):
+        """
+        Pop every session whose projected full time is at or before now.
+
+        Returns:
+            list of tuple: (charger_id, projected_full_time) in completion order.
+        """
+        now = now or self.clock()
+        due = []
+        with self._lock:
+            while True:
+                self._discard_stale()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                full_time, _, charger_id = heapq.heappop(self._heap)
+                del self._projected[charger_id]
+                due.append((charger_id, full_time))
+        return due
+
+    def _discard_stale(self):
+        """Drop heap entries that were cancelled or superseded by a reschedule."""
+        heap = self._heap
+        while heap and self._projected.get(heap[0][2]) != heap[0][0]:
+            heapq.heappop(heap)
+
+    def __len__(self):
+        return len(self._projected)
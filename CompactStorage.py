@@ -0,0 +1,76 @@
+from array import array
+import sys
+
+from Vehicle import Car, Truck, Motorcycle, Bus
+from ElectricVehicle import ElectricCar, ElectricBike
+
+# Vehicle classes by type code stored in VehicleTable.type_code
+VEHICLE_TYPES = (Car, Truck, Motorcycle, Bus, ElectricCar, ElectricBike)
+_TYPE_CODES = {cls: code for code, cls in enumerate(VEHICLE_TYPES)}
+
+
+class VehicleTable:
+    """
+    Columnar store of parked vehicles addressed by integer row id.
+
+    Regular vehicles are kept only as column values and rebuilt on demand.
+    EVs (and unknown vehicle types) also keep their object, because charging
+    sessions mutate its EVBehavior.
+    """
+
+    def __init__(self):
+        self.regnum = []
+        self.make = []
+        self.model = []
+        self.color = []
+        self.type_code = array("b")
+        self.start_time = array("d")     # epoch seconds
+        self.ev_objects = {}             # row -> pinned vehicle object
+        self._free_rows = []
+
+    def add(self, vehicle, start_ts):
+        """Store vehicle and return its row id."""
+        # Make, model and color repeat heavily; intern them so rows share one string
+        values = (
+            vehicle.regnum,
+            sys.intern(vehicle.make),
+            sys.intern(vehicle.model),
+            sys.intern(vehicle.color),
+            _TYPE_CODES.get(type(vehicle), -1),
+            start_ts,
+        )
+        if self._free_rows:
+            row = self._free_rows.pop()
+            (self.regnum[row], self.make[row], self.model[row], self.color[row],
+             self.type_code[row], self.start_time[row]) = values
+        else:
+            row = len(self.regnum)
+            for column, value in zip(
+                (self.regnum, self.make, self.model, self.color, self.type_code, self.start_time),
+                values
+            ):
+                column.append(value)
+        if vehicle.is_ev() or self.type_code[row] == -1:
+            self.ev_objects[row] = vehicle
+        return row
+
+    def remove(self, row):
+        """Free a row for reuse and return its start time."""
+        self.ev_objects.pop(row, None)
+        self.regnum[row] = None
+        self._free_rows.append(row)
+        return self.start_time[row]
+
+    def vehicle(self, row):
+        """Return the Vehicle for a row (None if freed), building regular vehicles from the columns."""
+        ev = self.ev_objects.get(row)
+        if ev is not None:
+            return ev
+        regnum = self.regnum[row]
+        if regnum is None:  # freed row
+            return None
+        cls = VEHICLE_TYPES[self.type_code[row]]
+        return cls(regnum, self.make[row], self.model[row], self.color[row])
+
+    def __len__(self):
+        return len(self.regnum) - len(self._free_rows)
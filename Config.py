@@ -7,4 +7,15 @@ PARKING_RATE_PER_HOUR = 5.0
 CHARGING_RATE_PER_KWH = 0.3
 
 # Cities with parking facility
-CITY_LIST = ['Boston', 'New York', 'Philadelphia']
\ No newline at end of file
+CITY_LIST = ['Boston', 'New York', 'Philadelphia']
+
+# Default power delivered by a charger in kW
+CHARGER_RATE_KW = 7
+
+# Store new levels in compact array-backed storage (CompactLevel): about half
+# the memory per parked vehicle, but regular vehicles are rebuilt on every read
+COMPACT_LEVELS = False
+
+# Let every free charger of a level serve any waiting EV of that level
+# instead of each EV slot waiting for its own fixed charger
+CHARGER_POOLING = False
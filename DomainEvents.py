@@ -0,0 +1,31 @@
+class EventBus:
+    """
+    Minimal synchronous publish/subscribe channel for domain events.
+
+    Events are plain dicts with a 'type' key plus event-specific fields.
+    Publishing with no subscribers costs a single truth test. The subscriber
+    list is replaced rather than mutated, so publish() needs no lock.
+    """
+
+    def __init__(self):
+        self._subscribers = []
+
+    def subscribe(self, handler):
+        """Register handler(event_dict); returns handler so it can be unsubscribed."""
+        self._subscribers = self._subscribers + [handler]
+        return handler
+
+    def unsubscribe(self, handler):
+        self._subscribers = [h for h in self._subscribers if h is not handler]
+
+    def __bool__(self):
+        return bool(self._subscribers)
+
+    def publish(self, event_type, **data):
+        """Deliver an event to every subscriber in subscription order."""
+        subscribers = self._subscribers
+        if not subscribers:
+            return
+        data["type"] = event_type
+        for handler in subscribers:
+            handler(data)
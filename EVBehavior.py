@@ -1,9 +1,14 @@
 class EVBehavior:
     """Encapsulates Electric Vehicle characteristics."""
+    __slots__ = ("battery_capacity_kwh", "charge_kwh", "kwh_delivered_this_session", "departure_time")
+
     def __init__(self, battery_capacity_kwh: float):
         self.battery_capacity_kwh = battery_capacity_kwh
         self.charge_kwh = 0.0
         self.kwh_delivered_this_session = 0.0
+        # Expected departure (aware datetime) if the driver gave one; used to
+        # prioritize charging under a site power budget
+        self.departure_time = None
 
     def get_charge(self) -> float:
         return self.charge_kwh
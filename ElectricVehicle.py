@@ -4,6 +4,10 @@ from EVBehavior import EVBehavior
 
 class ElectricVehicle:
     """Base class for EV capability"""
+    # The ev_behavior slot is declared on the concrete classes: two bases
+    # with non-empty __slots__ cannot be combined by multiple inheritance
+    __slots__ = ()
+
     def __init__(self, battery_capacity_kwh: float):
         self.ev_behavior = EVBehavior(battery_capacity_kwh)
 
@@ -12,12 +16,16 @@ class ElectricVehicle:
 
 
 class ElectricCar(ElectricVehicle, Car):
+    __slots__ = ("ev_behavior",)
+
     def __init__(self, regnum, make, model, color, battery_capacity_kwh=60):
         Car.__init__(self, regnum, make, model, color)
         ElectricVehicle.__init__(self, battery_capacity_kwh)
 
 
 class ElectricBike(ElectricVehicle, Motorcycle):
+    __slots__ = ("ev_behavior",)
+
     def __init__(self, regnum, make, model, color, battery_capacity_kwh=15):
         Motorcycle.__init__(self, regnum, make, model, color)
         ElectricVehicle.__init__(self, battery_capacity_kwh)
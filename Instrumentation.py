@@ -0,0 +1,288 @@
+"""
+Low-overhead latency and counter instrumentation for the hot paths.
+
+Instrumentation is disabled by default: an instrumented call then costs
+one truth test, the same pattern as an EventBus without subscribers.
+When enabled, every timed call is recorded into a log-linear (HDR-style)
+histogram for its operation, its city and its site, so slow sites can be
+found from the percentile dump without attaching a profiler.
+"""
+import functools
+import threading
+import time
+
+QUANTILES = (50, 90, 99, 99.9)
+
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of non-negative integer values (nanoseconds).
+
+    Values below 64 get exact buckets; above that every power of two is
+    split into 32 sub-buckets, which bounds the relative error of a
+    reported percentile to about 3%, whatever the magnitude.
+    """
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    SUB_BUCKET_BITS = 5
+
+    def __init__(self):
+        self.counts = {}  # bucket index -> count
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @classmethod
+    def bucket_index(cls, value):
+        shift = max(0, value.bit_length() - cls.SUB_BUCKET_BITS - 1)
+        return (shift << cls.SUB_BUCKET_BITS) + (value >> shift)
+
+    @classmethod
+    def bucket_high(cls, index):
+        """Return the highest value that falls into bucket index."""
+        shift = max(0, (index >> cls.SUB_BUCKET_BITS) - 1)
+        mantissa = index - (shift << cls.SUB_BUCKET_BITS)
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value):
+        value = max(0, int(value))
+        index = self.bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for index, n in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + n
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        """Return the value at percentile q (0-100), or 0 if the histogram is empty."""
+        if not self.count:
+            return 0
+        target = max(1, -(-self.count * q // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self.bucket_high(index), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class Instrumentation:
+    """
+    Registry of latency histograms, counters and gauges, each kept per
+    operation (or name) and per city and site.
+
+    Args:
+        enabled (bool): Start recording immediately.
+        clock (callable): Timer returning integer nanoseconds; pluggable so
+            tests and simulations can drive it.
+    """
+
+    def __init__(self, enabled=False, clock=time.perf_counter_ns):
+        self.enabled = enabled
+        self.clock = clock
+        self._lock = threading.Lock()
+        # (op, city_name, site_name) -> LatencyHistogram; None marks an unscoped total
+        self._histograms = {}
+        # (name, city_name, site_name) -> int
+        self._counters = {}
+        # (name, city_name, site_name) -> [last value, max value]
+        self._gauges = {}
+        # name -> callable sampled by gauges(), see gauge_source()
+        self._gauge_sources = {}
+
+    def __bool__(self):
+        return self.enabled
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        """Drop everything recorded so far."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    @staticmethod
+    def _scopes(name, city_name, site_name):
+        yield name, None, None
+        if city_name is not None:
+            yield name, city_name, None
+            if site_name is not None:
+                yield name, city_name, site_name
+
+    # ---------------- Recording ----------------
+    def observe(self, op, elapsed_ns, city_name=None, site_name=None):
+        """Record one call of op that took elapsed_ns."""
+        with self._lock:
+            for key in self._scopes(op, city_name, site_name):
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = LatencyHistogram()
+                histogram.record(elapsed_ns)
+
+    def count(self, name, city_name=None, site_name=None, n=1):
+        """Add n to the counter name (e.g. failed_allocations)."""
+        with self._lock:
+            for key in self._scopes(name, city_name, site_name):
+                self._counters[key] = self._counters.get(key, 0) + n
+
+    def gauge(self, name, value, city_name=None, site_name=None):
+        """Record the current value of name; its maximum is kept too."""
+        with self._lock:
+            for key in self._scopes(name, city_name, site_name):
+                self._set_gauge(key, value)
+
+    def gauge_source(self, name, read):
+        """
+        Derive gauge name from the live state each time gauges are read.
+
+        read() yields (city_name, site_name, value) parts, e.g. one per
+        level; every scope reports the sum of its parts, so a site or the
+        fleet is not left with whichever part changed last. The maximum is
+        the highest sum seen by a read.
+        """
+        self._gauge_sources[name] = read
+
+    def _set_gauge(self, key, value):
+        entry = self._gauges.get(key)
+        if entry is None:
+            self._gauges[key] = [value, value]
+        else:
+            entry[0] = value
+            entry[1] = max(entry[1], value)
+
+    # ---------------- Reading ----------------
+    def histogram(self, op, city_name=None, site_name=None):
+        """Return a copy of the histogram of op at the given scope (empty if never recorded)."""
+        copy = LatencyHistogram()
+        with self._lock:
+            histogram = self._histograms.get((op, city_name, site_name))
+            if histogram is not None:
+                copy.merge(histogram)
+        return copy
+
+    def percentiles(self, op=None, scope="op", quantiles=QUANTILES):
+        """
+        Dump latency percentiles, slowest first.
+
+        Args:
+            op (str, optional): Only this operation.
+            scope (str): "op" for fleet-wide totals, "city" or "site" for
+                one row per operation and city / site.
+            quantiles (tuple of float): Percentiles to report.
+
+        Returns:
+            list of dict: op, city_name, site_name, count, mean_us, p<q>_us
+            per quantile and max_us, sorted by the highest quantile, descending.
+        """
+        depth = {"op": 0, "city": 1, "site": 2}[scope]
+        with self._lock:
+            items = [
+                (key, histogram) for key, histogram in self._histograms.items()
+                if (op is None or key[0] == op)
+                and sum(part is not None for part in key[1:]) == depth
+            ]
+            rows = []
+            for (name, city_name, site_name), histogram in items:
+                row = {
+                    "op": name,
+                    "city_name": city_name,
+                    "site_name": site_name,
+                    "count": histogram.count,
+                    "mean_us": round(histogram.mean() / 1000, 2),
+                }
+                for q in quantiles:
+                    row[f"p{q:g}_us"] = round(histogram.percentile(q) / 1000, 2)
+                row["max_us"] = round(histogram.max / 1000, 2)
+                rows.append(row)
+        last = f"p{quantiles[-1]:g}_us"
+        rows.sort(key=lambda row: row[last], reverse=True)
+        return rows
+
+    def counters(self):
+        """Return [{name, city_name, site_name, value}] of every counter."""
+        with self._lock:
+            return [
+                {"name": name, "city_name": city, "site_name": site, "value": value}
+                for (name, city, site), value in sorted(self._counters.items(), key=_sort_key)
+            ]
+
+    def gauges(self):
+        """Return [{name, city_name, site_name, value, max}] of every gauge."""
+        sampled = {}
+        if self.enabled:
+            for name, read in list(self._gauge_sources.items()):
+                for city_name, site_name, value in read():
+                    for key in self._scopes(name, city_name, site_name):
+                        sampled[key] = sampled.get(key, 0) + value
+        with self._lock:
+            for key, value in sampled.items():
+                self._set_gauge(key, value)
+            return [
+                {"name": name, "city_name": city, "site_name": site, "value": last, "max": peak}
+                for (name, city, site), (last, peak) in sorted(self._gauges.items(), key=_sort_key)
+            ]
+
+    def snapshot(self, quantiles=QUANTILES):
+        """Return everything recorded as one JSON-serializable dict."""
+        return {
+            "enabled": self.enabled,
+            "latency": {
+                scope: self.percentiles(scope=scope, quantiles=quantiles)
+                for scope in ("op", "city", "site")
+            },
+            "counters": self.counters(),
+            "gauges": self.gauges(),
+        }
+
+
+def _sort_key(item):
+    return tuple("" if part is None else str(part) for part in item[0])
+
+
+def instrumented(op, scoped=True):
+    """
+    Method decorator timing calls into self.instruments under op.
+
+    Scoped methods take city_name and site_name as their first two
+    arguments and are also recorded per city and per site. When
+    instrumentation is disabled the call costs one truth test.
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            instruments = self.instruments
+            if not instruments:
+                return method(self, *args, **kwargs)
+            t0 = instruments.clock()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                elapsed = instruments.clock() - t0
+                if scoped:
+                    city_name = args[0] if args else kwargs.get("city_name")
+                    site_name = args[1] if len(args) > 1 else kwargs.get("site_name")
+                    instruments.observe(op, elapsed, city_name, site_name)
+                else:
+                    instruments.observe(op, elapsed)
+        return wrapper
+    return decorate
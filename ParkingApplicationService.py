@@ -1,36 +1,111 @@
+from datetime import datetime
+import functools
+
+import Config
 from BillManager import ExitBillingService
 from ChargerController import ChargerController
 from vehicle_factory import VehicleFactory
-from collections import deque
+from ParkingEntities import WaitingQueue
+from PowerBudget import SitePowerBudget
+from Instrumentation import instrumented
+
+
+def durable(method):
+    """
+    Method decorator returning only once the events the call published are
+    journaled to disk, when a PersistenceManager is attached. Domain locks
+    are released by then, so gates do not hold a level across the fsync.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        if self.persistence:
+            self.persistence.wait_durable()
+        return result
+    return wrapper
+
 
 class ParkingApplicationService:
-    def __init__(self, parking_lot):
-        """Initialize the application service with billing, charger controller, and parking lot."""
+    def __init__(self, parking_lot, clock=None):
+        """
+        Initialize the application service with billing, charger controller, and parking lot.
+
+        clock (callable, optional) returns the current aware datetime; it drives
+        charging progress and completion scheduling.
+        """
         self.billing_service = ExitBillingService()
-        self.charger_controller = ChargerController()
+        self.charger_controller = ChargerController(
+            clock, events=parking_lot.events, instruments=parking_lot.instruments
+        )
         self.parking_lot = parking_lot
-        # self.charger_controller.parking_lot = ParkingLot()
-
-    def make_lot(self, num_regular, num_ev, level_number, site_name, city_name, chargers=0):
-        """Create a parking lot with given specifications and add levels to the site."""
-        # Use ParkingLot method to get or create city
-        city = self.parking_lot.get_or_create_city(city_name)
-
-        # Use City method to get or create site
-        site = city.get_or_create_site(site_name)
-
-        added_levels = []
-        for level_no in range(1, level_number + 1):
-            success, msg = site.add_level(
-                level_no,
-                num_regular=num_regular,
-                num_ev=num_ev,
-                chargers=chargers
-            )
-            if success:
-                added_levels.append(level_no)
-            else:
-                print(f"Warning: {msg}")
+        self.instruments = parking_lot.instruments
+        # Set by PersistenceManager.recover(); mutating methods wait for their journal records
+        self.persistence = None
+        # Promote the next waiting EV whenever a charger frees up after a full charge
+        self.charger_controller.on_charger_released = self.auto_assign_waiting_vehicle
+        # Keep the level's charging / waiting / full counters in step with the chargers
+        self.charger_controller.on_session_state = self._count_session_state
+        # Queue lengths are summed from the levels whenever gauges are read
+        self.instruments.gauge_source("charger_queue_length", self._queue_depths)
+
+    def _count_session_state(self, charger_id, session, state):
+        """Record a charger session transition on the counters of the charger's level."""
+        level = self.parking_lot._find_level_by_charger(charger_id)
+        if level:
+            level.set_ev_charge_state(session.slot, session.vehicle, state)
+
+    @durable
+    def make_lot(self, num_regular, num_ev, level_number, site_name, city_name, chargers=0,
+                 pooled_chargers=None, compact=None):
+        """
+        Create a parking lot with given specifications and add levels to the site.
+
+        pooled_chargers lets any free charger of a level serve any of its EVs;
+        None uses Config.CHARGER_POOLING. compact stores the levels as
+        CompactLevel; None uses Config.COMPACT_LEVELS.
+        """
+        if pooled_chargers is None:
+            pooled_chargers = Config.CHARGER_POOLING
+        if compact is None:
+            compact = Config.COMPACT_LEVELS
+        # Creating levels registers chargers fleet-wide; one topology change at a time
+        with self.parking_lot.topology_lock:
+            # Use ParkingLot method to get or create city
+            city = self.parking_lot.get_or_create_city(city_name)
+
+            # Use City method to get or create site
+            site = city.get_or_create_site(site_name)
+
+            added_levels = []
+            for level_no in range(1, level_number + 1):
+                success, msg = site.add_level(
+                    level_no,
+                    num_regular=num_regular,
+                    num_ev=num_ev,
+                    chargers=chargers,
+                    compact=compact,
+                    pooled_chargers=pooled_chargers
+                )
+                if success:
+                    added_levels.append(level_no)
+                    if site.power_budget:
+                        self.charger_controller.set_power_budget(
+                            site.levels[level_no].charger_ids, site.power_budget
+                        )
+                    if self.parking_lot.events:
+                        self.parking_lot.events.publish(
+                            "level_added",
+                            city_name=city_name,
+                            site_name=site_name,
+                            level_number=level_no,
+                            num_regular=num_regular,
+                            num_ev=num_ev,
+                            chargers=chargers,
+                            pooled_chargers=pooled_chargers,
+                            compact=compact
+                        )
+                else:
+                    print(f"Warning: {msg}")
 
         return True, f"Lot created: City={city_name}, Site={site_name}, Levels added={added_levels}"
 
@@ -46,12 +121,38 @@ class ParkingApplicationService:
         """Return the charging session usage data for a specific charger."""
         return self.charger_controller.charger_usage.get(charger_id)
 
+    @durable
+    def process_charging_events(self, now=None):
+        """
+        Fire every charging completion that is due: mark the session full,
+        release the charger and assign the next waiting EV.
+
+        Returns:
+            list: Charger IDs whose sessions completed.
+        """
+        return self.charger_controller.process_due_sessions(now)
+
+    def seconds_until_next_charging_event(self):
+        """Return seconds until the next projected charge completion, or None if idle."""
+        next_time = self.charger_controller.scheduler.next_due_time()
+        if next_time is None:
+            return None
+        return max(0.0, (next_time - self.charger_controller.clock()).total_seconds())
+
+    @instrumented("park_vehicle_and_assign")
+    @durable
     def park_vehicle_and_assign(self, city_name, site_name, level_number,
-                                reg, make, model, color, ev_car=False, motor=False):
+                                reg, make, model, color, ev_car=False, motor=False, departure_time=None):
         """
         Application-level parking method.
         Handles vehicle creation and EV charger assignment.
+
+        departure_time (datetime, optional) is when an EV is expected to
+        leave; the earliest_departure power policy charges it accordingly.
         """
+        if departure_time is not None and not isinstance(departure_time, datetime):
+            return False, "departure_time must be a datetime", None
+
         # Step 1: Create vehicle via factory
         vehicle = VehicleFactory.create_vehicle(
             reg=reg,
@@ -61,6 +162,8 @@ class ParkingApplicationService:
             ev=ev_car,
             motor=motor
         )
+        if departure_time is not None and vehicle.is_ev():
+            vehicle.ev_behavior.departure_time = departure_time
 
         # Step 2: Call domain method to park vehicle
         success, msg, assigned_slot = self.parking_lot.park_vehicle(
@@ -70,19 +173,118 @@ class ParkingApplicationService:
         # Step 3: Handle EV charger assignment (delegated)
         if success and vehicle.is_ev():
             level = self.parking_lot.get_level(city_name, site_name, level_number)
-            charger_id = level.ev_slot_chargers.get(assigned_slot - 1)
-            if charger_id:
-                status_info = self.charger_controller.get_charger_status(charger_id)
-                if status_info["charger_status"] == "available":
-                    self.ev_status_update(charger_id, vehicle, assigned_slot)
-                else:
-                    # Add to waiting queue if not already present
-                    queue = level.charger_waiting_queue[charger_id]
-                    if assigned_slot not in queue:
-                        queue.append(assigned_slot)
+            self._assign_charger(level, vehicle, assigned_slot)
 
         return success, msg, assigned_slot
 
+    def _assign_charger(self, level, vehicle, slot_number):
+        """Start charging a freshly parked EV, or queue it if its charger is busy."""
+        if level.pooled_chargers:
+            self._assign_pooled_charger(level, vehicle, slot_number)
+            return
+        charger_id = level.ev_slot_chargers.get(slot_number - 1)
+        if not charger_id:
+            return
+        # Chargers of a level are only started under the level lock, so the
+        # availability check and the start (or enqueue) cannot interleave
+        with level.lock:
+            if level.get_vehicle(slot_number, True) is not vehicle:
+                return  # already left through another gate
+            if charger_id not in self.charger_controller.charger_usage:
+                self.charger_controller.start_charging(charger_id, vehicle, slot_number)
+            else:
+                # Add to waiting queue (a no-op if already queued)
+                queue = level.charger_waiting_queue[charger_id]
+                queue.append(slot_number)
+
+    def _assign_pooled_charger(self, level, vehicle, slot_number):
+        """Plug a freshly parked EV into any free charger of its level, or queue it level-wide."""
+        if not level.charger_ids:
+            return
+        with level.lock:
+            if level.get_vehicle(slot_number, True) is not vehicle:
+                return  # already left through another gate
+            charger_id = level.claim_free_charger()
+            if charger_id is not None:
+                self.charger_controller.start_charging(charger_id, vehicle, slot_number)
+                level.plug_charger(charger_id, slot_number)
+            else:
+                level.pooled_waiting_queue.append(slot_number)
+
+    @instrumented("park_many", scoped=False)
+    @durable
+    def park_many(self, requests):
+        """
+        Park a burst of vehicles, e.g. when an event lets out.
+
+        Requests are grouped by level: each level is resolved once and its
+        vehicles get their slots in one pass under the level lock, in request
+        order. Chargers are assigned in a single pass after all vehicles are
+        parked. A failing item does not abort the batch.
+
+        Args:
+            requests (iterable of dict): Keys city_name, site_name, level_number,
+                reg, make, model, color and optional ev_car, motor,
+                departure_time (datetime).
+
+        Returns:
+            list of tuple: (success, message, assigned_slot) per request, in order.
+        """
+        levels = {}
+        results = []
+        # level key -> [(position, vehicle)] in request order
+        batches = {}
+
+        for request in requests:
+            try:
+                key = (request["city_name"], request["site_name"], request["level_number"])
+                vehicle = VehicleFactory.create_vehicle(
+                    reg=request["reg"],
+                    make=request["make"],
+                    model=request["model"],
+                    color=request["color"],
+                    ev=request.get("ev_car", False),
+                    motor=request.get("motor", False)
+                )
+                departure_time = request.get("departure_time")
+                if departure_time is not None and not isinstance(departure_time, datetime):
+                    results.append((False, "departure_time must be a datetime", None))
+                    continue
+                if departure_time is not None and vehicle.is_ev():
+                    vehicle.ev_behavior.departure_time = departure_time
+            except (KeyError, TypeError) as e:
+                results.append((False, f"Invalid park request: missing {e}", None))
+                continue
+
+            if key not in levels:
+                try:
+                    levels[key] = self.parking_lot.get_level(*key)
+                except KeyError as e:
+                    levels[key] = str(e)
+            level = levels[key]
+            if isinstance(level, str):
+                results.append((False, level, None))
+                continue
+
+            batches.setdefault(key, []).append((len(results), vehicle))
+            results.append(None)
+
+        parked_evs = []
+        for key, batch in batches.items():
+            level = levels[key]
+            vehicles = [vehicle for _, vehicle in batch]
+            for (position, vehicle), result in zip(batch, self.parking_lot.park_vehicles_on_level(level, vehicles)):
+                results[position] = result
+                if result[0] and vehicle.is_ev():
+                    parked_evs.append((level, vehicle, result[2]))
+
+        for level, vehicle, slot_number in parked_evs:
+            self._assign_charger(level, vehicle, slot_number)
+
+        return results
+
+    @instrumented("remove_vehicle_and_process")
+    @durable
     def remove_vehicle_and_process(self, city_name, site_name, level_number, slot_number, is_ev=False):
         """
         Orchestrates:
@@ -91,7 +293,15 @@ class ParkingApplicationService:
         - Assign charger to waiting vehicle
         - Calculate billing
         """
-        success, msg, vehicle_info = self.parking_lot.remove_vehicle(city_name, site_name, level_number, slot_number, is_ev)
+        try:
+            level = self.parking_lot.get_level(city_name, site_name, level_number)
+        except KeyError as e:
+            return False, str(e), None
+        return self._remove_and_bill(level, slot_number, is_ev)
+
+    def _remove_and_bill(self, level, slot_number, is_ev):
+        """Remove a vehicle from a resolved level, settle its charger and bill it."""
+        success, msg, vehicle_info = self.parking_lot.remove_vehicle_from_level(level, slot_number, is_ev)
         if not success:
             return False, msg, None
 
@@ -100,24 +310,18 @@ class ParkingApplicationService:
 
         # Handle EV charger
         if is_ev:
-            level = self.parking_lot.get_level(city_name, site_name, level_number)
-            idx = slot_number - 1
-            charger_id = level.ev_slot_chargers.get(idx)
-            if charger_id:
-                # Stop and release charger
-                self.charger_controller.stop_charging(charger_id)
-                self.charger_controller.release_charger(charger_id)
+            charger_id = level.charger_for_slot(slot_number)
+            # Settle, stop and release the vehicle's own session
+            session_kwh = (
+                self.charger_controller.end_session(charger_id, vehicle.get_regnum())
+                if charger_id else None
+            )
+            if session_kwh is not None:
+                kwh_delivered = session_kwh
                 # Assign to waiting vehicle
                 self.auto_assign_waiting_vehicle(charger_id)
-
-                # If vehicle was fully charged, take battery capacity
-                if vehicle.ev_behavior.is_fully_charged():
-                    kwh_delivered = vehicle.ev_behavior.battery_capacity_kwh
-                else:
-                    session = self.charger_controller.charger_usage.get(charger_id)
-                    if session and session.get("vehicle_reg") == vehicle.get_regnum():
-                        self.charger_controller.update_kwh(charger_id)
-                        kwh_delivered = session.get("kwh_delivered", 0.0)
+            # Otherwise the session already completed and billing reads the
+            # energy recorded on the vehicle's EV behavior
 
         # Calculate billing
         billing_summary = self.exit_bill(
@@ -129,6 +333,75 @@ class ParkingApplicationService:
 
         return True, msg, billing_summary
 
+    @instrumented("remove_many", scoped=False)
+    @durable
+    def remove_many(self, requests):
+        """
+        Remove and bill a burst of vehicles, resolving each level once.
+        A failing item does not abort the batch.
+
+        Args:
+            requests (iterable of dict): Either a 'regnum' key, or city_name,
+                site_name, level_number, slot_number and optional is_ev.
+
+        Returns:
+            list of tuple: (success, message, billing_summary) per request, in order.
+        """
+        levels = {}
+        results = []
+
+        for request in requests:
+            try:
+                if "regnum" in request:
+                    location = self.parking_lot.locate_vehicle(request["regnum"])
+                    if not location:
+                        results.append((False, f"Vehicle {request['regnum']} is not parked", None))
+                        continue
+                    request = location
+                key = (request["city_name"], request["site_name"], request["level_number"])
+                slot_number = int(request["slot_number"])
+                is_ev = bool(request.get("is_ev", False))
+            except (KeyError, TypeError, ValueError) as e:
+                results.append((False, f"Invalid remove request: {e}", None))
+                continue
+
+            if key not in levels:
+                try:
+                    levels[key] = self.parking_lot.get_level(*key)
+                except KeyError as e:
+                    levels[key] = str(e)
+            level = levels[key]
+            if isinstance(level, str):
+                results.append((False, level, None))
+                continue
+
+            results.append(self._remove_and_bill(level, slot_number, is_ev))
+
+        return results
+
+    def locate_vehicle(self, regnum):
+        """Return the fleet-wide location of a parked vehicle, or None if not parked."""
+        return self.parking_lot.locate_vehicle(regnum)
+
+    def remove_vehicle_by_regnum(self, regnum):
+        """
+        Remove a vehicle knowing only its registration number (exit gate flow).
+
+        Returns:
+            tuple: (success (bool), message (str), billing_summary (dict or None))
+        """
+        location = self.parking_lot.locate_vehicle(regnum)
+        if not location:
+            return False, f"Vehicle {regnum} is not parked", None
+
+        return self.remove_vehicle_and_process(
+            location["city_name"],
+            location["site_name"],
+            location["level_number"],
+            location["slot_number"],
+            location["is_ev"]
+        )
+
     def ev_status_update(self, charger_id, vehicle, slot_number):
         """
         Assign EV to a charger if available, or put in waiting queue.
@@ -138,19 +411,27 @@ class ParkingApplicationService:
         if not level:
             return False, f"Charger {charger_id} not found"
 
-        # Check charger status via ChargerController
-        status_info = self.charger_controller.get_charger_status(charger_id)
+        with level.lock:
+            # Check charger status via ChargerController
+            status_info = self.charger_controller.get_charger_status(charger_id)
 
-        if status_info["charger_status"] == "available":
-            # Start charging
-            self.charger_controller.start_charging(charger_id, vehicle, slot_number)
-            return True, f"Started charging {vehicle.get_regnum()} on {charger_id}"
-        else:
-            # Add to waiting queue
-            queue = level.charger_waiting_queue[charger_id]
-            if slot_number not in queue:
+            if status_info["charger_status"] == "available":
+                # Start charging
+                self.charger_controller.start_charging(charger_id, vehicle, slot_number)
+                level.plug_charger(charger_id, slot_number)
+                return True, f"Started charging {vehicle.get_regnum()} on {charger_id}"
+            else:
+                # Add to waiting queue
+                queue = level.waiting_queue_for(slot_number)
                 queue.append(slot_number)
-            return False, f"Charger busy, added {vehicle.get_regnum()} (slot {slot_number}) to waiting queue"
+                return False, f"Charger busy, added {vehicle.get_regnum()} (slot {slot_number}) to waiting queue"
+
+    def _queue_depths(self):
+        """Yield (city_name, site_name, EVs queued) per level for the charger_queue_length gauge."""
+        for city in list(self.parking_lot.cities.values()):
+            for site in list(city.sites.values()):
+                for level in list(site.levels.values()):
+                    yield level.city_name, level.site_name, level.waiting_queue_depth()
 
     def auto_assign_waiting_vehicle(self, charger_id):
         """Assign first waiting EV to the charger if available."""
@@ -158,26 +439,117 @@ class ParkingApplicationService:
         if not level:
             return
 
-        queue = level.charger_waiting_queue.get(charger_id, deque())
-        # Check if charger is already available before popping
-        status_info = self.charger_controller.get_charger_status(charger_id)
-        if status_info["charger_status"] != "available":
+        with level.lock:
+            if level.pooled_chargers:
+                self._reassign_pooled_charger(level, charger_id)
+                return
+            queue = level.charger_waiting_queue.get(charger_id, WaitingQueue())
+            # Check if charger is already available before popping
+            status_info = self.charger_controller.get_charger_status(charger_id)
+            if status_info["charger_status"] != "available":
+                return
+
+            while queue:
+                slot_number = queue.popleft()
+                vehicle = self.parking_lot.get_vehicle_in_ev_slot(
+                    level.city_name,
+                    level.site_name,
+                    level.level_number,
+                    slot_number
+                )
+                if vehicle:
+                    # Delegate to charger controller
+                    self.ev_status_update(charger_id, vehicle, slot_number)
+                    break
+                # Departing EVs are purged on removal; skip any slot emptied otherwise
+
+    def _reassign_pooled_charger(self, level, charger_id):
+        """Hand a released pooled charger to the first waiting EV, or return it to the free pool."""
+        if self.charger_controller.get_charger_status(charger_id)["charger_status"] != "available":
             return
-
+        level.unplug_charger(charger_id)
+        queue = level.pooled_waiting_queue
         while queue:
             slot_number = queue.popleft()
-            vehicle = self.parking_lot.get_vehicle_in_ev_slot(
-                level.city_name,
-                level.site_name,
-                level.level_number,
-                slot_number
-            )
-            if vehicle:
-                # Delegate to charger controller
-                self.ev_status_update(charger_id, vehicle, slot_number)
+            vehicle = level.get_vehicle(slot_number, True)
+            if vehicle and not vehicle.ev_behavior.is_fully_charged():
+                self.charger_controller.start_charging(charger_id, vehicle, slot_number)
+                level.plug_charger(charger_id, slot_number)
                 break
-            # skip empty slots automatically
+        else:
+            level.free_chargers.append(charger_id)
+
+    @durable
+    def set_site_power_budget(self, city_name, site_name, limit_kw, policy="equal"):
+        """
+        Cap the total charging power of a site and choose how it is shared.
+
+        Args:
+            limit_kw (float or None): Grid connection cap in kW; None lifts it.
+            policy (str): equal, earliest_departure or lowest_soc.
+
+        Returns:
+            tuple: (success (bool), message (str))
+        """
+        city = self.parking_lot.cities.get(city_name)
+        site = city.sites.get(site_name) if city else None
+        if site is None:
+            return False, f"Site {site_name} not found in city {city_name}"
+        try:
+            budget = SitePowerBudget(limit_kw, policy) if limit_kw is not None else None
+        except ValueError as e:
+            return False, str(e)
+        with self.parking_lot.topology_lock:
+            site.power_budget = budget
+            charger_ids = [cid for level in site.levels.values() for cid in level.charger_ids]
+            self.charger_controller.set_power_budget(charger_ids, budget)
+        if budget is None:
+            return True, f"Power cap lifted for site {site_name}"
+        return True, f"Site {site_name} capped at {limit_kw} kW ({policy})"
+
+    def get_site_power(self, city_name, site_name):
+        """
+        Return the power cap of a site and the rates allocated under it.
 
+        Returns:
+            tuple: (success (bool), message (str), dict or None) with limit_kw,
+            policy, allocated_kw and per-session rate_kw / max_kw.
+        """
+        city = self.parking_lot.cities.get(city_name)
+        site = city.sites.get(site_name) if city else None
+        if site is None:
+            return False, f"Site {site_name} not found in city {city_name}", None
+        if site.power_budget is None:
+            return True, f"Site {site_name} has no power cap", None
+        power = site.power_budget.as_dict()
+        return True, f"{power['allocated_kw']} of {power['limit_kw']} kW allocated", power
+
+    def get_waiting_queues(self, city_name, site_name, level_number):
+        """
+        Return the charger waiting queues of a level.
+
+        Returns:
+            tuple: (success (bool), message (str), list of dict) with
+            charger_id, depth and the queued slots in service order, per charger.
+            A level with pooled chargers has one queue, with charger_id None.
+        """
+        try:
+            level = self.parking_lot.get_level(city_name, site_name, level_number)
+        except KeyError as e:
+            return False, str(e), []
+        with level.lock:
+            if level.pooled_chargers:
+                pooled = level.pooled_waiting_queue
+                queues = [{"charger_id": None, "depth": len(pooled), "slots": list(pooled)}]
+            else:
+                queues = [
+                    {"charger_id": charger_id, "depth": len(queue), "slots": list(queue)}
+                    for charger_id, queue in level.charger_waiting_queue.items()
+                ]
+        depth = sum(queue["depth"] for queue in queues)
+        return True, f"{depth} EVs waiting on level {level_number}", queues
+
+    @instrumented("get_ev_charge_status")
     def get_ev_charge_status(self, city_name, site_name, level_number):
         """Return the charge status of all EVs in a level."""
         # Proper attribute access
@@ -194,23 +566,14 @@ class ParkingApplicationService:
             return []
 
         charge_list = []
-        for idx, vehicle in enumerate(level.ev_slots):
-            if vehicle == -1:
-                continue
-            slot = idx + 1
+        for slot, vehicle in level.iter_vehicles(is_ev=True):
             charger_id = self.get_charger_for_slot(vehicle, city_name, site_name, level_number, slot)
             session = self.charger_controller.charger_usage.get(charger_id) if charger_id else None
 
             if session and session.get("vehicle_reg") == vehicle.get_regnum():
-                prev_status = session.get("status")
-                self.charger_controller.update_kwh(charger_id)
-
-                # Automatically assign waiting EV if charging just completed
-                if prev_status == "charging" and session.get("status") == "full":
-                    self.auto_assign_waiting_vehicle(charger_id)
-
+                # Read-only projection; completions are fired by process_charging_events
                 status = session.get("status")
-                kwh = session.get("kwh_delivered", 0.0)
+                kwh = self.charger_controller.get_session_kwh(charger_id)
                 start_time = session.get("start_time")
             else:
                 # Vehicle not currently in a session
@@ -242,8 +605,7 @@ class ParkingApplicationService:
         """Return charger_id assigned to the given EV slot"""
         try:
             level = self.parking_lot.get_level(city_name, site_name, level_number)
-            idx = slot_number - 1
-            return level.ev_slot_chargers.get(idx)
+            return level.charger_for_slot(slot_number)
         except KeyError:
             return None
 
@@ -0,0 +1,299 @@
+"""
+Headless command-line front-end: runs scripted parking operations from a
+file or stdin without loading Tk.
+
+One command per line; blank lines and lines starting with # are ignored.
+Arguments are shell-quoted ("Model S").
+
+    lot CITY SITE LEVELS REGULAR EV [CHARGERS]
+    park CITY SITE LEVEL REG MAKE MODEL COLOR [ev|motor]
+    remove CITY SITE LEVEL SLOT [ev]
+    remove REG
+    search CITY SITE LEVEL regnum|color|make|model VALUE
+    status CITY SITE LEVEL
+    charge CITY SITE LEVEL
+    locate REG
+    occupancy [CITY [SITE [LEVEL]]]
+    queues CITY SITE LEVEL
+    report
+    tick
+
+With --batch, runs of consecutive park or remove commands are executed
+through park_many / remove_many.
+
+Failed commands, including operations that report success False, are
+printed to stderr and make the exit status 1.
+
+Run:
+    python ParkingCLI.py [SCRIPT | -] [--batch] [--json] [--data-dir DIR]
+"""
+import argparse
+import json
+import shlex
+import sys
+
+from ParkingLot import ParkingLot
+from ParkingApplicationService import ParkingApplicationService
+from ParkingEntities import SEARCHABLE_ATTRIBUTES
+
+
+class CommandError(Exception):
+    pass
+
+
+def _int(value, name):
+    try:
+        return int(value)
+    except ValueError:
+        raise CommandError(f"{name} must be an integer, got {value!r}") from None
+
+
+def _level_args(args):
+    return args[0], args[1], _int(args[2], "LEVEL")
+
+
+def _park_request(args):
+    flags = {flag.lower() for flag in args[7:]}
+    unknown = flags - {"ev", "motor"}
+    if unknown:
+        raise CommandError(f"Unknown park flag(s): {', '.join(sorted(unknown))}")
+    city_name, site_name, level_number = _level_args(args)
+    return {
+        "city_name": city_name, "site_name": site_name, "level_number": level_number,
+        "reg": args[3], "make": args[4], "model": args[5], "color": args[6],
+        "ev_car": "ev" in flags, "motor": "motor" in flags
+    }
+
+
+def _remove_request(args):
+    if len(args) == 1:
+        return {"regnum": args[0]}
+    if len(args) == 5 and args[4].lower() != "ev":
+        raise CommandError(f"Unknown remove flag: {args[4]}")
+    city_name, site_name, level_number = _level_args(args)
+    return {
+        "city_name": city_name, "site_name": site_name, "level_number": level_number,
+        "slot_number": _int(args[3], "SLOT"), "is_ev": len(args) == 5
+    }
+
+
+class CommandRunner:
+    """Executes parsed CLI commands against a ParkingApplicationService."""
+
+    # command -> (allowed argument counts, usage)
+    COMMANDS = {
+        "lot": ((5, 6), "lot CITY SITE LEVELS REGULAR EV [CHARGERS]"),
+        "park": ((7, 8), "park CITY SITE LEVEL REG MAKE MODEL COLOR [ev|motor]"),
+        "remove": ((1, 4, 5), "remove CITY SITE LEVEL SLOT [ev] | remove REG"),
+        "search": ((5,), "search CITY SITE LEVEL ATTR VALUE"),
+        "status": ((3,), "status CITY SITE LEVEL"),
+        "charge": ((3,), "charge CITY SITE LEVEL"),
+        "locate": ((1,), "locate REG"),
+        "occupancy": ((0, 1, 2, 3), "occupancy [CITY [SITE [LEVEL]]]"),
+        "queues": ((3,), "queues CITY SITE LEVEL"),
+        "report": ((0,), "report"),
+        "tick": ((0,), "tick"),
+    }
+
+    def __init__(self, app_service, json_output=False, out=sys.stdout, err=sys.stderr):
+        self.app_service = app_service
+        self.json_output = json_output
+        self.out = out
+        self.err = err
+        self.errors = 0
+
+    # ---------------- Parsing ----------------
+    def parse(self, lines):
+        """Yield (line_number, command, args) for each command line; bad lines are reported."""
+        for line_number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                command, *args = shlex.split(line)
+            except ValueError as e:
+                self._error(line_number, str(e))
+                continue
+            command = command.lower()
+            spec = self.COMMANDS.get(command)
+            if spec is None:
+                self._error(line_number, f"Unknown command {command!r}")
+            elif len(args) not in spec[0]:
+                self._error(line_number, f"Usage: {spec[1]}")
+            else:
+                yield line_number, command, args
+
+    # ---------------- Execution ----------------
+    def run(self, lines, batch=False):
+        """
+        Execute every command in lines.
+
+        Returns:
+            int: Number of lines that failed to parse or execute, including
+                operations that returned success False.
+        """
+        pending = []  # consecutive (line_number, command, args) of one batchable command
+        for parsed in self.parse(lines):
+            if batch and parsed[1] in ("park", "remove"):
+                if pending and pending[0][1] != parsed[1]:
+                    self._flush(pending)
+                pending.append(parsed)
+                continue
+            self._flush(pending)
+            self._execute(*parsed)
+        self._flush(pending)
+        return self.errors
+
+    def _execute(self, line_number, command, args):
+        try:
+            result = getattr(self, f"cmd_{command}")(args)
+        except (CommandError, KeyError, ValueError) as e:
+            self._error(line_number, str(e))
+            return
+        self._emit(line_number, command, result)
+
+    def _flush(self, pending):
+        """Run a run of park or remove commands as a single park_many / remove_many call."""
+        if not pending:
+            return
+        command = pending[0][1]
+        build = _park_request if command == "park" else _remove_request
+        requests, lines = [], []
+        for line_number, _, args in pending:
+            try:
+                requests.append(build(args))
+                lines.append(line_number)
+            except CommandError as e:
+                self._error(line_number, str(e))
+        batch_call = self.app_service.park_many if command == "park" else self.app_service.remove_many
+        for line_number, result in zip(lines, batch_call(requests)):
+            self._emit(line_number, command, self._format_result(command, result))
+        pending.clear()
+
+    @staticmethod
+    def _format_result(command, result):
+        success, msg, extra = result
+        key = "slot" if command == "park" else "bill"
+        return {"success": success, "message": msg, key: extra}
+
+    # ---------------- Commands ----------------
+    def cmd_lot(self, args):
+        success, msg = self.app_service.make_lot(
+            _int(args[3], "REGULAR"), _int(args[4], "EV"), _int(args[2], "LEVELS"),
+            args[1], args[0], _int(args[5], "CHARGERS") if len(args) == 6 else 0
+        )
+        return {"success": success, "message": msg}
+
+    def cmd_park(self, args):
+        request = _park_request(args)
+        return self._format_result("park", self.app_service.park_vehicle_and_assign(
+            request["city_name"], request["site_name"], request["level_number"], request["reg"],
+            request["make"], request["model"], request["color"], request["ev_car"], request["motor"]
+        ))
+
+    def cmd_remove(self, args):
+        request = _remove_request(args)
+        if "regnum" in request:
+            result = self.app_service.remove_vehicle_by_regnum(request["regnum"])
+        else:
+            result = self.app_service.remove_vehicle_and_process(
+                request["city_name"], request["site_name"], request["level_number"],
+                request["slot_number"], request["is_ev"]
+            )
+        return self._format_result("remove", result)
+
+    def cmd_search(self, args):
+        attr = args[3].lower()
+        if attr not in SEARCHABLE_ATTRIBUTES:
+            raise CommandError(f"ATTR must be one of {', '.join(SEARCHABLE_ATTRIBUTES)}")
+        level = self.app_service.parking_lot.get_level(*_level_args(args))
+        reg_slots, ev_slots = level.find_slots(attr, args[4])
+        return {"regular_slots": reg_slots, "ev_slots": ev_slots}
+
+    def cmd_status(self, args):
+        return self.app_service.parking_lot.get_parking_status(*_level_args(args))
+
+    def cmd_charge(self, args):
+        return self.app_service.get_ev_charge_status(*_level_args(args))
+
+    def cmd_locate(self, args):
+        return self.app_service.locate_vehicle(args[0])
+
+    def cmd_occupancy(self, args):
+        if len(args) == 3:
+            args = _level_args(args)
+        return self.app_service.parking_lot.get_occupancy(*args)
+
+    def cmd_queues(self, args):
+        success, msg, queues = self.app_service.get_waiting_queues(*_level_args(args))
+        return {"success": success, "message": msg, "queues": queues}
+
+    def cmd_report(self, args):
+        return self.app_service.parking_lot.get_occupancy_summary()
+
+    def cmd_tick(self, args):
+        return {"completed": self.app_service.process_charging_events()}
+
+    # ---------------- Output ----------------
+    def _emit(self, line_number, command, result):
+        failed = isinstance(result, dict) and result.get("success") is False
+        if failed:
+            self._error(line_number, result.get("message", f"{command} failed"))
+        if self.json_output:
+            print(json.dumps({"line": line_number, "command": command, "result": result},
+                             default=str), file=self.out)
+            return
+        if failed:
+            return  # already reported on stderr
+        if isinstance(result, dict) and "message" in result:
+            text = result["message"]
+            if result.get("bill"):
+                text += f" (total {result['bill']['total']:.2f})"
+        elif command == "report":
+            text = "\n".join(
+                f"  {r['city_name']}/{r['site_name']}/L{r['level_number']}: "
+                f"regular {r['regular_occupied']}/{r['regular_occupied'] + r['regular_free']}, "
+                f"EV {r['ev_occupied']}/{r['ev_occupied'] + r['ev_free']}"
+                for r in result
+            ) or "  (no levels)"
+            text = "Occupancy:\n" + text
+        else:
+            text = json.dumps(result, default=str)
+        print(f"{line_number}: {text}", file=self.out)
+
+    def _error(self, line_number, message):
+        self.errors += 1
+        print(f"{line_number}: error: {message}", file=self.err)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run parking commands headlessly from a script or stdin")
+    parser.add_argument("script", nargs="?", default="-", help="Command file, or - for stdin")
+    parser.add_argument("--batch", action="store_true",
+                        help="Run consecutive park/remove commands as park_many/remove_many")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per command")
+    parser.add_argument("--data-dir", help="Journal and snapshot directory (enables persistence)")
+    args = parser.parse_args(argv)
+
+    app_service = ParkingApplicationService(ParkingLot())
+    persistence = None
+    if args.data_dir:
+        from ParkingPersistence import PersistenceManager
+        persistence = PersistenceManager(app_service, args.data_dir)
+        persistence.recover()
+
+    runner = CommandRunner(app_service, json_output=args.json)
+    try:
+        if args.script == "-":
+            errors = runner.run(sys.stdin, batch=args.batch)
+        else:
+            with open(args.script, encoding="utf-8") as f:
+                errors = runner.run(f, batch=args.batch)
+    finally:
+        if persistence:
+            persistence.close()
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
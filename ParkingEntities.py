@@ -1,17 +1,194 @@
 from datetime import datetime, timezone
-from collections import deque
+from collections import OrderedDict
+from array import array
+import heapq
+import threading
+import Config
+from CompactStorage import VehicleTable
+
+# Vehicle attributes indexed per level for searching
+SEARCHABLE_ATTRIBUTES = ("regnum", "color", "make", "model")
+
+
+def normalize_search_value(value):
+    """Normalize an attribute value for case-insensitive index lookups."""
+    return str(value).lower()
+
+
+# Charge states counted for parked EVs
+EV_CHARGE_STATES = ("charging", "waiting", "full")
+
+
+class OccupancyCounters:
+    """
+    Rolling slot and EV charge-state counts of one level, site, city or the
+    whole fleet. A change made on a level's counters is rolled up into every
+    ancestor as well, so any scope answers "how full" in O(1).
+
+    Every node has its own lock. A level applies a change under its lock,
+    then rolls the same deltas up one ancestor at a time, each under that
+    ancestor's lock and with no other counters lock held. Levels never
+    contend on a shared lock, and each node's counts stay consistent with
+    one another; a parent may briefly lag its levels. Attach a node before
+    it is used.
+    """
+    __slots__ = ("parent", "lock", "regular_capacity", "ev_capacity",
+                 "regular_occupied", "ev_occupied", "charging", "waiting", "full")
+
+    def __init__(self, regular_capacity=0, ev_capacity=0):
+        self.parent = None
+        self.lock = threading.Lock()
+        self.regular_capacity = regular_capacity
+        self.ev_capacity = ev_capacity
+        self.regular_occupied = 0
+        self.ev_occupied = 0
+        self.charging = 0
+        self.waiting = 0
+        self.full = 0
+
+    def attach(self, parent):
+        """Make parent the next scope up and add this node's counts to it."""
+        with self.lock:
+            self.parent = parent
+            counts = {field: getattr(self, field) for field in self.__slots__[2:]}
+        self._roll_up(counts)
+
+    def _add(self, field, delta):
+        """Apply delta to field on this node only. Caller holds self.lock."""
+        setattr(self, field, getattr(self, field) + delta)
+
+    def _roll_up(self, deltas):
+        """
+        Apply {field: delta} to every ancestor, one node lock at a time.
+        Caller holds no counters lock.
+        """
+        node = self.parent
+        while node is not None:
+            with node.lock:
+                for field, delta in deltas.items():
+                    setattr(node, field, getattr(node, field) + delta)
+            node = node.parent
+
+    @property
+    def regular_free(self):
+        return self.regular_capacity - self.regular_occupied
+
+    @property
+    def ev_free(self):
+        return self.ev_capacity - self.ev_occupied
+
+    @property
+    def occupied(self):
+        return self.regular_occupied + self.ev_occupied
+
+    @property
+    def free(self):
+        return self.regular_free + self.ev_free
+
+    def as_dict(self):
+        """Return a consistent snapshot of every count."""
+        with self.lock:
+            return {
+                "regular_occupied": self.regular_occupied,
+                "regular_free": self.regular_free,
+                "ev_occupied": self.ev_occupied,
+                "ev_free": self.ev_free,
+                "occupied": self.occupied,
+                "free": self.free,
+                "charging": self.charging,
+                "waiting": self.waiting,
+                "full": self.full
+            }
+
+
+class WaitingQueue:
+    """
+    FIFO of EV slot numbers waiting for one charger.
+
+    An ordered set: enqueue, dequeue, membership and removal of any slot
+    are all O(1), and a slot is queued at most once. Guarded by the
+    owning level's lock.
+    """
+    __slots__ = ("_slots",)
+
+    def __init__(self, slots=()):
+        self._slots = OrderedDict.fromkeys(slots)
+
+    def append(self, slot_number):
+        """Queue slot_number at the back; returns False if it was already queued."""
+        if slot_number in self._slots:
+            return False
+        self._slots[slot_number] = None
+        return True
+
+    def popleft(self):
+        """Dequeue the slot at the front; raises IndexError if the queue is empty."""
+        try:
+            return self._slots.popitem(last=False)[0]
+        except KeyError:
+            raise IndexError("pop from an empty waiting queue") from None
+
+    def discard(self, slot_number):
+        """Drop slot_number wherever it is queued; returns True if it was queued."""
+        return self._slots.pop(slot_number, False) is None
+
+    def clear(self):
+        self._slots.clear()
+
+    def __contains__(self, slot_number):
+        return slot_number in self._slots
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __iter__(self):
+        return iter(self._slots)
+
+    def __eq__(self, other):
+        if not isinstance(other, WaitingQueue):
+            return NotImplemented
+        return list(self._slots) == list(other._slots)
+
+    def __repr__(self):
+        return f"WaitingQueue({list(self._slots)})"
+
 
 class Level:
-    def __init__(self, city_name, site_name, level_number, num_regular_slots, num_ev_slots, num_chargers):
-        """Initialize a Level with EV and regular slots and chargers."""
+    def __init__(self, city_name, site_name, level_number, num_regular_slots, num_ev_slots, num_chargers,
+                 pooled_chargers=False):
+        """
+        Initialize a Level with EV and regular slots and chargers.
+
+        By default each EV slot has a fixed charger (slot i -> charger i % n)
+        and waits for it. With pooled_chargers, any free charger of the level
+        serves the next EV of one level-wide FIFO.
+        """
         self.city_name = city_name
         self.site_name = site_name
         self.level_number = level_number
-        self.ev_slots = [-1] * num_ev_slots
-        self.regular_slots = [-1] * num_regular_slots
-        self.num_occupied_ev = 0
-        self.num_occupied_regular = 0
-        self.parked_vehicles = {}
+        self.num_ev_slots = num_ev_slots
+        self.num_regular_slots = num_regular_slots
+        self._init_slot_storage(num_regular_slots, num_ev_slots)
+        # Occupied and EV charge-state counts, rolled up into the site, city and fleet
+        self.counters = OccupancyCounters(num_regular_slots, num_ev_slots)
+        # EV slot number -> [vehicle, charge state]; guarded by counters.lock
+        self.ev_charge_states = {}
+
+        # Serializes every mutation of this level (slots, counters, indexes,
+        # waiting queues). Status reads do not take it: slot storage never
+        # resizes and each slot is updated with a single store.
+        self.lock = threading.RLock()
+
+        # Free slot indices per slot class, kept as min-heaps so the lowest
+        # free slot is always handed out first (range() output is already a heap)
+        self.free_ev_slots = list(range(num_ev_slots))
+        self.free_regular_slots = list(range(num_regular_slots))
+
+        # Secondary indexes: is_ev -> attribute -> normalized value -> slot number or set of slot numbers
+        self.search_index = {
+            is_ev: {attr: {} for attr in SEARCHABLE_ATTRIBUTES}
+            for is_ev in (False, True)
+        }
 
         # Generate ChargerIDs
         city_code = city_name[:3] if len(city_name) >= 3 else city_name
@@ -24,90 +201,364 @@ class Level:
         if self.charger_ids:
             self.ev_slot_chargers = {
                 i: self.charger_ids[i % len(self.charger_ids)]
-                for i in range(len(self.ev_slots))
+                for i in range(num_ev_slots)
             }
         else:
             self.ev_slot_chargers = {}
 
-        self.charger_waiting_queue = {cid: deque() for cid in self.charger_ids}
-
-    def park_vehicle(self, vehicle):
-        """Park a vehicle in the appropriate slot and return the assigned slot number."""
-        assigned_slot = None
-
-        if vehicle.is_ev():
-            for i, slot in enumerate(self.ev_slots):
-                if slot == -1:
-                    self.ev_slots[i] = vehicle
-                    self.num_occupied_ev += 1
-                    assigned_slot = i + 1
-                    break
-            if assigned_slot is None:
-                raise ValueError("No EV slots available")
+        self.pooled_chargers = pooled_chargers
+        if pooled_chargers:
+            self.charger_waiting_queue = {}
+            # Level-wide FIFO of EV slots waiting for any charger
+            self.pooled_waiting_queue = WaitingQueue()
+            # Idle chargers, handed out in FIFO order
+            self.free_chargers = WaitingQueue(self.charger_ids)
+            # slot number <-> charger ID of the EVs plugged in
+            self.plugged_chargers = {}
+            self.plugged_slots = {}
         else:
-            for i, slot in enumerate(self.regular_slots):
-                if slot == -1:
-                    self.regular_slots[i] = vehicle
-                    self.num_occupied_regular += 1
-                    assigned_slot = i + 1
-                    break
-            if assigned_slot is None:
-                raise ValueError("No regular slots available")
+            self.charger_waiting_queue = {cid: WaitingQueue() for cid in self.charger_ids}
+
+    # ---------------- Slot storage ----------------
+    def _init_slot_storage(self, num_regular_slots, num_ev_slots):
+        """Create per-slot storage: lists of Vehicle objects with -1 for free slots."""
+        self.ev_slots = [-1] * num_ev_slots
+        self.regular_slots = [-1] * num_regular_slots
+        self.parked_vehicles = {}
 
+    def _store_vehicle(self, idx, vehicle, is_ev, start_time):
+        """Place vehicle in slot index idx of the given class."""
+        (self.ev_slots if is_ev else self.regular_slots)[idx] = vehicle
         # --- FIX: use tuple key with slot number and is_ev for uniqueness ---
-        key = (assigned_slot, vehicle.is_ev())
-        self.parked_vehicles[key] = {
+        self.parked_vehicles[(idx + 1, is_ev)] = {
             "vehicle": vehicle,
-            "start_time": datetime.now(timezone.utc),
-            "slot_number": assigned_slot
+            "start_time": start_time,
+            "slot_number": idx + 1
         }
 
-        return assigned_slot
+    def _clear_vehicle(self, idx, is_ev):
+        """Empty slot index idx and return the parking start time."""
+        # --- lookup using the tuple key ---
+        record = self.parked_vehicles.pop((idx + 1, is_ev), None)
+        if not record:
+            raise ValueError("Vehicle record not found")
+        (self.ev_slots if is_ev else self.regular_slots)[idx] = -1
+        return record["start_time"]
 
-    def remove_vehicle(self, slot_number, is_ev=False):
-        """Remove a vehicle from a slot and return removal info including timestamps."""
+    def get_vehicle(self, slot_number, is_ev):
+        """Return the vehicle in the given slot, or None if empty or invalid."""
+        slots = self.ev_slots if is_ev else self.regular_slots
         idx = slot_number - 1
+        if 0 <= idx < len(slots):
+            vehicle = slots[idx]
+            if vehicle != -1:
+                return vehicle
+        return None
+
+    def iter_vehicles(self, is_ev):
+        """Yield (slot_number, vehicle) for every occupied slot of the class, in slot order."""
+        for idx, vehicle in enumerate(self.ev_slots if is_ev else self.regular_slots):
+            if vehicle != -1:
+                yield idx + 1, vehicle
+
+    def get_start_time(self, slot_number, is_ev):
+        """Return when the vehicle in the given slot was parked, or None if empty."""
+        record = self.parked_vehicles.get((slot_number, is_ev))
+        return record["start_time"] if record else None
 
-        # Determine if vehicle is EV if not provided
-        if is_ev is None:
-            if idx < len(self.ev_slots) and self.ev_slots[idx] != -1:
-                is_ev = True
-            elif idx < len(self.regular_slots) and self.regular_slots[idx] != -1:
-                is_ev = False
+    # ---------------- Counters ----------------
+    @property
+    def num_occupied_ev(self):
+        return self.counters.ev_occupied
+
+    @property
+    def num_occupied_regular(self):
+        return self.counters.regular_occupied
+
+    def _count_parked(self, vehicle, slot_number, is_ev):
+        """Count a vehicle that has just been stored; EVs start waiting (or full)."""
+        counters = self.counters
+        with counters.lock:
+            if is_ev:
+                state = "full" if vehicle.ev_behavior.is_fully_charged() else "waiting"
+                self.ev_charge_states[slot_number] = [vehicle, state]
+                deltas = {"ev_occupied": 1, state: 1}
             else:
-                raise ValueError("Slot empty or invalid")
+                deltas = {"regular_occupied": 1}
+            for field, delta in deltas.items():
+                counters._add(field, delta)
+        counters._roll_up(deltas)
 
-        # Select the vehicle from the appropriate slot
-        if is_ev:
-            if 0 <= idx < len(self.ev_slots) and self.ev_slots[idx] != -1:
-                vehicle = self.ev_slots[idx]
+    def _count_parked_many(self, parked):
+        """Count a batch of (vehicle, slot_number) just stored, rolling each field up once."""
+        deltas = dict.fromkeys(("regular_occupied", "ev_occupied") + EV_CHARGE_STATES, 0)
+        counters = self.counters
+        with counters.lock:
+            for vehicle, slot_number in parked:
+                if vehicle.is_ev():
+                    state = "full" if vehicle.ev_behavior.is_fully_charged() else "waiting"
+                    self.ev_charge_states[slot_number] = [vehicle, state]
+                    deltas["ev_occupied"] += 1
+                    deltas[state] += 1
+                else:
+                    deltas["regular_occupied"] += 1
+            deltas = {field: delta for field, delta in deltas.items() if delta}
+            for field, delta in deltas.items():
+                counters._add(field, delta)
+        counters._roll_up(deltas)
+
+    def _count_removed(self, slot_number, is_ev):
+        counters = self.counters
+        with counters.lock:
+            if is_ev:
+                entry = self.ev_charge_states.pop(slot_number, None)
+                deltas = {"ev_occupied": -1}
+                if entry:
+                    deltas[entry[1]] = -1
             else:
-                raise ValueError("Invalid EV slot number or empty")
-        else:
-            if 0 <= idx < len(self.regular_slots) and self.regular_slots[idx] != -1:
-                vehicle = self.regular_slots[idx]
+                deltas = {"regular_occupied": -1}
+            for field, delta in deltas.items():
+                counters._add(field, delta)
+        counters._roll_up(deltas)
+
+    def set_ev_charge_state(self, slot_number, vehicle, state):
+        """
+        Move the EV parked in slot_number to a charge state (charging, waiting
+        or full). Ignored if vehicle is no longer the one in that slot, so a
+        late charger update cannot count a departed EV.
+
+        Returns:
+            bool: True if the state was recorded.
+        """
+        if state not in EV_CHARGE_STATES:
+            raise ValueError(f"Unknown EV charge state: {state}")
+        counters = self.counters
+        with counters.lock:
+            entry = self.ev_charge_states.get(slot_number)
+            if entry is None or entry[0] is not vehicle:
+                return False
+            if entry[1] == state:
+                return True
+            deltas = {entry[1]: -1, state: 1}
+            counters._add(entry[1], -1)
+            counters._add(state, 1)
+            entry[1] = state
+        counters._roll_up(deltas)
+        return True
+
+    def get_ev_charge_state(self, slot_number):
+        """Return the counted charge state of the EV in slot_number, or None if empty."""
+        entry = self.ev_charge_states.get(slot_number)
+        return entry[1] if entry else None
+
+    def restore_vehicles(self, placements):
+        """
+        Put vehicles back into known slots (recovery), bypassing slot allocation.
+
+        Args:
+            placements (iterable of tuple): (slot_number, vehicle, start_time).
+        """
+        with self.lock:
+            free = {True: set(self.free_ev_slots), False: set(self.free_regular_slots)}
+            for slot_number, vehicle, start_time in placements:
+                is_ev = vehicle.is_ev()
+                idx = slot_number - 1
+                if idx not in free[is_ev]:
+                    raise ValueError(f"Slot {slot_number} is not free")
+                free[is_ev].discard(idx)
+                self._store_vehicle(idx, vehicle, is_ev, start_time)
+                self._index_vehicle(vehicle, slot_number, is_ev)
+                self._count_parked(vehicle, slot_number, is_ev)
+
+            # Rebuild the free-slot heaps once (a sorted list is a valid min-heap)
+            self.free_ev_slots = sorted(free[True])
+            self.free_regular_slots = sorted(free[False])
+
+    # ---------------- Chargers and waiting queues ----------------
+    def charger_for_slot(self, slot_number):
+        """
+        Return the charger serving an EV slot: its fixed charger, or with
+        pooled chargers the one it is plugged into (None while waiting).
+        """
+        if self.pooled_chargers:
+            return self.plugged_chargers.get(slot_number)
+        return self.ev_slot_chargers.get(slot_number - 1)
+
+    def waiting_queue_for(self, slot_number):
+        """Return the queue an EV slot waits in for a charger, or None if the level has none."""
+        if self.pooled_chargers:
+            return self.pooled_waiting_queue if self.charger_ids else None
+        charger_id = self.ev_slot_chargers.get(slot_number - 1)
+        return self.charger_waiting_queue[charger_id] if charger_id else None
+
+    def dequeue_waiting(self, slot_number):
+        """Drop an EV slot from its waiting queue; returns True if it was queued."""
+        with self.lock:
+            queue = self.waiting_queue_for(slot_number)
+            return queue.discard(slot_number) if queue is not None else False
+
+    def waiting_queue_depth(self):
+        """Return the number of EVs queued for any charger of this level."""
+        if self.pooled_chargers:
+            return len(self.pooled_waiting_queue)
+        return sum(len(queue) for queue in list(self.charger_waiting_queue.values()))
+
+    def claim_free_charger(self):
+        """Take an idle pooled charger (O(1)); returns None if all are in use. Caller holds the lock."""
+        return self.free_chargers.popleft() if self.free_chargers else None
+
+    def plug_charger(self, charger_id, slot_number):
+        """Record that the EV in slot_number is plugged into a pooled charger. Caller holds the lock."""
+        if self.pooled_chargers:
+            self.free_chargers.discard(charger_id)
+            self.plugged_chargers[slot_number] = charger_id
+            self.plugged_slots[charger_id] = slot_number
+
+    def unplug_charger(self, charger_id):
+        """Forget the EV plugged into a pooled charger. Caller holds the lock."""
+        if self.pooled_chargers:
+            slot_number = self.plugged_slots.pop(charger_id, None)
+            if self.plugged_chargers.get(slot_number) == charger_id:
+                del self.plugged_chargers[slot_number]
+
+    def has_free_slot(self, is_ev):
+        """Return True if at least one slot of the given class is free."""
+        return bool(self.free_ev_slots if is_ev else self.free_regular_slots)
+
+    def _index_vehicle(self, vehicle, slot_number, is_ev):
+        """Add a parked vehicle to the secondary search indexes."""
+        # A value held by a single slot maps to the bare slot number; a set is
+        # only allocated once a second slot shares the value (saves a set per regnum)
+        for attr, index in self.search_index[is_ev].items():
+            key = normalize_search_value(getattr(vehicle, attr))
+            slots = index.get(key)
+            if slots is None:
+                index[key] = slot_number
+            elif isinstance(slots, set):
+                slots.add(slot_number)
             else:
-                raise ValueError("Invalid regular slot number or empty")
+                index[key] = {slots, slot_number}
 
-        # --- lookup using the tuple key ---
-        key = (slot_number, is_ev)
-        record = self.parked_vehicles.get(key)
-        if not record:
-            raise ValueError("Vehicle record not found")
+    def _unindex_vehicle(self, vehicle, slot_number, is_ev):
+        """Remove a departing vehicle from the secondary search indexes."""
+        for attr, index in self.search_index[is_ev].items():
+            key = normalize_search_value(getattr(vehicle, attr))
+            slots = index.get(key)
+            if slots is None:
+                continue
+            if isinstance(slots, set):
+                slots.discard(slot_number)
+                if len(slots) == 1:
+                    index[key] = next(iter(slots))
+            elif slots == slot_number:
+                del index[key]
 
-        start_time = record["start_time"]
-        end_time = datetime.now(timezone.utc)
+    def _indexed_slots(self, is_ev, attr, key):
+        """Return the sorted slot numbers stored under key in one index."""
+        slots = self.search_index[is_ev][attr].get(key)
+        if slots is None:
+            return []
+        if isinstance(slots, set):
+            return sorted(slots)
+        return [slots]
 
-        # Free the slot
-        if is_ev:
-            self.ev_slots[idx] = -1
-            self.num_occupied_ev = max(0, self.num_occupied_ev - 1)
-        else:
-            self.regular_slots[idx] = -1
-            self.num_occupied_regular = max(0, self.num_occupied_regular - 1)
+    def find_slots(self, attr, value):
+        """
+        Return (reg_slots, ev_slots) sorted slot numbers whose vehicle attribute
+        matches value case-insensitively.
 
-        # Remove the record
-        del self.parked_vehicles[key]
+        Raises:
+            ValueError: If attr is not a searchable attribute.
+        """
+        if attr not in SEARCHABLE_ATTRIBUTES:
+            raise ValueError(f"Unsupported search attribute: {attr}")
+        key = normalize_search_value(value)
+        with self.lock:
+            return self._indexed_slots(False, attr, key), self._indexed_slots(True, attr, key)
+
+    def park_vehicle(self, vehicle):
+        """Park a vehicle in the appropriate slot and return the assigned slot number."""
+        is_ev = vehicle.is_ev()
+        with self.lock:
+            if is_ev:
+                if not self.free_ev_slots:
+                    raise ValueError("No EV slots available")
+                idx = heapq.heappop(self.free_ev_slots)
+            else:
+                if not self.free_regular_slots:
+                    raise ValueError("No regular slots available")
+                idx = heapq.heappop(self.free_regular_slots)
+
+            assigned_slot = idx + 1
+            self._store_vehicle(idx, vehicle, is_ev, datetime.now(timezone.utc))
+            self._index_vehicle(vehicle, assigned_slot, is_ev)
+            # Counters move only once the slot is filled, so lock-free readers
+            # never see more occupied slots than stored vehicles
+            self._count_parked(vehicle, assigned_slot, is_ev)
+
+        return assigned_slot
+
+    def park_vehicles(self, vehicles):
+        """
+        Park a batch of vehicles in one pass under the level lock; slots are
+        handed out in list order, lowest free slot first.
+
+        Returns:
+            list: The assigned slot number per vehicle, or None where its
+            slot class was already full.
+        """
+        now = datetime.now(timezone.utc)
+        slots = []
+        with self.lock:
+            for vehicle in vehicles:
+                is_ev = vehicle.is_ev()
+                free = self.free_ev_slots if is_ev else self.free_regular_slots
+                if not free:
+                    slots.append(None)
+                    continue
+                idx = heapq.heappop(free)
+                self._store_vehicle(idx, vehicle, is_ev, now)
+                self._index_vehicle(vehicle, idx + 1, is_ev)
+                slots.append(idx + 1)
+            self._count_parked_many(
+                [(vehicle, slot) for vehicle, slot in zip(vehicles, slots) if slot is not None]
+            )
+        return slots
+
+    def remove_vehicle(self, slot_number, is_ev=False):
+        """Remove a vehicle from a slot and return removal info including timestamps."""
+        idx = slot_number - 1
+
+        with self.lock:
+            # Determine if vehicle is EV if not provided
+            if is_ev is None:
+                if self.get_vehicle(slot_number, True) is not None:
+                    is_ev = True
+                elif self.get_vehicle(slot_number, False) is not None:
+                    is_ev = False
+                else:
+                    raise ValueError("Slot empty or invalid")
+
+            # Select the vehicle from the appropriate slot
+            vehicle = self.get_vehicle(slot_number, is_ev)
+            if vehicle is None:
+                if is_ev:
+                    raise ValueError("Invalid EV slot number or empty")
+                raise ValueError("Invalid regular slot number or empty")
+
+            start_time = self._clear_vehicle(idx, is_ev)
+            end_time = datetime.now(timezone.utc)
+
+            # Free the slot
+            self._count_removed(slot_number, is_ev)
+            if is_ev:
+                heapq.heappush(self.free_ev_slots, idx)
+            else:
+                heapq.heappush(self.free_regular_slots, idx)
+
+            self._unindex_vehicle(vehicle, slot_number, is_ev)
+            if is_ev:
+                self.dequeue_waiting(slot_number)
 
         return {
             "vehicle": vehicle,
@@ -118,39 +569,176 @@ class Level:
         }
 
 
+class CompactLevel(Level):
+    """
+    Level for very large decks: each slot class is an array('i') of
+    VehicleTable row ids (-1 = free) instead of a list of Vehicle objects,
+    and regular vehicles are only rebuilt as objects when the API asks for them.
+
+    Opt-in: it roughly halves memory per parked vehicle (benchmarks/bench_memory),
+    but get_vehicle / iter_vehicles return a new object for a regular vehicle
+    on every call, and the ev_slots / regular_slots views build a list per access.
+    """
+
+    def _init_slot_storage(self, num_regular_slots, num_ev_slots):
+        self.ev_slot_rows = array("i", [-1]) * num_ev_slots
+        self.regular_slot_rows = array("i", [-1]) * num_regular_slots
+        self.vehicle_table = VehicleTable()
+
+    def _store_vehicle(self, idx, vehicle, is_ev, start_time):
+        rows = self.ev_slot_rows if is_ev else self.regular_slot_rows
+        rows[idx] = self.vehicle_table.add(vehicle, start_time.timestamp())
+
+    def _clear_vehicle(self, idx, is_ev):
+        rows = self.ev_slot_rows if is_ev else self.regular_slot_rows
+        row = rows[idx]
+        if row == -1:
+            raise ValueError("Vehicle record not found")
+        rows[idx] = -1
+        return datetime.fromtimestamp(self.vehicle_table.remove(row), timezone.utc)
+
+    def _read_slot(self, rows, idx):
+        """
+        Build the vehicle in rows[idx] without taking the level lock; the row
+        id is re-checked afterwards so a concurrently freed row is never returned.
+        """
+        row = rows[idx]
+        if row == -1:
+            return None
+        vehicle = self.vehicle_table.vehicle(row)
+        return vehicle if rows[idx] == row else None
+
+    def get_vehicle(self, slot_number, is_ev):
+        rows = self.ev_slot_rows if is_ev else self.regular_slot_rows
+        idx = slot_number - 1
+        if 0 <= idx < len(rows):
+            return self._read_slot(rows, idx)
+        return None
+
+    def iter_vehicles(self, is_ev):
+        rows = self.ev_slot_rows if is_ev else self.regular_slot_rows
+        for idx in range(len(rows)):
+            if rows[idx] != -1:
+                vehicle = self._read_slot(rows, idx)
+                if vehicle is not None:
+                    yield idx + 1, vehicle
+
+    def get_start_time(self, slot_number, is_ev):
+        rows = self.ev_slot_rows if is_ev else self.regular_slot_rows
+        idx = slot_number - 1
+        if 0 <= idx < len(rows) and rows[idx] != -1:
+            return datetime.fromtimestamp(self.vehicle_table.start_time[rows[idx]], timezone.utc)
+        return None
+
+    # Read-only list views kept for callers of the list-based Level layout
+    @property
+    def ev_slots(self):
+        return [self.vehicle_table.vehicle(row) if row != -1 else -1 for row in self.ev_slot_rows]
+
+    @property
+    def regular_slots(self):
+        return [self.vehicle_table.vehicle(row) if row != -1 else -1 for row in self.regular_slot_rows]
+
+
+class ChargerRegistry:
+    """Fleet-wide index mapping each charger ID to its Level and the EV slots it serves."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._chargers = {}  # key: charger_id -> (Level, tuple of EV slot numbers)
+
+    def register_level(self, level):
+        """
+        Register every charger of a Level.
+
+        Raises:
+            ValueError: If any of the level's charger IDs is already registered.
+        """
+        collisions = [cid for cid in level.charger_ids if cid in self._chargers]
+        if collisions:
+            raise ValueError(f"Charger ID collision: {', '.join(collisions)} already registered")
+
+        slots_by_charger = {cid: [] for cid in level.charger_ids}
+        for idx, cid in level.ev_slot_chargers.items():
+            slots_by_charger[cid].append(idx + 1)
+
+        for cid, slots in slots_by_charger.items():
+            self._chargers[cid] = (level, tuple(slots))
+
+    def get_level(self, charger_id):
+        """Return the Level containing the charger, or None if not registered."""
+        entry = self._chargers.get(charger_id)
+        return entry[0] if entry else None
+
+    def get_slots(self, charger_id):
+        """Return the EV slot numbers served by the charger (empty if not registered)."""
+        entry = self._chargers.get(charger_id)
+        return entry[1] if entry else ()
+
+    def __contains__(self, charger_id):
+        return charger_id in self._chargers
+
+    def __len__(self):
+        return len(self._chargers)
+
+
 class Site:
-    def __init__(self, site_name, city_name):
+    def __init__(self, site_name, city_name, charger_registry=None):
         """Initialize a Site with a name, city, and levels dictionary."""
         self.site_name = site_name
         self.city_name = city_name
         self.levels = {}
+        self.charger_registry = charger_registry
+        self.counters = OccupancyCounters()
+        # SitePowerBudget capping the site's chargers, or None
+        self.power_budget = None
+
+    def add_level(self, level_number, num_regular, num_ev, chargers, compact=None, pooled_chargers=False):
+        """
+        Add a Level to this Site.
 
-    def add_level(self, level_number, num_regular, num_ev, chargers):
-        """Add a Level to this Site."""
+        compact selects CompactLevel storage; None uses Config.COMPACT_LEVELS.
+        pooled_chargers lets any free charger serve any EV slot of the level.
+        """
         if level_number in self.levels:
             return False, f"Level {level_number} already exists in site {self.site_name}"
-        self.levels[level_number] = Level(
+        if compact is None:
+            compact = Config.COMPACT_LEVELS
+        level_cls = CompactLevel if compact else Level
+        level = level_cls(
             city_name=self.city_name,
             site_name=self.site_name,
             level_number=level_number,
             num_regular_slots=num_regular,
             num_ev_slots=num_ev,
-            num_chargers=chargers
+            num_chargers=chargers,
+            pooled_chargers=pooled_chargers
         )
+        if self.charger_registry is not None:
+            try:
+                self.charger_registry.register_level(level)
+            except ValueError as e:
+                return False, f"Level {level_number} not added to site {self.site_name}: {e}"
+        level.counters.attach(self.counters)
+        self.levels[level_number] = level
         return True, f"Level {level_number} added to site {self.site_name}"
 
 
 class City:
-    def __init__(self, city_name):
+    def __init__(self, city_name, charger_registry=None):
         """Initialize a City with a name and dictionary of Sites."""
         self.city_name = city_name
         self.sites = {}
+        self.charger_registry = charger_registry
+        self.counters = OccupancyCounters()
 
     def add_site(self, site_name):
         """Add a Site to this City."""
         if site_name in self.sites:
             return False, f"Site {site_name} already exists in city {self.city_name}"
-        self.sites[site_name] = Site(site_name, self.city_name)
+        site = Site(site_name, self.city_name, self.charger_registry)
+        site.counters.attach(self.counters)
+        self.sites[site_name] = site
         return True, f"Site {site_name} added to city {self.city_name}"
 
     def get_or_create_site(self, site_name):
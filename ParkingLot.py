@@ -0,0 +1,525 @@
+import threading
+from ParkingEntities import City, ChargerRegistry, OccupancyCounters, normalize_search_value
+from DomainEvents import EventBus
+from Instrumentation import Instrumentation
+
+# ---------------- Main ParkingLot class ----------------
+class ParkingLot:
+    """Aggregate root representing the parking lot containing multiple cities."""
+
+    def __init__(self):
+        """Initialize an empty parking lot with no cities."""
+        self.cities = {}  # key: city_name -> City object
+        self.charger_registry = ChargerRegistry()
+        # key: normalized regnum -> (city_name, site_name, level_number, slot_number, is_ev)
+        self.vehicle_locations = {}
+        # Guards vehicle_locations check-and-reserve; levels carry their own lock
+        self._locations_lock = threading.Lock()
+        # Serializes creation of cities, sites and levels
+        self.topology_lock = threading.RLock()
+        # Domain events (parked, removed, level_added, charging_*) for journaling and observers
+        self.events = EventBus()
+        # Fleet-wide occupancy and charge-state counts (root of every city's counters)
+        self.counters = OccupancyCounters()
+        # Latency histograms and counters of the hot paths (disabled until enabled)
+        self.instruments = Instrumentation()
+
+    def get_or_create_city(self, city_name):
+        """
+        Retrieve an existing city or create a new one if not present.
+
+        Args:
+            city_name (str): Name of the city.
+
+        Returns:
+            City: City object corresponding to the name.
+        """
+        with self.topology_lock:
+            if city_name not in self.cities:
+                city = City(city_name, self.charger_registry)
+                city.counters.attach(self.counters)
+                self.cities[city_name] = city
+            return self.cities[city_name]
+
+    def _find_level_by_charger(self, charger_id):
+        """
+        Find the Level entity that contains the specified charger.
+
+        Args:
+            charger_id (str): Charger identifier.
+
+        Returns:
+            Level or None: Level object containing the charger, or None if not found.
+        """
+        return self.charger_registry.get_level(charger_id)
+
+    def get_level(self, city_name: str, site_name: str, level_number: int):
+        """
+        Returns the Level entity for the given city, site, and level number.
+
+        Args:
+            city_name (str): Name of the city.
+            site_name (str): Name of the site.
+            level_number (int): Level number within the site.
+
+        Raises:
+            KeyError: If city, site, or level does not exist.
+
+        Returns:
+            Level: The Level object for the specified identifiers.
+        """
+        city = self.cities.get(city_name)
+        if not city:
+            raise KeyError(f"City '{city_name}' not found")
+
+        site = city.sites.get(site_name)
+        if not site:
+            raise KeyError(f"Site '{site_name}' not found in city '{city_name}'")
+
+        level = site.levels.get(level_number)
+        if not level:
+            raise KeyError(f"Level {level_number} not found in site '{site_name}', city '{city_name}'")
+
+        return level
+
+    # ---------------- Parking ----------------
+    def park_vehicle(self, city_name, site_name, level_number, vehicle):
+        """
+        Application-facing delegation method for parking a vehicle.
+
+        Responsibilities:
+        - Load the Level aggregate.
+        - Delegate parking logic to Level.
+        - Translate domain errors into user-friendly responses.
+
+        Returns:
+            tuple: (success (bool), message (str), assigned_slot (int or None))
+        """
+        try:
+            level = self.get_level(city_name, site_name, level_number)
+        except KeyError as e:
+            return False, str(e), None
+
+        return self.park_vehicle_on_level(level, vehicle)
+
+    def park_vehicle_on_level(self, level, vehicle):
+        """
+        Park a vehicle on an already resolved Level and record its location.
+
+        Returns:
+            tuple: (success (bool), message (str), assigned_slot (int or None))
+        """
+        reg_key = normalize_search_value(vehicle.get_regnum())
+        with self._locations_lock:
+            if reg_key in self.vehicle_locations:
+                return False, f"Vehicle {vehicle.get_regnum()} is already parked", None
+            # Reserve the plate so a concurrent gate cannot park it twice
+            self.vehicle_locations[reg_key] = None
+
+        try:
+            with level.lock:
+                assigned_slot = level.park_vehicle(vehicle)
+                # Still under level.lock: a slot-based remove cannot pop the
+                # entry before it is written and leave a stale location behind
+                with self._locations_lock:
+                    self.vehicle_locations[reg_key] = (
+                        level.city_name, level.site_name, level.level_number, assigned_slot, vehicle.is_ev()
+                    )
+                if self.events:
+                    self._publish_parked(level, assigned_slot, vehicle)
+        except ValueError as e:
+            with self._locations_lock:
+                self.vehicle_locations.pop(reg_key, None)
+            if self.instruments:
+                self.instruments.count("failed_allocations", level.city_name, level.site_name)
+            return False, str(e), None
+
+        return True, self._parked_message(level, vehicle, assigned_slot), assigned_slot
+
+    def park_vehicles_on_level(self, level, vehicles):
+        """
+        Park a batch of vehicles on one already resolved Level: plates are
+        reserved in one pass, then every slot is allocated, located and
+        published under a single hold of the level lock.
+
+        Returns:
+            list of tuple: (success, message, assigned_slot) per vehicle, in order.
+        """
+        results = [None] * len(vehicles)
+        accepted = []  # (position, vehicle, reg_key)
+        with self._locations_lock:
+            for position, vehicle in enumerate(vehicles):
+                reg_key = normalize_search_value(vehicle.get_regnum())
+                if reg_key in self.vehicle_locations:
+                    results[position] = (False, f"Vehicle {vehicle.get_regnum()} is already parked", None)
+                    continue
+                self.vehicle_locations[reg_key] = None
+                accepted.append((position, vehicle, reg_key))
+
+        with level.lock:
+            slots = level.park_vehicles([vehicle for _, vehicle, _ in accepted])
+            with self._locations_lock:
+                for (_, vehicle, reg_key), slot in zip(accepted, slots):
+                    if slot is None:
+                        self.vehicle_locations.pop(reg_key, None)
+                    else:
+                        self.vehicle_locations[reg_key] = (
+                            level.city_name, level.site_name, level.level_number, slot, vehicle.is_ev()
+                        )
+            if self.events:
+                for (_, vehicle, _), slot in zip(accepted, slots):
+                    if slot is not None:
+                        self._publish_parked(level, slot, vehicle)
+
+        for (position, vehicle, _), slot in zip(accepted, slots):
+            if slot is not None:
+                results[position] = (True, self._parked_message(level, vehicle, slot), slot)
+                continue
+            results[position] = (False, f"No {'EV' if vehicle.is_ev() else 'regular'} slots available", None)
+            if self.instruments:
+                self.instruments.count("failed_allocations", level.city_name, level.site_name)
+        return results
+
+    @staticmethod
+    def _parked_message(level, vehicle, slot_number):
+        return (f"Parked {'EV' if vehicle.is_ev() else 'vehicle'} "
+                f"at slot {slot_number} on level {level.level_number}")
+
+    # ---------------- Removing ----------------
+    def remove_vehicle(self, city_name, site_name, level_number, slot_number, is_ev=False):
+        """
+        Application-facing delegation method for removing a vehicle.
+
+        Responsibilities:
+        - Load the Level aggregate.
+        - Delegate removal logic to Level.
+        - Enrich the returned domain data with location info.
+
+        Returns:
+            tuple: (success (bool), message (str), removal_info (dict or None))
+        """
+        try:
+            level = self.get_level(city_name, site_name, level_number)
+        except KeyError as e:
+            return False, str(e), None
+
+        return self.remove_vehicle_from_level(level, slot_number, is_ev)
+
+    def remove_vehicle_from_level(self, level, slot_number, is_ev=False):
+        """
+        Remove a vehicle from an already resolved Level and forget its location.
+
+        Returns:
+            tuple: (success (bool), message (str), removal_info (dict or None))
+        """
+        try:
+            with level.lock:
+                removal_info = level.remove_vehicle(slot_number, is_ev)
+                if self.events:
+                    self.events.publish(
+                        "removed",
+                        regnum=removal_info["vehicle"].get_regnum(),
+                        city_name=level.city_name,
+                        site_name=level.site_name,
+                        level_number=level.level_number,
+                        slot_number=slot_number,
+                        is_ev=bool(is_ev),
+                        ts=removal_info["end_time"].timestamp()
+                    )
+            with self._locations_lock:
+                self.vehicle_locations.pop(
+                    normalize_search_value(removal_info["vehicle"].get_regnum()), None
+                )
+
+            # Enrich domain result with location context
+            removal_info.update({
+                "city_name": level.city_name,
+                "site_name": level.site_name,
+                "level_number": level.level_number
+            })
+
+            return (
+                True,
+                f"Removed {'EV' if is_ev else 'vehicle'} from slot {slot_number}",
+                removal_info
+            )
+        except ValueError as e:
+            return False, str(e), None
+
+    def _publish_parked(self, level, slot_number, vehicle):
+        """Publish a 'parked' event carrying everything needed to rebuild the vehicle."""
+        is_ev = vehicle.is_ev()
+        self.events.publish(
+            "parked",
+            regnum=vehicle.get_regnum(),
+            make=vehicle.get_make(),
+            model=vehicle.get_model(),
+            color=vehicle.get_color(),
+            vehicle_type=vehicle.get_type(),
+            city_name=level.city_name,
+            site_name=level.site_name,
+            level_number=level.level_number,
+            slot_number=slot_number,
+            is_ev=is_ev,
+            battery_capacity_kwh=vehicle.ev_behavior.battery_capacity_kwh if is_ev else None,
+            charge_kwh=vehicle.ev_behavior.charge_kwh if is_ev else None,
+            ts=level.get_start_time(slot_number, is_ev).timestamp()
+        )
+
+    def restore_vehicles(self, level, placements):
+        """
+        Put vehicles back into known slots of a level (recovery) and index their plates.
+
+        Args:
+            level (Level): Target level.
+            placements (list of tuple): (slot_number, vehicle, start_time).
+        """
+        level.restore_vehicles(placements)
+        for slot_number, vehicle, _ in placements:
+            self.vehicle_locations[normalize_search_value(vehicle.get_regnum())] = (
+                level.city_name, level.site_name, level.level_number, slot_number, vehicle.is_ev()
+            )
+
+    def locate_vehicle(self, regnum):
+        """
+        Find where a vehicle is parked anywhere in the fleet.
+
+        Args:
+            regnum (str): Registration number (case-insensitive).
+
+        Returns:
+            dict or None: Keys 'city_name', 'site_name', 'level_number',
+            'slot_number' and 'is_ev', or None if the vehicle is not parked.
+        """
+        location = self.vehicle_locations.get(normalize_search_value(regnum))
+        if not location:
+            return None
+        city_name, site_name, level_number, slot_number, is_ev = location
+        return {
+            "city_name": city_name,
+            "site_name": site_name,
+            "level_number": level_number,
+            "slot_number": slot_number,
+            "is_ev": is_ev
+        }
+
+    # ---------------- Status ----------------
+    def get_ev_slots_info(self, city_name, site_name, level_number):
+        """
+        Return list of parked EVs with their slot number and vehicle object.
+
+        Returns:
+            list of dict: Each dict contains 'slot' and 'vehicle' keys.
+        """
+        try:
+            level = self.get_level(city_name, site_name, level_number)
+        except KeyError:
+            return []
+
+        return [
+            {"slot": slot, "vehicle": vehicle}
+            for slot, vehicle in level.iter_vehicles(is_ev=True)
+        ]
+
+    def get_parking_status(self, city_name, site_name, level_number):
+        """
+        Returns current parking status for regular and EV slots.
+
+        Returns:
+            dict: {'regular': [...], 'ev': [...]}, each with vehicle details.
+        """
+        try:
+            level = self.get_level(city_name, site_name, level_number)
+        except KeyError:
+            return {"regular": [], "ev": []}
+        status = {"regular": [], "ev": []}
+
+        # Regular slots
+        for slot, vehicle in level.iter_vehicles(is_ev=False):
+            vehicle_info = {
+                "slot": slot,
+                "regnum": vehicle.get_regnum(),
+                "make": vehicle.get_make(),
+                "model": vehicle.get_model(),
+                "color": vehicle.get_color(),
+                "type": vehicle.get_type()
+            }
+            status["regular"].append(vehicle_info)
+
+        # EV slots
+        for slot, vehicle in level.iter_vehicles(is_ev=True):
+            vehicle_info = {
+                "slot": slot,
+                "regnum": vehicle.get_regnum(),
+                "make": vehicle.get_make(),
+                "model": vehicle.get_model(),
+                "color": vehicle.get_color(),
+                "type": vehicle.get_type()
+            }
+            status["ev"].append(vehicle_info)
+
+        return status
+
+    def get_occupancy(self, city_name=None, site_name=None, level_number=None):
+        """
+        Returns the rolling occupancy counts of the fleet, a city, a site or a
+        level in O(1), without walking any slots.
+
+        Args:
+            city_name (str, optional): City scope; None for the whole fleet.
+            site_name (str, optional): Site scope within the city.
+            level_number (int, optional): Level scope within the site.
+
+        Raises:
+            KeyError: If a requested city, site or level does not exist.
+
+        Returns:
+            dict: Regular / EV occupied and free slots, their totals, and the
+            number of parked EVs charging, waiting for a charger and full.
+        """
+        if city_name is None:
+            return self.counters.as_dict()
+        city = self.cities.get(city_name)
+        if not city:
+            raise KeyError(f"City '{city_name}' not found")
+        if site_name is None:
+            return city.counters.as_dict()
+        if level_number is None:
+            site = city.sites.get(site_name)
+            if not site:
+                raise KeyError(f"Site '{site_name}' not found in city '{city_name}'")
+            return site.counters.as_dict()
+        return self.get_level(city_name, site_name, level_number).counters.as_dict()
+
+    def get_occupancy_summary(self):
+        """
+        Returns slot counts for every level in the lot.
+
+        Returns:
+            list of dict: One dict per level with its location and the
+            get_occupancy counts of that level.
+        """
+        summary = []
+        for city in list(self.cities.values()):
+            for site in list(city.sites.values()):
+                for level in list(site.levels.values()):
+                    row = {
+                        "city_name": level.city_name,
+                        "site_name": level.site_name,
+                        "level_number": level.level_number
+                    }
+                    row.update(level.counters.as_dict())
+                    summary.append(row)
+        return summary
+
+    def get_vehicle_in_ev_slot(self, city_name, site_name, level_number, slot_number):
+        """
+        Retrieve the vehicle object occupying a specific EV slot.
+
+        Returns:
+            Vehicle or None: Vehicle object if occupied, None if empty or invalid slot.
+        """
+        try:
+            level = self.get_level(city_name, site_name, level_number)
+        except KeyError:
+            return None
+        return level.get_vehicle(slot_number, is_ev=True)
+
+    # ---------------- Searching ----------------
+    def find_slots_by_regnum(self, city_name, site_name, level_number, regnum):
+        """
+        Find slots occupied by vehicles with the given registration number.
+
+        Returns:
+            tuple: (reg_slots, ev_slots) lists of slot numbers.
+        """
+        try:
+            level = self.get_level(city_name, site_name, int(level_number))
+        except KeyError as e:
+            return False, str(e)
+
+        return level.find_slots("regnum", regnum)
+
+    def find_slots_by_color(self, city_name, site_name, level_number, color):
+        """
+        Find slots occupied by vehicles of a given color.
+
+        Returns:
+            tuple: (reg_slots, ev_slots) lists of slot numbers.
+        """
+        try:
+            level = self.get_level(city_name, site_name, int(level_number))
+        except KeyError as e:
+            return False, str(e)
+
+        return level.find_slots("color", color)
+
+    def find_slots_by_model(self, city_name, site_name, level_number, model):
+        """
+        Find slots occupied by vehicles of a given model.
+
+        Returns:
+            tuple: (reg_slots, ev_slots) lists of slot numbers.
+        """
+        try:
+            level = self.get_level(city_name, site_name, int(level_number))
+        except KeyError as e:
+            return False, str(e)
+
+        return level.find_slots("model", model)
+
+    def find_slots_by_make(self, city_name, site_name, level_number, make):
+        """
+        Find slots occupied by vehicles of a given make.
+
+        Returns:
+            tuple: (reg_slots, ev_slots) lists of slot numbers.
+        """
+        try:
+            level = self.get_level(city_name, site_name, int(level_number))
+        except KeyError as e:
+            return False, str(e)
+
+        return level.find_slots("make", make)
+
+    def simulate_charging_hours(self, charger_id, hours, charger_controller):
+        """
+        !!! THIS IS ADDED TO SIMULATE THE CHARGING HARDWARE (ONLY FOR TESTING PURPOSE)
+        Simulate elapsed charging hours for a charger session.
+
+        Adjusts last_update and updates kWh delivered.
+
+        Args:
+            charger_id (str): Charger identifier.
+            hours (float): Number of hours to simulate.
+            charger_controller (ChargerController): Controller managing charger sessions.
+        """
+
+        level = self._find_level_by_charger(charger_id)
+        if not level:
+            return
+
+        session = charger_controller.charger_usage.get(charger_id)
+
+        if not session:
+            # Check first vehicle in queue or first slot
+            if level.pooled_chargers:
+                queue = level.pooled_waiting_queue
+            else:
+                queue = level.charger_waiting_queue.get(charger_id)
+            if queue and len(queue) > 0:
+                slot_number = queue.popleft()
+                vehicle = level.get_vehicle(slot_number, is_ev=True)
+            else:
+                vehicle = level.get_vehicle(1, is_ev=True)
+                if vehicle is None:
+                    return
+                slot_number = 1
+
+            charger_controller.start_charging(charger_id, vehicle, slot_number)
+            level.plug_charger(charger_id, slot_number)
+            session = charger_controller.charger_usage.get(charger_id)
+
+        # Rewind last_update
+        charger_controller.rewind_session(charger_id, hours)
+        charger_controller.update_kwh(charger_id)
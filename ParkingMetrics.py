@@ -0,0 +1,209 @@
+"""
+Per-site occupancy and charger metrics in the Prometheus text format.
+
+Gauges are read straight from the domain at scrape time: slot and EV
+charge-state counts from each level's rolling OccupancyCounters, charger
+counts from the level, queue depth from the charger waiting queues, power
+cap and allocation from the site's power budget (capped sites only). A
+scrape costs O(levels + chargers) and never walks the slots. Energy and
+session totals are counters fed by the charging_full / charging_stopped
+domain events.
+
+Run alongside the HTTP server:
+    python ParkingServer.py --metrics-port 9108
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# name -> (type, help)
+METRICS = {
+    "parking_slots_total": ("gauge", "Parking slots by kind."),
+    "parking_slots_free": ("gauge", "Free parking slots by kind."),
+    "parking_evs_parked": ("gauge", "Parked EVs by charge state."),
+    "parking_chargers_total": ("gauge", "EV chargers."),
+    "parking_chargers_in_use": ("gauge", "EV chargers with an active charging session."),
+    "parking_charger_utilization": ("gauge", "Fraction of EV chargers in use."),
+    "parking_charger_queue_depth": ("gauge", "EVs queued for a busy charger."),
+    "parking_power_limit_kw": ("gauge", "Site charging power cap."),
+    "parking_power_allocated_kw": ("gauge", "Charging power allocated under the site cap."),
+    "parking_kwh_delivered_total": ("counter", "Energy delivered by finished charging sessions."),
+    "parking_charging_sessions_total": ("counter", "Finished charging sessions by outcome."),
+    "parking_operation_latency_seconds": ("summary", "Latency of instrumented operations."),
+}
+
+_SESSION_OUTCOMES = {"charging_full": "full", "charging_stopped": "stopped"}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class ParkingMetrics:
+    """
+    Metrics registry of one ParkingApplicationService.
+
+    Args:
+        app_service (ParkingApplicationService): Service whose lot, chargers
+            and instrumentation are exported.
+    """
+
+    def __init__(self, app_service):
+        self.app_service = app_service
+        self.parking_lot = app_service.parking_lot
+        self._lock = threading.Lock()
+        # (city_name, site_name) -> kWh of finished sessions
+        self._kwh = {}
+        # (city_name, site_name, outcome) -> finished sessions
+        self._sessions = {}
+        self.parking_lot.events.subscribe(self._on_event)
+
+    def close(self):
+        self.parking_lot.events.unsubscribe(self._on_event)
+
+    def _on_event(self, event):
+        outcome = _SESSION_OUTCOMES.get(event["type"])
+        if outcome is None:
+            return
+        level = self.parking_lot._find_level_by_charger(event["charger_id"])
+        if level is None:
+            return
+        site_key = (level.city_name, level.site_name)
+        with self._lock:
+            self._kwh[site_key] = self._kwh.get(site_key, 0.0) + event["kwh_delivered"]
+            key = site_key + (outcome,)
+            self._sessions[key] = self._sessions.get(key, 0) + 1
+
+    # ---------------- Collection ----------------
+    def collect(self):
+        """
+        Return {series name: [(labels dict, value)]}, one entry per site
+        (per operation for latency).
+        """
+        samples = {name: [] for name in METRICS}
+        for name, (metric_type, _) in METRICS.items():
+            if metric_type == "summary":
+                samples[name + "_sum"] = []
+                samples[name + "_count"] = []
+        for city in list(self.parking_lot.cities.values()):
+            for site in list(city.sites.values()):
+                self._collect_site(samples, city.city_name, site)
+
+        with self._lock:
+            kwh = dict(self._kwh)
+            sessions = dict(self._sessions)
+        for (city_name, site_name), value in sorted(kwh.items()):
+            samples["parking_kwh_delivered_total"].append(
+                ({"city": city_name, "site": site_name}, round(value, 3)))
+        for (city_name, site_name, outcome), value in sorted(sessions.items()):
+            samples["parking_charging_sessions_total"].append(
+                ({"city": city_name, "site": site_name, "outcome": outcome}, value))
+
+        instruments = self.app_service.instruments
+        if instruments:
+            name = "parking_operation_latency_seconds"
+            for row in sorted(instruments.percentiles(scope="op", quantiles=(50, 90, 99)), key=lambda r: r["op"]):
+                labels = {"op": row["op"]}
+                for q in (50, 90, 99):
+                    samples[name].append(({**labels, "quantile": f"{q / 100:g}"}, round(row[f"p{q}_us"] / 1e6, 9)))
+                samples[name + "_sum"].append((labels, round(row["mean_us"] * row["count"] / 1e6, 6)))
+                samples[name + "_count"].append((labels, row["count"]))
+        return samples
+
+    @staticmethod
+    def _collect_site(samples, city_name, site):
+        labels = {"city": city_name, "site": site.site_name}
+        counts = site.counters.as_dict()
+        chargers = in_use = queued = 0
+        for level in list(site.levels.values()):
+            chargers += len(level.charger_ids)
+            in_use += level.counters.charging
+            queued += level.waiting_queue_depth()
+
+        regular_total = counts["regular_occupied"] + counts["regular_free"]
+        ev_total = counts["ev_occupied"] + counts["ev_free"]
+        samples["parking_slots_total"] += [
+            ({**labels, "kind": "regular"}, regular_total), ({**labels, "kind": "ev"}, ev_total)]
+        samples["parking_slots_free"] += [
+            ({**labels, "kind": "regular"}, counts["regular_free"]), ({**labels, "kind": "ev"}, counts["ev_free"])]
+        samples["parking_evs_parked"] += [
+            ({**labels, "state": state}, counts[state]) for state in ("charging", "waiting", "full")]
+        samples["parking_chargers_total"].append((labels, chargers))
+        samples["parking_chargers_in_use"].append((labels, in_use))
+        samples["parking_charger_utilization"].append((labels, round(in_use / chargers, 4) if chargers else 0.0))
+        samples["parking_charger_queue_depth"].append((labels, queued))
+        budget = site.power_budget
+        if budget is not None:
+            power = budget.as_dict()
+            samples["parking_power_limit_kw"].append((labels, power["limit_kw"]))
+            samples["parking_power_allocated_kw"].append((labels, power["allocated_kw"]))
+
+    def render(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        samples = self.collect()
+        lines = []
+        for name, (metric_type, help_text) in METRICS.items():
+            if not samples[name]:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            series = [name] + ([name + "_sum", name + "_count"] if metric_type == "summary" else [])
+            for series_name in series:
+                for labels, value in samples[series_name]:
+                    lines.append(f"{series_name}{_labels(**labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """
+    Serves ParkingMetrics.render() on GET /metrics from a background thread.
+
+    Args:
+        metrics (ParkingMetrics): Registry to render on every scrape.
+        host (str): Interface to bind; local only by default.
+        port (int): Port to bind; 0 picks a free one.
+    """
+
+    def __init__(self, metrics, host="127.0.0.1", port=9108):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # scrapes are too frequent to log
+
+        self.metrics = metrics
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self):
+        """(host, port) actually bound."""
+        return self._httpd.server_address[:2]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="metrics-exporter", daemon=True)
+        self._thread.start()
+        return self.address
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,482 @@
+from datetime import datetime, timezone
+import json
+import os
+import shutil
+import threading
+
+from BinarySnapshot import SnapshotView, encode_state
+from CompactStorage import VEHICLE_TYPES
+from ParkingEntities import CompactLevel
+
+SNAPSHOT_VERSION = 1
+_VEHICLE_CLASSES = {cls.__name__: cls for cls in VEHICLE_TYPES}
+
+
+def _from_ts(ts):
+    return datetime.fromtimestamp(ts, timezone.utc)
+
+
+class Journal:
+    """
+    Append-only JSON-lines journal of domain events. append() only
+    buffers; commit() writes and fsyncs everything buffered as one group.
+    The owner decides when a group is committed (see PersistenceManager).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._buffer = []
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def append(self, record):
+        """Buffer one event record until the next commit."""
+        self._buffer.append(json.dumps(record, separators=(",", ":")))
+
+    def take(self):
+        """Return the buffered records and start a new group."""
+        lines, self._buffer = self._buffer, []
+        return lines
+
+    def write(self, lines):
+        """Write and fsync a group of records returned by take()."""
+        if not lines:
+            return
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def commit(self):
+        """Write and fsync every buffered record."""
+        self.write(self.take())
+
+    def rotate(self, old_path):
+        """
+        Move the written records to old_path and continue in an empty file.
+
+        Records still buffered go to the new file. If old_path is left over
+        from an interrupted snapshot, the records are appended to it so
+        none is dropped before a snapshot covers them.
+        """
+        self._file.close()
+        if os.path.exists(old_path):
+            with open(self.path, encoding="utf-8") as src, open(old_path, "a", encoding="utf-8") as dst:
+                shutil.copyfileobj(src, dst)
+                dst.flush()
+                os.fsync(dst.fileno())
+        else:
+            os.replace(self.path, old_path)
+        self._file = open(self.path, "w", encoding="utf-8")
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self.commit()
+        self._file.close()
+
+    @staticmethod
+    def read(path, after_seq=0):
+        """Yield journaled records with seq > after_seq; torn lines from a crash are skipped."""
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record["seq"] > after_seq:
+                    yield record
+
+
+# ---------------- State capture / fold / rebuild ----------------
+def empty_state():
+    return {"version": SNAPSHOT_VERSION, "last_seq": 0, "levels": [], "vehicles": {}, "sessions": {}}
+
+
+def capture_state(app_service, last_seq):
+    """Walk the live domain and return a JSON-serializable state dict."""
+    parking_lot = app_service.parking_lot
+    controller = app_service.charger_controller
+    table = controller.state_table
+    state = empty_state()
+    state["last_seq"] = last_seq
+
+    # kWh produced by tick() but not yet handed to the vehicle, per regnum
+    unsynced = {}
+    # list() copies each dict atomically, so gates may keep running during a snapshot
+    for charger_id, session in list(controller.charger_usage.items()):
+        if session.status != "charging":
+            continue
+        h = session.handle
+        unsynced[session.vehicle_reg] = float(table.kwh[h] - table.kwh_synced[h])
+        state["sessions"][charger_id] = {
+            "regnum": session.vehicle_reg,
+            "slot_number": session.slot,
+            "start_ts": datetime.fromisoformat(session.start_time).timestamp(),
+            "last_update_ts": float(table.last_update[h]),
+            "kwh_delivered": float(table.kwh[h]),
+            "rate_kw": session.rate_kw,
+            "max_rate_kw": session.max_rate_kw
+        }
+
+    for city in list(parking_lot.cities.values()):
+        for site in list(city.sites.values()):
+            for level in list(site.levels.values()):
+                state["levels"].append({
+                    "city_name": level.city_name,
+                    "site_name": level.site_name,
+                    "level_number": level.level_number,
+                    "num_regular": level.num_regular_slots,
+                    "num_ev": level.num_ev_slots,
+                    "chargers": len(level.charger_ids),
+                    "compact": isinstance(level, CompactLevel),
+                    "pooled_chargers": level.pooled_chargers
+                })
+                for is_ev in (False, True):
+                    for slot_number, vehicle in level.iter_vehicles(is_ev):
+                        start_time = level.get_start_time(slot_number, is_ev)
+                        if start_time is None:  # left while the snapshot was taken
+                            continue
+                        record = {
+                            "make": vehicle.get_make(),
+                            "model": vehicle.get_model(),
+                            "color": vehicle.get_color(),
+                            "vehicle_type": vehicle.get_type(),
+                            "city_name": level.city_name,
+                            "site_name": level.site_name,
+                            "level_number": level.level_number,
+                            "slot_number": slot_number,
+                            "is_ev": is_ev,
+                            "start_ts": start_time.timestamp()
+                        }
+                        if is_ev:
+                            ev = vehicle.ev_behavior
+                            pending = unsynced.get(vehicle.get_regnum(), 0.0)
+                            record["battery_capacity_kwh"] = ev.battery_capacity_kwh
+                            record["charge_kwh"] = ev.charge_kwh + pending
+                            record["kwh_delivered_this_session"] = ev.kwh_delivered_this_session + pending
+                        state["vehicles"][vehicle.get_regnum()] = record
+    return state
+
+
+def apply_event(state, event):
+    """Fold one journaled event into a state dict."""
+    kind = event["type"]
+    vehicles = state["vehicles"]
+    if kind == "level_added":
+        spec = {
+            key: event[key]
+            for key in ("city_name", "site_name", "level_number", "num_regular", "num_ev", "chargers")
+        }
+        spec["pooled_chargers"] = event.get("pooled_chargers", False)
+        spec["compact"] = event.get("compact", False)
+        state["levels"].append(spec)
+    elif kind == "parked":
+        record = {
+            key: event[key]
+            for key in ("make", "model", "color", "vehicle_type", "city_name", "site_name",
+                        "level_number", "slot_number", "is_ev")
+        }
+        record["start_ts"] = event["ts"]
+        if event["is_ev"]:
+            record["battery_capacity_kwh"] = event["battery_capacity_kwh"]
+            record["charge_kwh"] = event["charge_kwh"]
+            record["kwh_delivered_this_session"] = 0.0
+        vehicles[event["regnum"]] = record
+    elif kind == "removed":
+        vehicles.pop(event["regnum"], None)
+    elif kind == "charging_started":
+        record = vehicles.get(event["regnum"])
+        if record is not None:
+            record["charge_kwh"] = event["charge_kwh"]
+        state["sessions"][event["charger_id"]] = {
+            "regnum": event["regnum"],
+            "slot_number": event["slot_number"],
+            "start_ts": event["ts"],
+            "last_update_ts": event["ts"],
+            "kwh_delivered": 0.0,
+            "rate_kw": event["rate_kw"]
+        }
+        if "max_rate_kw" in event:
+            state["sessions"][event["charger_id"]]["max_rate_kw"] = event["max_rate_kw"]
+    elif kind == "charging_rate_changed":
+        spec = state["sessions"].get(event["charger_id"])
+        if spec is not None and spec["regnum"] == event["regnum"]:
+            # The restored vehicle must hold the charge delivered up to last_update_ts
+            record = vehicles.get(event["regnum"])
+            if record is not None:
+                delta = event["kwh_delivered"] - spec["kwh_delivered"]
+                record["charge_kwh"] += delta
+                record["kwh_delivered_this_session"] += delta
+            spec["last_update_ts"] = event["ts"]
+            spec["kwh_delivered"] = event["kwh_delivered"]
+            spec["rate_kw"] = event["rate_kw"]
+            if "max_rate_kw" in event:
+                spec["max_rate_kw"] = event["max_rate_kw"]
+    elif kind in ("charging_stopped", "charging_full"):
+        record = vehicles.get(event["regnum"])
+        if record is not None:
+            record["charge_kwh"] = event["charge_kwh"]
+            record["kwh_delivered_this_session"] = event["kwh_delivered_this_session"]
+        state["sessions"].pop(event["charger_id"], None)
+    elif kind == "charger_released":
+        state["sessions"].pop(event["charger_id"], None)
+    state["last_seq"] = event["seq"]
+
+
+def rebuild_state(app_service, state):
+    """Materialize a state dict into an empty ParkingLot and ChargerController."""
+    parking_lot = app_service.parking_lot
+    controller = app_service.charger_controller
+
+    for spec in state["levels"]:
+        site = parking_lot.get_or_create_city(spec["city_name"]).get_or_create_site(spec["site_name"])
+        site.add_level(spec["level_number"], spec["num_regular"], spec["num_ev"], spec["chargers"],
+                       compact=spec.get("compact"), pooled_chargers=spec.get("pooled_chargers", False))
+
+    placements = {}
+    vehicles = {}
+    for regnum, record in state["vehicles"].items():
+        cls = _VEHICLE_CLASSES[record["vehicle_type"]]
+        if record["is_ev"]:
+            vehicle = cls(regnum, record["make"], record["model"], record["color"],
+                          battery_capacity_kwh=record["battery_capacity_kwh"])
+            vehicle.ev_behavior.charge_kwh = record["charge_kwh"]
+            vehicle.ev_behavior.kwh_delivered_this_session = record["kwh_delivered_this_session"]
+        else:
+            vehicle = cls(regnum, record["make"], record["model"], record["color"])
+        vehicles[regnum] = vehicle
+        key = (record["city_name"], record["site_name"], record["level_number"])
+        placements.setdefault(key, []).append(
+            (record["slot_number"], vehicle, _from_ts(record["start_ts"]))
+        )
+
+    for key, level_placements in placements.items():
+        parking_lot.restore_vehicles(parking_lot.get_level(*key), level_placements)
+
+    charging = set()
+    for charger_id, spec in state["sessions"].items():
+        vehicle = vehicles.get(spec["regnum"])
+        if vehicle is None:
+            continue
+        controller.restore_session(
+            charger_id, vehicle, spec["slot_number"], _from_ts(spec["start_ts"]),
+            _from_ts(spec["last_update_ts"]), spec["kwh_delivered"], spec["rate_kw"],
+            spec.get("max_rate_kw")
+        )
+        parking_lot._find_level_by_charger(charger_id).plug_charger(charger_id, spec["slot_number"])
+        charging.add(spec["regnum"])
+
+    # Waiting queues are rebuilt in arrival order from EVs that are neither charging nor full
+    waiting = sorted(
+        (record["start_ts"], regnum, record) for regnum, record in state["vehicles"].items()
+        if record["is_ev"] and regnum not in charging
+        and not vehicles[regnum].ev_behavior.is_fully_charged()
+    )
+    for _, _, record in waiting:
+        level = parking_lot.get_level(record["city_name"], record["site_name"], record["level_number"])
+        queue = level.waiting_queue_for(record["slot_number"])
+        if queue is not None:
+            queue.append(record["slot_number"])
+
+
+class PersistenceManager:
+    """
+    Journals every domain event of a ParkingApplicationService and takes
+    periodic snapshots so the lot can be rebuilt after a restart.
+
+    Call recover() once, before serving requests: it loads the latest
+    snapshot, replays the journal tail and then starts journaling.
+
+    The journal is write-ahead for the application service: its public
+    mutating methods call wait_durable() before returning, so an
+    acknowledged operation is on disk. Publishers only buffer their
+    records; whoever waits first writes and fsyncs everything pending as
+    one group while later publishers queue up behind it. A flusher thread
+    commits records nobody waits for (group_commit_events pending or
+    group_commit_seconds old) and takes the snapshots.
+    """
+
+    SNAPSHOT_FILE = "snapshot.bin"
+    JOURNAL_FILE = "journal.log"
+    OLD_JOURNAL_FILE = "journal.old"
+
+    def __init__(self, app_service, directory, snapshot_every=100_000,
+                 group_commit_events=256, group_commit_seconds=0.05):
+        self.app_service = app_service
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.snapshot_path = os.path.join(directory, self.SNAPSHOT_FILE)
+        self.journal_path = os.path.join(directory, self.JOURNAL_FILE)
+        self.old_journal_path = os.path.join(directory, self.OLD_JOURNAL_FILE)
+        self._group_commit = (group_commit_events, group_commit_seconds)
+        self.journal = None
+        self._flusher = None
+        self._stop_flusher = threading.Event()
+        self._wake_flusher = threading.Event()
+        self.last_seq = 0
+        self._durable_seq = 0
+        self._events_since_snapshot = 0
+        self._snapshot_due = False
+        self._handler = None
+        # Gates publish from several threads; sequence numbers and the buffer are shared
+        self._lock = threading.RLock()
+        # Held while a group is written and fsynced, so the next group forms behind it
+        self._io_lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        # Last sequence number published by each thread, for wait_durable()
+        self._published = threading.local()
+
+    def load_state(self):
+        """Return the snapshot state with the journal tail folded in."""
+        view = self.open_snapshot()
+        if view is not None:
+            with view:
+                state = view.to_state()
+        else:
+            state = empty_state()
+        # journal.old holds the records of a snapshot that was interrupted
+        for path in (self.old_journal_path, self.journal_path):
+            for event in Journal.read(path, after_seq=state["last_seq"]):
+                apply_event(state, event)
+        return state
+
+    def open_snapshot(self):
+        """
+        Map the latest snapshot read-only, e.g. to serve occupancy queries
+        while recover() is still running.
+
+        Returns:
+            SnapshotView or None: None if no snapshot has been written yet.
+        """
+        if not os.path.exists(self.snapshot_path):
+            return None
+        return SnapshotView(self.snapshot_path)
+
+    def recover(self):
+        """
+        Rebuild the (empty) application state from disk and start journaling.
+
+        Returns:
+            dict: Counts of recovered levels, vehicles and charging sessions.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        state = self.load_state()
+        rebuild_state(self.app_service, state)
+        self.last_seq = self._durable_seq = state["last_seq"]
+
+        self.journal = Journal(self.journal_path)
+        self._handler = self.app_service.parking_lot.events.subscribe(self._on_event)
+        self.app_service.persistence = self
+        self._stop_flusher.clear()
+        self._flusher = threading.Thread(target=self._flush_loop, name="journal-flusher", daemon=True)
+        self._flusher.start()
+
+        # Fire completions that became due while the process was down (journaled)
+        self.app_service.process_charging_events()
+
+        return {
+            "levels": len(state["levels"]),
+            "vehicles": len(state["vehicles"]),
+            "sessions": len(state["sessions"]),
+            "last_seq": self.last_seq
+        }
+
+    def _on_event(self, event):
+        # Runs on the publishing thread, usually under a level or charger lock: buffer only
+        with self._lock:
+            self.last_seq += 1
+            record = dict(event)
+            record["seq"] = self.last_seq
+            self.journal.append(record)
+            self._published.seq = self.last_seq
+            self._events_since_snapshot += 1
+            if self._events_since_snapshot >= self.snapshot_every:
+                self._events_since_snapshot = 0
+                self._snapshot_due = True
+                self._wake_flusher.set()
+            elif len(self.journal) >= self._group_commit[0]:
+                self._wake_flusher.set()
+
+    def wait_durable(self):
+        """
+        Block until every event published by the calling thread is fsynced.
+
+        Call it after releasing domain locks; the application service does
+        so before its mutating methods return.
+        """
+        seq = getattr(self._published, "seq", 0)
+        if seq > self._durable_seq:
+            self.commit(seq)
+
+    def _flush_loop(self):
+        """Commit records nobody waits for and take due snapshots off the gate threads."""
+        while not self._stop_flusher.is_set():
+            self._wake_flusher.wait(self._group_commit[1] or None)
+            self._wake_flusher.clear()
+            self.commit()
+            if self._snapshot_due:
+                self.snapshot()
+
+    def _write_pending(self):
+        """Write and fsync the buffered group; the caller holds _io_lock."""
+        with self._lock:
+            lines = self.journal.take()
+            seq = self.last_seq
+        self.journal.write(lines)
+        self._durable_seq = seq
+        return seq
+
+    def snapshot(self):
+        """
+        Write a compact snapshot of the live state and drop the journal
+        records it covers.
+
+        The journal is rotated first, so gates keep publishing into a
+        fresh file while the state is captured; records published during
+        the capture are replayed over it on recovery.
+        """
+        with self._snapshot_lock:
+            with self._io_lock:
+                with self._lock:
+                    self._snapshot_due = False
+                    self._events_since_snapshot = 0
+                last_seq = self._write_pending()
+                self.journal.rotate(self.old_journal_path)
+            state = capture_state(self.app_service, last_seq)
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(encode_state(state))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            os.remove(self.old_journal_path)
+
+    def commit(self, seq=None):
+        """
+        Force the pending group of journal records to disk.
+
+        Args:
+            seq (int, optional): Return without writing once this sequence
+                number is durable, e.g. committed by another thread's group.
+        """
+        with self._io_lock:
+            if self.journal and (seq is None or seq > self._durable_seq):
+                self._write_pending()
+
+    def close(self):
+        if self._handler:
+            self.app_service.parking_lot.events.unsubscribe(self._handler)
+            self._handler = None
+            self.app_service.persistence = None
+        if self._flusher:
+            self._stop_flusher.set()
+            self._wake_flusher.set()
+            self._flusher.join()
+            self._flusher = None
+        with self._io_lock:
+            if self.journal:
+                self.journal.close()
+                self.journal = None
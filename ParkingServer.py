@@ -0,0 +1,472 @@
+"""
+Headless asyncio HTTP/JSON front-end for ParkingApplicationService.
+
+Endpoints (JSON bodies and responses):
+    POST /lots            make_lot: num_regular, num_ev, levels, site_name, city_name, chargers, pooled_chargers
+    POST /park            city_name, site_name, level_number, reg, make, model, color, ev_car, motor
+    POST /remove          regnum, or city_name, site_name, level_number, slot_number, is_ev
+    GET  /search          ?city_name=&site_name=&level_number=&attr=regnum|color|make|model&value=
+    GET  /status          ?city_name=&site_name=&level_number=
+    GET  /charge-status   ?city_name=&site_name=&level_number=
+    GET  /occupancy       [?city_name=[&site_name=[&level_number=]]]
+    GET  /queues          ?city_name=&site_name=&level_number=  charger waiting queues
+    POST /power-budget    city_name, site_name, limit_kw (null lifts the cap), policy
+    GET  /power           ?city_name=&site_name=  site power cap and per-charger rates
+    GET  /locate          ?regnum=
+    GET  /latency         [?scope=op|city|site&op=]  percentiles (run with --instrument)
+    GET  /health
+
+Connections are HTTP/1.1 keep-alive with pipelining: requests are parsed
+ahead into a bounded per-connection queue and answered in order. Service
+calls run on a thread pool behind a semaphore (bounded concurrency); when
+too many requests are already waiting the server answers 503 instead of
+queueing more. A full pipeline queue stops reading from the socket, so
+slow consumers are pushed back through TCP.
+
+Run:
+    python ParkingServer.py [--host 127.0.0.1] [--port 8080] [--data-dir DIR] [--metrics-port 9108]
+"""
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import json
+import math
+from urllib.parse import urlsplit, parse_qsl
+
+from ParkingLot import ParkingLot
+from ParkingApplicationService import ParkingApplicationService
+from ParkingEntities import SEARCHABLE_ATTRIBUTES
+
+_REQUIRED = object()  # sentinel: the parameter has no default
+
+MAX_HEADER_LINES = 100
+MAX_BODY_BYTES = 1 << 20
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 414: "URI Too Long", 431: "Request Header Fields Too Large", 500: "Internal Server Error", 503: "Service Unavailable"
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_response(status, payload, keep_alive=True, extra_headers=()):
+    """Serialize an HTTP/1.1 response with a JSON body."""
+    body = json.dumps(payload, default=_json_default, separators=(",", ":")).encode("utf-8")
+    headers = [
+        f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}",
+        "Content-Type: application/json",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        *extra_headers
+    ]
+    return ("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body
+
+
+async def _readline(reader, status):
+    """Read one line; a line beyond the stream limit is answered with status."""
+    try:
+        return await reader.readline()
+    except ValueError:  # StreamReader raises it when the line exceeds its limit
+        raise HttpError(status, REASONS[status]) from None
+
+
+async def read_request(reader):
+    """
+    Parse one HTTP/1.1 request from the stream.
+
+    Returns:
+        tuple or None: (method, path, query dict, body dict, keep_alive), or
+        None when the peer closed the connection between requests.
+
+    Raises:
+        HttpError: On a malformed or oversized request.
+    """
+    line = await _readline(reader, 414)
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "Malformed request line") from None
+
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        header = await _readline(reader, 431)
+        if header in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = header.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HttpError(400, "Too many headers")
+
+    try:
+        length = int(headers.get("content-length", 0) or 0)
+    except ValueError:
+        raise HttpError(400, "Invalid Content-Length") from None
+    if length < 0:
+        raise HttpError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, "Request body too large")
+    body = {}
+    if length:
+        try:
+            body = json.loads(await reader.readexactly(length))
+        except json.JSONDecodeError:
+            raise HttpError(400, "Body is not valid JSON") from None
+        if not isinstance(body, dict):
+            raise HttpError(400, "Body must be a JSON object")
+
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+    url = urlsplit(target)
+    return method.upper(), url.path, dict(parse_qsl(url.query)), body, keep_alive
+
+
+class ParkingServer:
+    """
+    asyncio server translating HTTP/JSON requests into ParkingApplicationService calls.
+
+    Args:
+        app_service (ParkingApplicationService): Service to expose.
+        max_inflight (int): Service calls executing at once (thread pool size).
+        max_pending (int): Requests allowed to wait for a free slot before 503.
+        pipeline_depth (int): Parsed-but-unanswered requests buffered per connection.
+    """
+
+    def __init__(self, app_service, max_inflight=8, max_pending=256, pipeline_depth=32):
+        self.app_service = app_service
+        self.max_pending = max_pending
+        self.pipeline_depth = pipeline_depth
+        self._executor = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="parking")
+        self._inflight = asyncio.Semaphore(max_inflight)
+        self._pending = 0
+        self._server = None
+        self._charging_task = None
+        self.routes = {
+            ("POST", "/lots"): self.make_lot,
+            ("POST", "/park"): self.park,
+            ("POST", "/remove"): self.remove,
+            ("GET", "/search"): self.search,
+            ("GET", "/status"): self.status,
+            ("GET", "/charge-status"): self.charge_status,
+            ("GET", "/occupancy"): self.occupancy,
+            ("GET", "/queues"): self.queues,
+            ("POST", "/power-budget"): self.power_budget,
+            ("GET", "/power"): self.power,
+            ("GET", "/locate"): self.locate,
+            ("GET", "/latency"): self.latency,
+            ("GET", "/health"): lambda params: {"ok": True},
+        }
+
+    # ---------------- Handlers (run on the thread pool) ----------------
+    @staticmethod
+    def _int(params, key, default=_REQUIRED):
+        """Return params[key] as an int: a JSON integer or an integer query string."""
+        if key not in params:
+            if default is _REQUIRED:
+                raise HttpError(400, f"Missing parameter '{key}'")
+            return default
+        value = params[key]
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise HttpError(400, f"{key} must be an integer")
+        try:
+            return int(value)
+        except ValueError:
+            raise HttpError(400, f"{key} must be an integer") from None
+
+    @staticmethod
+    def _number(params, key, default=_REQUIRED):
+        """Return params[key] as a finite float: a JSON number or a numeric query string."""
+        if params.get(key) is None:
+            if default is _REQUIRED:
+                raise HttpError(400, f"Missing parameter '{key}'")
+            return default
+        value = params[key]
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise HttpError(400, f"{key} must be a number")
+        try:
+            number = float(value)
+        except ValueError:
+            raise HttpError(400, f"{key} must be a number") from None
+        if not math.isfinite(number):
+            raise HttpError(400, f"{key} must be a finite number")
+        return number
+
+    @staticmethod
+    def _flag(params, key, default=False):
+        """Return params[key], which must be a JSON boolean when given."""
+        value = params.get(key, default)
+        if value is not default and not isinstance(value, bool):
+            raise HttpError(400, f"{key} must be true or false")
+        return value
+
+    @classmethod
+    def _level_key(cls, params):
+        try:
+            return params["city_name"], params["site_name"], cls._int(params, "level_number")
+        except KeyError as e:
+            raise HttpError(400, f"Missing parameter {e}") from None
+
+    def make_lot(self, params):
+        try:
+            success, msg = self.app_service.make_lot(
+                self._int(params, "num_regular"), self._int(params, "num_ev"),
+                self._int(params, "levels", 1), params["site_name"], params["city_name"],
+                self._int(params, "chargers", 0), self._flag(params, "pooled_chargers", None)
+            )
+        except KeyError as e:
+            raise HttpError(400, f"Missing parameter {e}") from None
+        return {"success": success, "message": msg}
+
+    def park(self, params):
+        city_name, site_name, level_number = self._level_key(params)
+        try:
+            success, msg, slot = self.app_service.park_vehicle_and_assign(
+                city_name, site_name, level_number, params["reg"], params["make"],
+                params["model"], params["color"], self._flag(params, "ev_car"), self._flag(params, "motor")
+            )
+        except KeyError as e:
+            raise HttpError(400, f"Missing parameter {e}") from None
+        return {"success": success, "message": msg, "slot": slot}
+
+    def remove(self, params):
+        if "regnum" in params:
+            success, msg, bill = self.app_service.remove_vehicle_by_regnum(params["regnum"])
+        else:
+            city_name, site_name, level_number = self._level_key(params)
+            success, msg, bill = self.app_service.remove_vehicle_and_process(
+                city_name, site_name, level_number, self._int(params, "slot_number"),
+                self._flag(params, "is_ev")
+            )
+        return {"success": success, "message": msg, "bill": bill}
+
+    def search(self, params):
+        city_name, site_name, level_number = self._level_key(params)
+        attr = params.get("attr", "regnum")
+        if attr not in SEARCHABLE_ATTRIBUTES:
+            raise HttpError(400, f"attr must be one of {', '.join(SEARCHABLE_ATTRIBUTES)}")
+        try:
+            level = self.app_service.parking_lot.get_level(city_name, site_name, level_number)
+        except KeyError as e:
+            raise HttpError(404, str(e.args[0])) from None
+        reg_slots, ev_slots = level.find_slots(attr, params.get("value", ""))
+        return {"regular_slots": reg_slots, "ev_slots": ev_slots}
+
+    def status(self, params):
+        return self.app_service.parking_lot.get_parking_status(*self._level_key(params))
+
+    def charge_status(self, params):
+        return self.app_service.get_ev_charge_status(*self._level_key(params))
+
+    def occupancy(self, params):
+        level_number = params.get("level_number")
+        try:
+            return self.app_service.parking_lot.get_occupancy(
+                params.get("city_name"), params.get("site_name"),
+                int(level_number) if level_number is not None else None
+            )
+        except ValueError:
+            raise HttpError(400, "level_number must be an integer") from None
+        except KeyError as e:
+            raise HttpError(404, str(e.args[0])) from None
+
+    def queues(self, params):
+        success, msg, queues = self.app_service.get_waiting_queues(*self._level_key(params))
+        if not success:
+            raise HttpError(404, msg)
+        return {"message": msg, "queues": queues}
+
+    @staticmethod
+    def _site_key(params):
+        try:
+            return params["city_name"], params["site_name"]
+        except KeyError as e:
+            raise HttpError(400, f"Missing parameter {e}") from None
+
+    def power_budget(self, params):
+        city_name, site_name = self._site_key(params)
+        limit_kw = self._number(params, "limit_kw", None)
+        success, msg = self.app_service.set_site_power_budget(
+            city_name, site_name, limit_kw, params.get("policy", "equal"))
+        return {"success": success, "message": msg}
+
+    def power(self, params):
+        success, msg, power = self.app_service.get_site_power(*self._site_key(params))
+        if not success:
+            raise HttpError(404, msg)
+        return {"message": msg, "power": power}
+
+    def locate(self, params):
+        if "regnum" not in params:
+            raise HttpError(400, "Missing parameter 'regnum'")
+        return {"location": self.app_service.locate_vehicle(params["regnum"])}
+
+    def latency(self, params):
+        instruments = self.app_service.instruments
+        scope = params.get("scope", "op")
+        if scope not in ("op", "city", "site"):
+            raise HttpError(400, "scope must be one of op, city, site")
+        return {
+            "enabled": instruments.enabled,
+            "latency": instruments.percentiles(op=params.get("op"), scope=scope),
+            "counters": instruments.counters(),
+            "gauges": instruments.gauges(),
+        }
+
+    # ---------------- Dispatch ----------------
+    async def dispatch(self, method, path, params):
+        """Run the handler for a request and return (status, payload, extra headers)."""
+        handler = self.routes.get((method, path))
+        if handler is None:
+            if any(route_path == path for _, route_path in self.routes):
+                return 405, {"error": f"{method} not allowed on {path}"}, ()
+            return 404, {"error": f"No route for {path}"}, ()
+
+        if self._pending >= self.max_pending:
+            return 503, {"error": "Server busy"}, ("Retry-After: 1",)
+        self._pending += 1
+        try:
+            async with self._inflight:
+                payload = await asyncio.get_running_loop().run_in_executor(self._executor, handler, params)
+            return 200, payload, ()
+        except HttpError as e:
+            return e.status, {"error": str(e)}, ()
+        except Exception as e:
+            return 500, {"error": repr(e)}, ()
+        finally:
+            self._pending -= 1
+
+    async def handle_connection(self, reader, writer):
+        """Read pipelined requests ahead of the responder, up to pipeline_depth."""
+        queue = asyncio.Queue(self.pipeline_depth)
+        responder = asyncio.create_task(self._respond(queue, writer))
+        try:
+            while not responder.done():
+                try:
+                    request = await read_request(reader)
+                except HttpError as e:
+                    await queue.put(e)
+                    break
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if request is None:
+                    break
+                # Blocks while the responder is pipeline_depth requests behind
+                await queue.put(request)
+                if not request[4]:
+                    break
+        finally:
+            await queue.put(None)
+            await responder
+            writer.close()
+
+    async def _respond(self, queue, writer):
+        """Execute queued requests one at a time and write responses in request order."""
+        try:
+            while True:
+                request = await queue.get()
+                if request is None:
+                    return
+                if isinstance(request, HttpError):
+                    writer.write(encode_response(request.status, {"error": str(request)}, keep_alive=False))
+                    await writer.drain()
+                    return
+                method, path, query, body, keep_alive = request
+                params = {**query, **body}
+                status, payload, headers = await self.dispatch(method, path, params)
+                writer.write(encode_response(status, payload, keep_alive, headers))
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            return
+
+    async def _pump_charging_events(self):
+        """Fire due charge completions, then sleep until the next one (at most 1s)."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await loop.run_in_executor(self._executor, self.app_service.process_charging_events)
+            wait = self.app_service.seconds_until_next_charging_event()
+            await asyncio.sleep(1.0 if wait is None else min(1.0, max(0.001, wait)))
+
+    # ---------------- Lifecycle ----------------
+    async def start(self, host="127.0.0.1", port=8080):
+        """Start listening; returns the bound (host, port)."""
+        self._server = await asyncio.start_server(self.handle_connection, host, port)
+        self._charging_task = asyncio.create_task(self._pump_charging_events())
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._charging_task:
+            self._charging_task.cancel()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=True)
+
+
+async def _run(args):
+    app_service = ParkingApplicationService(ParkingLot())
+    if args.instrument:
+        app_service.instruments.enable()
+    persistence = None
+    if args.data_dir:
+        from ParkingPersistence import PersistenceManager
+        persistence = PersistenceManager(app_service, args.data_dir)
+        print(f"Recovered {persistence.recover()}")
+    exporter = None
+    if args.metrics_port is not None:
+        from ParkingMetrics import ParkingMetrics, MetricsExporter
+        exporter = MetricsExporter(ParkingMetrics(app_service), args.host, args.metrics_port)
+        metrics_host, metrics_port = exporter.start()
+        print(f"Metrics on http://{metrics_host}:{metrics_port}/metrics", flush=True)
+
+    server = ParkingServer(app_service, args.max_inflight, args.max_pending, args.pipeline_depth)
+    host, port = await server.start(args.host, args.port)
+    print(f"Parking server listening on http://{host}:{port}", flush=True)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+        if exporter:
+            exporter.close()
+        if persistence:
+            persistence.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless HTTP/JSON parking service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-inflight", type=int, default=8)
+    parser.add_argument("--max-pending", type=int, default=256)
+    parser.add_argument("--pipeline-depth", type=int, default=32)
+    parser.add_argument("--data-dir", help="Journal and snapshot directory (enables persistence)")
+    parser.add_argument("--instrument", action="store_true",
+                        help="Record per-operation latency histograms (served on /latency)")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Serve Prometheus metrics on this port at /metrics")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
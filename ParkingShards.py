@@ -0,0 +1,382 @@
+"""
+Sharded deployment: cities are partitioned across worker processes.
+
+Each worker owns the ParkingLot (its City objects) and the
+ChargerController of its cities and fires their charge completions. The
+ShardRouter in the calling process forwards a request to the worker
+owning its city and merges fleet-wide queries (occupancy, charge status,
+plate lookup, attribute search) from every shard.
+
+Plate uniqueness is enforced atomically only within a shard. The router's
+park_vehicle_and_assign also looks the plate up on the other shards before
+parking, but that check and the park are not atomic across processes, and
+park_many only checks within each shard.
+
+With a data_dir the shard count and city groups are recorded in
+data_dir/shards.json: cities are routed by hash modulo the shard count, so
+a different layout would route them away from their journals.
+"""
+from collections import defaultdict
+import json
+import multiprocessing
+import os
+import threading
+import zlib
+
+LAYOUT_FILE = "shards.json"
+
+# Application-service and lot methods a worker will execute
+_SERVICE_METHODS = frozenset({
+    "make_lot", "park_vehicle_and_assign", "park_many", "remove_vehicle_and_process",
+    "remove_vehicle_by_regnum", "remove_many", "locate_vehicle", "get_ev_charge_status",
+    "get_all_cities", "get_sites_in_city", "get_levels_in_site", "process_charging_events",
+    "set_site_power_budget", "get_site_power",
+})
+_LOT_METHODS = frozenset({
+    "get_parking_status", "get_occupancy", "get_occupancy_summary", "find_slots_by_regnum",
+    "find_slots_by_color", "find_slots_by_model", "find_slots_by_make",
+})
+
+
+def _iter_levels(parking_lot):
+    for city in parking_lot.cities.values():
+        for site in city.sites.values():
+            yield from site.levels.values()
+
+
+def charge_summary(app_service):
+    """Return get_ev_charge_status rows of every level, tagged with their location."""
+    rows = []
+    for level in _iter_levels(app_service.parking_lot):
+        for row in app_service.get_ev_charge_status(level.city_name, level.site_name, level.level_number):
+            row.update(city_name=level.city_name, site_name=level.site_name,
+                       level_number=level.level_number)
+            rows.append(row)
+    return rows
+
+
+def find_vehicles(app_service, attr, value):
+    """Return the locations of every vehicle whose attr matches value, on any level."""
+    matches = []
+    for level in _iter_levels(app_service.parking_lot):
+        reg_slots, ev_slots = level.find_slots(attr, value)
+        for is_ev, slots in ((False, reg_slots), (True, ev_slots)):
+            matches.extend(
+                {"city_name": level.city_name, "site_name": level.site_name,
+                 "level_number": level.level_number, "slot_number": slot, "is_ev": is_ev}
+                for slot in slots
+            )
+    return matches
+
+
+_SHARD_FUNCTIONS = {
+    "charge_summary": charge_summary,
+    "find_vehicles": find_vehicles,
+}
+
+
+def _execute(app_service, op, args, kwargs):
+    if op in _SERVICE_METHODS:
+        return getattr(app_service, op)(*args, **kwargs)
+    if op in _LOT_METHODS:
+        return getattr(app_service.parking_lot, op)(*args, **kwargs)
+    if op in _SHARD_FUNCTIONS:
+        return _SHARD_FUNCTIONS[op](app_service, *args, **kwargs)
+    raise ValueError(f"Unsupported shard operation: {op}")
+
+
+def worker_main(conn, data_dir=None):
+    """
+    Shard process loop: execute requests from the router and fire charge
+    completions between them. A None message shuts the worker down.
+    """
+    from ParkingLot import ParkingLot
+    from ParkingApplicationService import ParkingApplicationService
+
+    app_service = ParkingApplicationService(ParkingLot())
+    persistence = None
+    if data_dir:
+        from ParkingPersistence import PersistenceManager
+        persistence = PersistenceManager(app_service, data_dir)
+        persistence.recover()
+
+    try:
+        while True:
+            wait = app_service.seconds_until_next_charging_event()
+            if conn.poll(1.0 if wait is None else min(1.0, wait)):
+                message = conn.recv()
+                if message is None:
+                    break
+                op, args, kwargs = message
+                try:
+                    reply = (True, _execute(app_service, op, args, kwargs))
+                except Exception as e:
+                    reply = (False, e)
+                try:
+                    conn.send(reply)
+                except Exception as e:  # unpicklable result or exception
+                    conn.send((False, RuntimeError(repr(e))))
+            app_service.process_charging_events()
+    finally:
+        if persistence:
+            persistence.close()
+        conn.close()
+
+
+class _Shard:
+    def __init__(self, index, context, data_dir):
+        self.index = index
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=worker_main, args=(child_conn, data_dir),
+            name=f"parking-shard-{index}", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        # One request/response exchange on the pipe at a time
+        self.lock = threading.Lock()
+
+    def send(self, op, args=(), kwargs=None):
+        self.conn.send((op, args, kwargs or {}))
+
+    def receive(self):
+        ok, result = self.conn.recv()
+        if not ok:
+            raise result
+        return result
+
+
+class ShardRouter:
+    """
+    Routes requests to city-owning worker processes and merges fleet-wide queries.
+
+    Args:
+        num_shards (int, optional): Worker processes; defaults to the count
+            recorded in data_dir, else the CPU count.
+        city_groups (list of list of str, optional): Cities pinned together on
+            one shard each (group i -> shard i). Other cities are hashed.
+        data_dir (str, optional): Enables per-shard persistence under
+            data_dir/shard-<i>.
+
+    Raises:
+        ValueError: If num_shards or city_groups differ from the layout
+            recorded in data_dir.
+    """
+
+    def __init__(self, num_shards=None, city_groups=None, data_dir=None):
+        city_groups = [list(group) for group in city_groups or []]
+        if data_dir:
+            num_shards = self._check_layout(data_dir, num_shards, city_groups)
+        num_shards = max(num_shards or os.cpu_count() or 1, len(city_groups), 1)
+        self._city_shard = {
+            city: index for index, group in enumerate(city_groups) for city in group
+        }
+        # spawn: workers start from a clean interpreter, without the router's threads
+        context = multiprocessing.get_context("spawn")
+        self.shards = [
+            _Shard(i, context, os.path.join(data_dir, f"shard-{i}") if data_dir else None)
+            for i in range(num_shards)
+        ]
+
+    @staticmethod
+    def _check_layout(data_dir, num_shards, city_groups):
+        """
+        Return the shard count to use with data_dir, recording the layout on
+        first use. A changed layout would route cities to shards that do not
+        hold their journal, so it is refused.
+        """
+        path = os.path.join(data_dir, LAYOUT_FILE)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                stored = json.load(f)
+            num_shards = num_shards or stored["num_shards"]
+            layout = {"num_shards": max(num_shards, len(city_groups), 1), "city_groups": city_groups}
+            if layout != stored:
+                raise ValueError(
+                    f"Shard layout {layout} does not match {stored} recorded in {path}"
+                )
+            return num_shards
+        num_shards = max(num_shards or os.cpu_count() or 1, len(city_groups), 1)
+        os.makedirs(data_dir, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"num_shards": num_shards, "city_groups": city_groups}, f)
+        return num_shards
+
+    # ---------------- Plumbing ----------------
+    def shard_for(self, city_name):
+        """Return the shard index owning city_name (stable across restarts)."""
+        index = self._city_shard.get(city_name)
+        if index is None:
+            index = zlib.crc32(city_name.encode("utf-8")) % len(self.shards)
+        return index
+
+    def call(self, city_name, op, *args, **kwargs):
+        """Execute op on the shard owning city_name."""
+        shard = self.shards[self.shard_for(city_name)]
+        with shard.lock:
+            shard.send(op, args, kwargs)
+            return shard.receive()
+
+    def fan_out(self, op, *args, **kwargs):
+        """Execute op on every shard concurrently; returns results in shard order."""
+        return self._scatter([(shard, args) for shard in self.shards], op, kwargs)
+
+    def _scatter(self, targets, op, kwargs=None):
+        """Send (shard, args) requests first, then collect replies (shard locks in index order)."""
+        targets = sorted(targets, key=lambda target: target[0].index)
+        for shard, _ in targets:
+            shard.lock.acquire()
+        try:
+            for shard, args in targets:
+                shard.send(op, args, kwargs)
+            # Drain every reply before raising so no pipe is left with a stale response
+            replies = []
+            for shard, _ in targets:
+                try:
+                    replies.append((True, shard.receive()))
+                except Exception as e:
+                    replies.append((False, e))
+        finally:
+            for shard, _ in targets:
+                shard.lock.release()
+        for ok, result in replies:
+            if not ok:
+                raise result
+        return [result for _, result in replies]
+
+    def close(self):
+        """Stop every worker process."""
+        for shard in self.shards:
+            with shard.lock:
+                try:
+                    shard.conn.send(None)
+                except (BrokenPipeError, OSError):
+                    pass
+        for shard in self.shards:
+            shard.process.join(timeout=5)
+            if shard.process.is_alive():
+                shard.process.terminate()
+            shard.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------------- City-routed operations ----------------
+    def make_lot(self, num_regular, num_ev, level_number, site_name, city_name, chargers=0,
+                 pooled_chargers=None, compact=None):
+        return self.call(city_name, "make_lot", num_regular, num_ev, level_number,
+                         site_name, city_name, chargers, pooled_chargers, compact)
+
+    def park_vehicle_and_assign(self, city_name, site_name, level_number,
+                                reg, make, model, color, ev_car=False, motor=False, departure_time=None):
+        """
+        Park on the shard owning city_name. The plate is first looked up on
+        the other shards, which each only know their own cities; the lookup
+        and the park are not atomic, so concurrent parks of one plate in
+        cities on different shards can still both succeed.
+        """
+        owner = self.shard_for(city_name)
+        others = [(shard, (reg,)) for shard in self.shards if shard.index != owner]
+        if others and any(self._scatter(others, "locate_vehicle")):
+            return False, f"Vehicle {reg} is already parked", None
+        return self.call(city_name, "park_vehicle_and_assign", city_name, site_name,
+                         level_number, reg, make, model, color, ev_car, motor, departure_time)
+
+    def remove_vehicle_and_process(self, city_name, site_name, level_number, slot_number, is_ev=False):
+        return self.call(city_name, "remove_vehicle_and_process", city_name, site_name,
+                         level_number, slot_number, is_ev)
+
+    def get_parking_status(self, city_name, site_name, level_number):
+        return self.call(city_name, "get_parking_status", city_name, site_name, level_number)
+
+    def get_ev_charge_status(self, city_name, site_name, level_number):
+        return self.call(city_name, "get_ev_charge_status", city_name, site_name, level_number)
+
+    def set_site_power_budget(self, city_name, site_name, limit_kw, policy="equal"):
+        return self.call(city_name, "set_site_power_budget", city_name, site_name, limit_kw, policy)
+
+    def get_site_power(self, city_name, site_name):
+        return self.call(city_name, "get_site_power", city_name, site_name)
+
+    def get_sites_in_city(self, city_name):
+        return self.call(city_name, "get_sites_in_city", city_name)
+
+    def get_levels_in_site(self, city_name, site_name):
+        return self.call(city_name, "get_levels_in_site", city_name, site_name)
+
+    def _split_by_shard(self, requests, op):
+        """Run a batch op with each shard's share of requests; results keep request order."""
+        per_shard = defaultdict(list)
+        for position, request in enumerate(requests):
+            per_shard[self.shard_for(request.get("city_name", ""))].append((position, request))
+        targets = [
+            (self.shards[index], ([request for _, request in items],))
+            for index, items in per_shard.items()
+        ]
+        results = [None] * len(requests)
+        for (shard, _), shard_results in zip(
+                sorted(targets, key=lambda target: target[0].index), self._scatter(targets, op)):
+            for (position, _), result in zip(per_shard[shard.index], shard_results):
+                results[position] = result
+        return results
+
+    def park_many(self, requests):
+        """Park a burst across cities; every shard parks its share in parallel."""
+        return self._split_by_shard(list(requests), "park_many")
+
+    def remove_many(self, requests):
+        """
+        Remove a burst across cities. Plate-only requests are located first,
+        then every shard removes its share in parallel.
+        """
+        requests = list(requests)
+        for position, request in enumerate(requests):
+            if "city_name" not in request and "regnum" in request:
+                # Unknown plates stay as they are; their shard reports them as not parked
+                requests[position] = self.locate_vehicle(request["regnum"]) or request
+        return self._split_by_shard(requests, "remove_many")
+
+    # ---------------- Fleet-wide queries ----------------
+    def get_all_cities(self):
+        return [city for cities in self.fan_out("get_all_cities") for city in cities]
+
+    def locate_vehicle(self, regnum):
+        """Return the fleet-wide location of a plate, or None if not parked."""
+        for location in self.fan_out("locate_vehicle", regnum):
+            if location:
+                return location
+        return None
+
+    def remove_vehicle_by_regnum(self, regnum):
+        location = self.locate_vehicle(regnum)
+        if not location:
+            return False, f"Vehicle {regnum} is not parked", None
+        return self.call(location["city_name"], "remove_vehicle_by_regnum", regnum)
+
+    def get_occupancy(self, city_name=None, site_name=None, level_number=None):
+        """
+        Return the rolling occupancy counts of a city, site or level from its
+        shard, or of the whole fleet summed over every shard.
+        """
+        if city_name is not None:
+            return self.call(city_name, "get_occupancy", city_name, site_name, level_number)
+        totals = {}
+        for counts in self.fan_out("get_occupancy"):
+            for key, value in counts.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def get_fleet_status(self):
+        """Return slot counts of every level in the fleet."""
+        return [row for rows in self.fan_out("get_occupancy_summary") for row in rows]
+
+    def get_fleet_charge_status(self):
+        """Return the charge status of every parked EV in the fleet, tagged with its location."""
+        return [row for rows in self.fan_out("charge_summary") for row in rows]
+
+    def find_vehicles(self, attr, value):
+        """Return the locations of every vehicle in the fleet whose attr matches value."""
+        return [match for matches in self.fan_out("find_vehicles", attr, value) for match in matches]
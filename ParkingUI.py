@@ -1,8 +1,9 @@
 # ParkingUI.py
 import tkinter as tk
 from tkinter import ttk
-from datetime import datetime
 import Config
+from StatusReports import StatusReportCache
+from BackgroundWorker import BackgroundWorker
 
 class ParkingLotUI:
     def __init__(self, root, parking_lot, app_service):
@@ -31,6 +32,12 @@ class ParkingLotUI:
         yscroll = tk.Scrollbar(self.root, orient="vertical", command=self.txt_display.yview)
         yscroll.grid(row=13, column=6, sticky="ns")
         self.txt_display.config(yscrollcommand=yscroll.set)
+        self.txt_display.tag_configure("error", foreground="red")
+
+        # Per-level report sections, re-rendered only for levels changed since the last click
+        self.reports = StatusReportCache(parking_lot, app_service)
+        # Domain calls run off the Tk main loop; results come back through root.after
+        self.worker = BackgroundWorker(root.after)
 
         self.create_widgets()
 
@@ -184,7 +191,11 @@ class ParkingLotUI:
             )
             return
  
-        success, msg = self.app_service.make_lot(num_regular, num_ev, level, site, city, chargers)
+        self.run_in_background(self.app_service.make_lot, num_regular, num_ev, level, site, city, chargers,
+                               on_done=self._lot_created, busy_msg="Creating parking lot...")
+
+    def _lot_created(self, result):
+        success, msg = result
         if success:
             self.show_info(msg)
             self.update_sites()
@@ -233,7 +244,12 @@ class ParkingLotUI:
         ev = self.cbx_ev_car.get()
         motor = self.cbx_motor.get()
 
-        success, msg, slot = self.app_service.park_vehicle_and_assign(city, site, level, reg, make, model, color, ev, motor)
+        self.run_in_background(self.app_service.park_vehicle_and_assign,
+                               city, site, level, reg, make, model, color, ev, motor,
+                               on_done=self._vehicle_parked)
+
+    def _vehicle_parked(self, result):
+        success, msg, slot = result
         if success:
             self.show_info(msg)
         else:
@@ -276,20 +292,19 @@ class ParkingLotUI:
         # Ensure ev is boolean
         ev = bool(self.cbx_ev_remove.get())
 
-        # Unpack 3 values from remove_vehicle
-        # success, msg, billing = self.parking_lot.remove_vehicle(city, site, level, slot_num, ev)
-        success, msg, billing = self.app_service.remove_vehicle_and_process(city, site, level, slot_num, ev)
+        self.run_in_background(self.app_service.remove_vehicle_and_process, city, site, level, slot_num, ev,
+                               on_done=lambda result: self._vehicle_removed(result, ev))
 
+    def _vehicle_removed(self, result, ev):
+        # Unpack 3 values from remove_vehicle
+        success, msg, billing = result
         if success:
-            # Show removal message
-            self.show_info(msg)
-
-            # Show billing details
+            # Show removal message with the billing details
             billing_msg = f"Parking Fee: {billing['parking_fee']}\n"
             if ev:
                 billing_msg += f"Charging Fee: {billing['charging_fee']}\n"
             billing_msg += f"Total: {billing['total']}"
-            self.show_info(billing_msg)
+            self.show_info(f"{msg}\n{billing_msg}")
         else:
             self.show_error(msg)
 
@@ -335,169 +350,79 @@ class ParkingLotUI:
             )
             return
 
-        if self.search_combo.get() == 'Color':
-            regular_slot, ev_slots = self.parking_lot.find_slots_by_color(city, site, level, self.seach_parameter.get())
-            msg_rgl= ""
-            msg_ev = ""
-            msg = ""
-            for i in regular_slot:
-                msg_rgl += str(i)+ ","
-            for i in ev_slots:
-                msg_ev+= str(i)+", "
-            msg_rgl = ", ".join(map(str, regular_slot)) if regular_slot else "None"
-            msg_ev = ", ".join(map(str, ev_slots)) if ev_slots else "None"
-
-            msg = (
-                f"\nCity: {city}, Site: {site}, Level: {level}\n"
-                f"Regular Cars Found at Slot Numbers:\n{msg_rgl}\n"
-                f"EV Cars Found at Slot Numbers: \n{msg_ev}"
-            )
-            self.show_info(msg)
-        elif self.search_combo.get() == 'Registration No':
-            regular_slot, ev_slots = self.parking_lot.find_slots_by_regnum(city, site, level, self.seach_parameter.get())
-            msg_rgl= ""
-            msg_ev = ""
-            msg = ""
-            for i in regular_slot:
-                msg_rgl += str(i)+ ","
-            for i in ev_slots:
-                msg_ev+= str(i)+", "
-            msg_rgl = ", ".join(map(str, regular_slot)) if regular_slot else "None"
-            msg_ev = ", ".join(map(str, ev_slots)) if ev_slots else "None"
-
-            msg = (
-                f"\nCity: {city}, Site: {site}, Level: {level}\n"
-                f"Regular Cars Found at Slot Numbers:\n{msg_rgl}\n"
-                f"EV Cars Found at Slot Numbers: \n{msg_ev}"
-            )
-            self.show_info(msg)
-        elif self.search_combo.get() == 'Model':
-            regular_slot, ev_slots = self.parking_lot.find_slots_by_model(city, site, level, self.seach_parameter.get())
-            msg_rgl= ""
-            msg_ev = ""
-            msg = ""
-            for i in regular_slot:
-                msg_rgl += str(i)+ ","
-            for i in ev_slots:
-                msg_ev+= str(i)+", "
-            msg_rgl = ", ".join(map(str, regular_slot)) if regular_slot else "None"
-            msg_ev = ", ".join(map(str, ev_slots)) if ev_slots else "None"
-
-            msg = (
-                f"\nCity: {city}, Site: {site}, Level: {level}\n"
-                f"Regular Cars Found at Slot Numbers:\n{msg_rgl}\n"
-                f"EV Cars Found at Slot Numbers: \n{msg_ev}"
-            )
-            self.show_info(msg)
-        elif self.search_combo.get() == 'Make':
-            regular_slot, ev_slots = self.parking_lot.find_slots_by_make(city, site, level, self.seach_parameter.get())
-            msg_rgl= ""
-            msg_ev = ""
-            msg = ""
-            for i in regular_slot:
-                msg_rgl += str(i)+ ","
-            for i in ev_slots:
-                msg_ev+= str(i)+", "
-            msg_rgl = ", ".join(map(str, regular_slot)) if regular_slot else "None"
-            msg_ev = ", ".join(map(str, ev_slots)) if ev_slots else "None"
-
-            msg = (
-                f"\nCity: {city}, Site: {site}, Level: {level}\n"
-                f"Regular Cars Found at Slot Numbers:\n{msg_rgl}\n"
-                f"EV Cars Found at Slot Numbers: \n{msg_ev}"
-            )
-            self.show_info(msg)
-        else:
+        finders = {
+            'Color': self.parking_lot.find_slots_by_color,
+            'Registration No': self.parking_lot.find_slots_by_regnum,
+            'Model': self.parking_lot.find_slots_by_model,
+            'Make': self.parking_lot.find_slots_by_make,
+        }
+        finder = finders.get(search_option)
+        if finder is None:
             return
 
-    def on_status(self):
-        output = ""
+        # A newer search replaces one still running
+        self.run_in_background(finder, city, site, level, search_criteria, channel="search",
+                               on_done=lambda result: self._search_done(result, city, site, level))
 
-        cities = self.app_service.get_all_cities()
-        if not cities:
-            self.show_info("No parking lots created yet")
+    def _search_done(self, result, city, site, level):
+        regular_slot, ev_slots = result
+        if regular_slot is False:
+            self.show_error(ev_slots)  # (False, error message) for an unknown level
             return
+        msg_rgl = ", ".join(map(str, regular_slot)) if regular_slot else "None"
+        msg_ev = ", ".join(map(str, ev_slots)) if ev_slots else "None"
 
-        for city_name in cities:
-            sites = self.app_service.get_sites_in_city(city_name)
-            for site_name in sites:
-                levels = self.app_service.get_levels_in_site(city_name, site_name)
-                for level_number in levels:
-                    status = self.parking_lot.get_parking_status(city_name, site_name, level_number)
-
-                    if not status["regular"] and not status["ev"]:
-                        continue
-
-                    output += f"\nCity: {city_name}, Site: {site_name}, Level: {level_number}\n"
-                    output += "Regular Vehicles:\n"
-                    output += "Slot\tReg No.\tColor\tMake\tModel\n"
-
-                    for v in status["regular"]:
-                        output += f"{v['slot']}\t{v['regnum']}\t{v['color']}\t{v['make']}\t{v['model']}\n"
+        msg = (
+            f"\nCity: {city}, Site: {site}, Level: {level}\n"
+            f"Regular Cars Found at Slot Numbers:\n{msg_rgl}\n"
+            f"EV Cars Found at Slot Numbers: \n{msg_ev}"
+        )
+        self.show_info(msg)
 
-                    output += "Electric Vehicles:\n"
-                    output += "Slot\tReg No.\tColor\tMake\tModel\n"
-                    for v in status["ev"]:
-                        output += f"{v['slot']}\t{v['regnum']}\t{v['color']}\t{v['make']}\t{v['model']}\n"
+    def on_status(self):
+        if not self.app_service.get_all_cities():
+            self.show_info("No parking lots created yet")
+            return
 
-        if output:
-            self.show_info(output)
-        else:
-            self.show_info("Parking lots are empty")
+        # Status and charge reports share a channel: the latest click wins
+        self.run_in_background(self.reports.status_report, channel="report",
+                               on_done=lambda output: self.show_info(output or "Parking lots are empty"),
+                               busy_msg="Building lot status...")
 
     def on_charge_status(self):
-        cities = self.app_service.get_all_cities()
-        if not cities:
+        if not self.app_service.get_all_cities():
             self.show_info("No parking lots created yet")
             return
 
-        header = (
-            "Electric Vehicle Charge Levels Across All Parking Lots\n\n"
-            f"{'City':12} {'Site':8} {'Level':5} {'Slot':5} "
-            f"{'Reg No':10} {'Status':10} {'Charger':10} "
-            f"{'kWh':5} {'%':5} {'Start Time':16}\n"
-        )
-        separator = "-" * 95 + "\n"
-        output = header + separator
-
-        any_ev = False
-
-        for city_name in cities:
-            sites = self.app_service.get_sites_in_city(city_name)
-            for site_name in sites:
-                levels = self.app_service.get_levels_in_site(city_name, site_name)
-                for level_number in levels:
-                    charge_list = self.app_service.get_ev_charge_status(city_name, site_name, level_number)
-
-                    for info in charge_list:
-                        any_ev = True
-
-                        status = info.get("charge_status", "waiting")
-                        kwh = info.get("kwh_delivered", 0.0)
-                        percent = info.get("charge_percent", 0.0)
-                        charger_id = info.get('charger_id', "-")
-
-                        start_time_raw = info.get("start_time")
-                        if start_time_raw:
-                            dt = datetime.fromisoformat(start_time_raw)
-                            start_time = dt.strftime("%Y-%m-%d %H:%M")
-                        else:
-                            start_time = "-"
-
-                        output += (
-                            f"{city_name:12} {site_name:8} {level_number:<5} {info['slot']:<5} "
-                            f"{info['regnum']:10} {status:10} {charger_id:8} "
-                            f"{kwh:5.2f} {percent:5.2f}% {start_time:16}\n"
-                        )
-
-        if any_ev:
-            self.show_info(output)
-        else:
-            self.show_info("No EVs parked across all parking lots")
+        self.run_in_background(self.reports.charge_report, channel="report",
+                               on_done=lambda output: self.show_info(output or "No EVs parked across all parking lots"),
+                               busy_msg="Building EV charge status...")
+
+    # ---------------- Background execution ----------------
+    def run_in_background(self, fn, *args, channel=None, on_done=None, busy_msg=None):
+        """
+        Run a domain call on the worker thread and hand its result to
+        on_done on the Tk thread. A call on a channel supersedes the
+        previous call of that channel.
+        """
+        if busy_msg:
+            self.show_info(busy_msg)
+        return self.worker.submit(fn, *args, channel=channel, on_done=on_done,
+                                  on_error=lambda e: self.show_error(f"Error: {e}"))
+
+    def close(self):
+        """Stop background work and event listeners (call when the window closes)."""
+        self.worker.shutdown()
+        self.reports.close()
+
     # ---------------- Display ----------------
+    def _display(self, msg, tag=None):
+        """Replace the display content with msg."""
+        self.txt_display.delete("1.0", tk.END)
+        self.txt_display.insert(tk.END, msg + "\n", tag or ())
+
     def show_error(self, msg):
-        self.txt_display.tag_configure("error", foreground="red")
-        self.txt_display.insert(tk.END, msg + "\n")
+        self._display(msg, "error")
 
     def show_info(self, msg):
-        self.txt_display.insert(tk.END, msg + "\n")
+        self._display(msg)
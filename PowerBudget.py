@@ -0,0 +1,105 @@
+"""
+Site power budgets: a grid connection cap shared by the site's chargers.
+
+The controller keeps every active session of a budgeted site within the
+cap by recomputing the site's rates whenever a session starts or stops.
+Only that site is recomputed, and only sessions whose rate changed are
+settled and rescheduled.
+
+Every policy is work-conserving: it hands out min(cap, sum of the
+sessions' charger ratings), the most energy per hour the site can
+deliver. Policies only differ in who gets it when the cap binds.
+"""
+import math
+import threading
+
+# equal: water-filling, every session gets the same share up to its charger rating
+# earliest_departure: sessions leaving soonest are served first (unknown departures last)
+# lowest_soc: emptiest batteries are served first
+POLICIES = ("equal", "earliest_departure", "lowest_soc")
+
+
+def allocate(limit_kw, demands, policy="equal"):
+    """
+    Split a site's power across its charging sessions.
+
+    Args:
+        limit_kw (float or None): Site cap in kW; None means unlimited.
+        demands (list of tuple): (charger_id, max_kw, departure_ts, state_of_charge)
+            per session, in session start order. departure_ts may be None.
+        policy (str): One of POLICIES.
+
+    Returns:
+        dict: charger_id -> allocated kW.
+    """
+    if limit_kw is None:
+        return {charger_id: max_kw for charger_id, max_kw, _, _ in demands}
+
+    rates = {}
+    remaining = float(limit_kw)
+    if policy == "equal":
+        # Serve the smallest ratings first so what they cannot take is shared by the rest
+        ordered = sorted(demands, key=lambda d: d[1])
+        for i, (charger_id, max_kw, _, _) in enumerate(ordered):
+            rates[charger_id] = min(max_kw, remaining / (len(ordered) - i))
+            remaining -= rates[charger_id]
+        return rates
+
+    if policy == "earliest_departure":
+        ordered = sorted(demands, key=lambda d: (d[2] is None, d[2] or 0.0))
+    elif policy == "lowest_soc":
+        ordered = sorted(demands, key=lambda d: d[3])
+    else:
+        raise ValueError(f"Unknown power policy {policy!r}; expected one of {', '.join(POLICIES)}")
+    for charger_id, max_kw, _, _ in ordered:
+        rates[charger_id] = min(max_kw, remaining)
+        remaining -= rates[charger_id]
+    return rates
+
+
+class SitePowerBudget:
+    """
+    Power cap of one site and the rates currently allocated under it.
+
+    Args:
+        limit_kw (float or None): Grid connection cap in kW; None lifts it.
+        policy (str): Allocation policy, one of POLICIES.
+
+    Raises:
+        ValueError: On an unknown policy or a negative limit.
+    """
+
+    def __init__(self, limit_kw, policy="equal"):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown power policy {policy!r}; expected one of {', '.join(POLICIES)}")
+        if limit_kw is not None and not math.isfinite(limit_kw):
+            raise ValueError("Power limit must be a finite number")
+        if limit_kw is not None and limit_kw < 0:
+            raise ValueError("Power limit must not be negative")
+        self.limit_kw = limit_kw
+        self.policy = policy
+        # charger_id -> rated kW of its active session, in start order
+        self.active = {}
+        # charger_id -> kW currently allocated
+        self.rates = {}
+        self.rebalances = 0
+        # Taken under charger locks; only the state table and scheduler locks nest inside
+        self.lock = threading.Lock()
+
+    @property
+    def allocated_kw(self):
+        return sum(self.rates.values())
+
+    def as_dict(self):
+        """Return the limit, policy and current allocation."""
+        with self.lock:
+            return {
+                "limit_kw": self.limit_kw,
+                "policy": self.policy,
+                "allocated_kw": round(self.allocated_kw, 3),
+                "sessions": [
+                    {"charger_id": charger_id, "rate_kw": round(self.rates.get(charger_id, 0.0), 3),
+                     "max_kw": max_kw}
+                    for charger_id, max_kw in self.active.items()
+                ],
+            }
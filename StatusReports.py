@@ -0,0 +1,161 @@
+"""
+Cached text renderings of the fleet status and EV charge status reports.
+
+Each level's section of a report is rendered once and kept until a domain
+event (park, remove, charging transition) marks that level dirty, so a
+report over a large fleet only re-renders the levels that changed. Empty
+levels are skipped through the occupancy counters without being rendered.
+
+Charge rows of a level with an active session show kWh projected to now,
+so those levels are rendered fresh on every report.
+"""
+import threading
+from datetime import datetime
+
+STATUS = "status"
+CHARGE = "charge"
+
+CHARGE_HEADER = (
+    "Electric Vehicle Charge Levels Across All Parking Lots\n\n"
+    f"{'City':12} {'Site':8} {'Level':5} {'Slot':5} "
+    f"{'Reg No':10} {'Status':10} {'Charger':10} "
+    f"{'kWh':5} {'%':5} {'Start Time':16}\n"
+    + "-" * 95 + "\n"
+)
+
+# Events that change what a level's status section shows; every other
+# charging event only affects its charge section
+_OCCUPANCY_EVENTS = frozenset({"parked", "removed"})
+_CHARGING_EVENTS = frozenset({"charging_started", "charging_stopped", "charging_full", "charger_released"})
+
+
+class StatusReportCache:
+    """
+    Per-level cache of report sections, invalidated by the lot's domain events.
+
+    Args:
+        parking_lot (ParkingLot): Lot whose events mark levels dirty.
+        app_service (ParkingApplicationService): Source of the charge status rows.
+    """
+
+    def __init__(self, parking_lot, app_service):
+        self.parking_lot = parking_lot
+        self.app_service = app_service
+        # (city_name, site_name, level_number) -> {STATUS: text, CHARGE: text}
+        self._sections = {}
+        # Bumped on every invalidation so a section rendered while its level
+        # changed is not stored: key -> version, plus a fleet-wide epoch
+        self._versions = {}
+        self._epoch = 0
+        # Events arrive on gate and charging threads; reports may be built on a worker
+        self._lock = threading.Lock()
+        self.renders = 0  # level sections rendered so far (cache misses)
+        parking_lot.events.subscribe(self._on_event)
+
+    def close(self):
+        """Stop listening to domain events."""
+        self.parking_lot.events.unsubscribe(self._on_event)
+
+    # ---------------- Invalidation ----------------
+    def _on_event(self, event):
+        event_type = event["type"]
+        if event_type in _OCCUPANCY_EVENTS:
+            self.invalidate((event["city_name"], event["site_name"], event["level_number"]))
+        elif event_type in _CHARGING_EVENTS:
+            level = self.parking_lot._find_level_by_charger(event["charger_id"])
+            if level:
+                self.invalidate((level.city_name, level.site_name, level.level_number), CHARGE)
+
+    def invalidate(self, key=None, kind=None):
+        """
+        Mark a level dirty (every level if key is None), for one report kind
+        or for both.
+        """
+        with self._lock:
+            if key is None:
+                self._epoch += 1
+                self._sections.clear()
+                return
+            self._versions[key] = self._versions.get(key, 0) + 1
+            if kind is None:
+                self._sections.pop(key, None)
+            else:
+                self._sections.get(key, {}).pop(kind, None)
+
+    # ---------------- Reports ----------------
+    def _levels(self, occupied_field):
+        """Yield (key, level) for every level with occupied_field > 0, in display order."""
+        for city in list(self.parking_lot.cities.values()):
+            if not getattr(city.counters, occupied_field):
+                continue
+            for site in list(city.sites.values()):
+                if not getattr(site.counters, occupied_field):
+                    continue
+                for level in list(site.levels.values()):
+                    if getattr(level.counters, occupied_field):
+                        yield (level.city_name, level.site_name, level.level_number), level
+
+    def _section(self, kind, key, level, render, cacheable=True):
+        with self._lock:
+            text = self._sections.get(key, {}).get(kind)
+            version = (self._epoch, self._versions.get(key, 0))
+        if text is not None:
+            return text
+        text = render(level)
+        self.renders += 1
+        if cacheable:
+            with self._lock:
+                if version == (self._epoch, self._versions.get(key, 0)):
+                    self._sections.setdefault(key, {})[kind] = text
+        return text
+
+    def status_report(self):
+        """Return the occupied-slot listing of every non-empty level ("" if all are empty)."""
+        return "".join(
+            self._section(STATUS, key, level, self._render_status)
+            for key, level in self._levels("occupied")
+        )
+
+    def charge_report(self):
+        """Return the charge table of every parked EV, or "" if no EV is parked."""
+        rows = "".join(
+            self._section(CHARGE, key, level, self._render_charge,
+                          cacheable=not level.counters.charging)
+            for key, level in self._levels("ev_occupied")
+        )
+        return CHARGE_HEADER + rows if rows else ""
+
+    # ---------------- Rendering ----------------
+    @staticmethod
+    def _vehicle_lines(level, is_ev):
+        return [
+            f"{slot}\t{v.get_regnum()}\t{v.get_color()}\t{v.get_make()}\t{v.get_model()}\n"
+            for slot, v in level.iter_vehicles(is_ev)
+        ]
+
+    def _render_status(self, level):
+        lines = [
+            f"\nCity: {level.city_name}, Site: {level.site_name}, Level: {level.level_number}\n",
+            "Regular Vehicles:\n",
+            "Slot\tReg No.\tColor\tMake\tModel\n",
+        ]
+        lines += self._vehicle_lines(level, False)
+        lines += ["Electric Vehicles:\n", "Slot\tReg No.\tColor\tMake\tModel\n"]
+        lines += self._vehicle_lines(level, True)
+        return "".join(lines)
+
+    def _render_charge(self, level):
+        lines = []
+        for info in self.app_service.get_ev_charge_status(level.city_name, level.site_name, level.level_number):
+            start_time_raw = info.get("start_time")
+            if start_time_raw:
+                start_time = datetime.fromisoformat(start_time_raw).strftime("%Y-%m-%d %H:%M")
+            else:
+                start_time = "-"
+            lines.append(
+                f"{level.city_name:12} {level.site_name:8} {level.level_number:<5} {info['slot']:<5} "
+                f"{info['regnum']:10} {info.get('charge_status', 'waiting'):10} "
+                f"{info.get('charger_id') or '-':8} {info.get('kwh_delivered', 0.0):5.2f} "
+                f"{info.get('charge_percent', 0.0):5.2f}% {start_time:16}\n"
+            )
+        return "".join(lines)
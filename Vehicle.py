@@ -1,4 +1,6 @@
 class Vehicle:
+    __slots__ = ("regnum", "make", "model", "color")
+
     def __init__(self, regnum: str, make: str, model: str, color: str):
         self.regnum = regnum
         self.make = make
@@ -29,16 +31,20 @@ class Vehicle:
         return self.__class__.__name__
 
 class Car(Vehicle):
+    __slots__ = ()
+
     def getType(self):
         return self.__class__.__name__
 
 class Truck(Vehicle):
+    __slots__ = ()
 
     def getType(self):
         return self.__class__.__name__
 
 
 class Motorcycle(Vehicle):
+    __slots__ = ()
 
     def getType(self):
         return self.__class__.__name__
@@ -46,6 +52,7 @@ class Motorcycle(Vehicle):
         return True
 
 class Bus(Vehicle):
+    __slots__ = ()
 
     def getType(self):
         return self.__class__.__name__
\ No newline at end of file
@@ -0,0 +1,70 @@
+"""
+Scalar ExitBillingService.calculate_total loop vs calculate_batch.
+
+Run from the repository root:
+    python -m benchmarks.bench_billing [count]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+
+from BillManager import ExitBillingService, np
+from Vehicle import Car
+from ElectricVehicle import ElectricCar
+
+
+def make_sessions(count, seed=42):
+    """Return (start_times, end_times, kwh, is_ev) lists for count random sessions."""
+    rng = random.Random(seed)
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    start_times = [base + timedelta(seconds=rng.randrange(30 * 86400)) for _ in range(count)]
+    end_times = [s + timedelta(seconds=rng.randrange(60, 48 * 3600)) for s in start_times]
+    kwh = [round(rng.uniform(0, 75), 3) for _ in range(count)]
+    is_ev = [rng.random() < 0.3 for _ in range(count)]
+    return start_times, end_times, kwh, is_ev
+
+
+def main(count=200_000):
+    billing = ExitBillingService()
+    start_times, end_times, kwh, is_ev = make_sessions(count)
+    car, ev_car = Car("R", "M", "M", "C"), ElectricCar("R", "M", "M", "C")
+
+    t0 = time.perf_counter()
+    scalar = [
+        billing.calculate_total(ev_car if ev else car, s, e, k)["total"]
+        for s, e, k, ev in zip(start_times, end_times, kwh, is_ev)
+    ]
+    scalar_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batch = billing.calculate_batch(start_times, end_times, kwh, is_ev)
+    batch_s = time.perf_counter() - t0
+
+    results = {
+        "count": count,
+        "numpy": np is not None,
+        "scalar_seconds": round(scalar_s, 4),
+        "batch_seconds_from_datetimes": round(batch_s, 4),
+    }
+
+    if np is not None:
+        # Reconciliation jobs usually load timestamps straight into datetime64 columns
+        start64 = np.array([s.replace(tzinfo=None) for s in start_times], dtype="datetime64[us]")
+        end64 = np.array([e.replace(tzinfo=None) for e in end_times], dtype="datetime64[us]")
+        kwh_arr, is_ev_arr = np.array(kwh), np.array(is_ev)
+        t0 = time.perf_counter()
+        billing.calculate_batch(start64, end64, kwh_arr, is_ev_arr)
+        results["batch_seconds_from_datetime64"] = round(time.perf_counter() - t0, 4)
+        results["speedup_datetime64"] = round(scalar_s / results["batch_seconds_from_datetime64"], 1)
+
+    results["speedup_datetimes"] = round(scalar_s / batch_s, 1)
+    results["matches_scalar"] = list(map(float, batch["total"])) == scalar
+
+    for key, value in results.items():
+        print(f"{key:32} {value}")
+    return results
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,110 @@
+"""
+Charger utilization of the static slot -> charger mapping against pooled
+chargers on the same arrival and departure stream.
+
+One level of EV slots is driven through simulated time in 5-minute steps:
+EVs arrive (Poisson), park in the lowest free slot and leave after a
+random stay, whether or not they are full. Every step samples how many
+chargers are delivering energy. With the static mapping an EV waits for
+"its" charger even while others are idle; pooled chargers serve the
+level-wide queue.
+
+Run from the repository root:
+    python -m benchmarks.bench_charger_pooling [ev_slots] [chargers] [hours]
+"""
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+
+from ParkingLot import ParkingLot
+from ParkingApplicationService import ParkingApplicationService
+
+STEP = timedelta(minutes=5)
+STAY_HOURS = (1.0, 10.0)
+OCCUPANCY = 0.8  # target share of EV slots in use
+SEED = 42
+
+
+def simulate(pooled, ev_slots, chargers, hours):
+    rng = random.Random(SEED)
+    now = [datetime(2026, 1, 1, tzinfo=timezone.utc)]
+    app_service = ParkingApplicationService(ParkingLot(), clock=lambda: now[0])
+    app_service.make_lot(0, ev_slots, 1, "Main", "Boston", chargers, pooled_chargers=pooled)
+    controller = app_service.charger_controller
+
+    arrived_at, waits, delivered = {}, [], [0.0]
+
+    def on_event(event):
+        if event["type"] == "charging_started" and event["regnum"] in arrived_at:
+            waits.append(event["ts"] - arrived_at.pop(event["regnum"]))
+        elif event["type"] in ("charging_full", "charging_stopped"):
+            delivered[0] += event["kwh_delivered"]
+
+    app_service.parking_lot.events.subscribe(on_event)
+
+    mean_stay = sum(STAY_HOURS) / 2
+    arrivals_per_step = ev_slots * OCCUPANCY / mean_stay * STEP.total_seconds() / 3600
+    departures = []  # (leave time, slot)
+    arrived = turned_away = 0
+    busy_samples = 0
+    steps = int(hours * 3600 / STEP.total_seconds())
+
+    for _ in range(steps):
+        now[0] += STEP
+        app_service.process_charging_events()
+        for leave in [d for d in departures if d[0] <= now[0]]:
+            departures.remove(leave)
+            app_service.remove_vehicle_and_process("Boston", "Main", 1, leave[1], True)
+        # Poisson arrivals by inversion of exponential inter-arrival gaps
+        t = rng.expovariate(arrivals_per_step)
+        while t < 1.0:
+            regnum = f"EV{arrived:06d}"
+            arrived += 1
+            # Recorded before parking: an EV may be plugged in during the call
+            arrived_at[regnum] = now[0].timestamp()
+            ok, _, slot = app_service.park_vehicle_and_assign(
+                "Boston", "Main", 1, regnum, "Kia", "EV6", "White", True, False
+            )
+            if ok:
+                departures.append((now[0] + timedelta(hours=rng.uniform(*STAY_HOURS)), slot))
+            else:
+                arrived_at.pop(regnum, None)
+                turned_away += 1
+            t += rng.expovariate(arrivals_per_step)
+        busy_samples += sum(1 for session in list(controller.charger_usage.values())
+                            if session.status == "charging")
+
+    delivered_kwh = delivered[0] + sum(
+        controller.get_session_kwh(charger_id) for charger_id in list(controller.charger_usage)
+    )
+    waits.sort()
+    return {
+        "utilization": busy_samples / (steps * chargers),
+        "kwh_per_charger_hour": delivered_kwh / (chargers * hours),
+        "served": len(waits),
+        "never_served": arrived - turned_away - len(waits),
+        "turned_away": turned_away,
+        "median_wait_min": waits[len(waits) // 2] / 60 if waits else 0.0,
+    }
+
+
+def main(ev_slots=40, chargers=20, hours=72):
+    static = simulate(False, ev_slots, chargers, hours)
+    pooled = simulate(True, ev_slots, chargers, hours)
+    print(f"level                   {ev_slots} EV slots, {chargers} chargers, {hours} h")
+    print(f"{'':24}{'static':>10}{'pooled':>10}")
+    for key, label, fmt in (
+        ("utilization", "charger utilization", "{:.1%}"),
+        ("kwh_per_charger_hour", "kWh per charger-hour", "{:.2f}"),
+        ("served", "EVs served", "{}"),
+        ("never_served", "EVs never plugged in", "{}"),
+        ("median_wait_min", "median wait served (min)", "{:.0f}"),
+    ):
+        print(f"{label:24}{fmt.format(static[key]):>10}{fmt.format(pooled[key]):>10}")
+    return static, pooled
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 40, int(args[1]) if len(args) > 1 else 20,
+         float(args[2]) if len(args) > 2 else 72)
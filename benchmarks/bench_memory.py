@@ -0,0 +1,106 @@
+"""
+Memory comparisons:
+- slotted domain records against plain __dict__ objects
+- list-backed Level against array-backed CompactLevel on a full 10k-slot level
+
+Run from the repository root:
+    python -m benchmarks.bench_memory [count]
+"""
+import sys
+import tracemalloc
+from datetime import datetime, timezone
+
+from ChargerController import ChargingSession
+from ParkingEntities import Level, CompactLevel
+from vehicle_factory import VehicleFactory
+
+
+# ---------------- Unslotted equivalents (previous layout) ----------------
+class DictEVBehavior:
+    def __init__(self, battery_capacity_kwh):
+        self.battery_capacity_kwh = battery_capacity_kwh
+        self.charge_kwh = 0.0
+        self.kwh_delivered_this_session = 0.0
+
+
+class DictElectricCar:
+    def __init__(self, regnum, make, model, color, battery_capacity_kwh=60):
+        self.regnum = regnum
+        self.make = make
+        self.model = model
+        self.color = color
+        self.ev_behavior = DictEVBehavior(battery_capacity_kwh)
+
+
+def dict_session(vehicle, slot, now):
+    return {
+        "session_id": f"S-{vehicle.regnum}",
+        "vehicle": vehicle,
+        "vehicle_reg": vehicle.regnum,
+        "slot": slot,
+        "start_time": now,
+        "last_update": now,
+        "kwh_delivered": 0.0,
+        "status": "charging"
+    }
+
+
+def measure(build, count):
+    """Return bytes allocated per item by build(i) for count items."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [build(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del items
+    return (after - before) / count
+
+
+def measure_level(level_cls, num_slots, regnums):
+    """Return bytes per parked vehicle for a full level, including its search indexes."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    level = level_cls("Boston", "BST1", 1, num_slots, 0, 0)
+    for i in range(num_slots):
+        level.park_vehicle(VehicleFactory.create_vehicle(regnums[i], "Toyota", "Camry", "White"))
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / num_slots
+
+
+def main(count=100_000):
+    now = datetime.now(timezone.utc).isoformat()
+    regnums = [f"REG{i:07d}" for i in range(count)]  # shared by both layouts
+
+    def dict_ev(i):
+        vehicle = DictElectricCar(regnums[i], "BYD", "e2", "Gray")
+        return vehicle, dict_session(vehicle, i + 1, now)
+
+    def slotted_ev(i):
+        vehicle = VehicleFactory.create_vehicle(regnums[i], "BYD", "e2", "Gray", ev=True)
+        return vehicle, ChargingSession(vehicle, i + 1, now, 7, i)
+
+    results = {
+        "count": count,
+        "dict_bytes_per_ev_with_session": round(measure(dict_ev, count), 1),
+        "slotted_bytes_per_ev_with_session": round(measure(slotted_ev, count), 1),
+    }
+    results["reduction"] = round(
+        1 - results["slotted_bytes_per_ev_with_session"] / results["dict_bytes_per_ev_with_session"], 3
+    )
+
+    num_slots = 10_000
+    level_regnums = [f"LVL{i:07d}" for i in range(num_slots)]
+    results["level_bytes_per_vehicle"] = round(measure_level(Level, num_slots, level_regnums), 1)
+    results["compact_level_bytes_per_vehicle"] = round(measure_level(CompactLevel, num_slots, level_regnums), 1)
+    results["level_reduction"] = round(
+        1 - results["compact_level_bytes_per_vehicle"] / results["level_bytes_per_vehicle"], 3
+    )
+
+    for key, value in results.items():
+        print(f"{key:36} {value}")
+    return results
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
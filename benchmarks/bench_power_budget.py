@@ -0,0 +1,112 @@
+"""
+Energy delivered under a site power cap: a fixed per-charger split against
+the budget allocation policies on the same arrival and departure stream.
+
+One level of EV slots is driven through simulated time in 5-minute steps:
+EVs arrive (Poisson) with a known departure time, park in the lowest free
+slot and leave at that time, full or not; an EV counts as served if it
+leaves with at least SERVED_KWH. The "fixed split" baseline rates
+every charger at cap / chargers, as a site without an allocator would be
+wired; the policies hand power left unused by idle chargers and small
+sessions to the others.
+
+Run from the repository root:
+    python -m benchmarks.bench_power_budget [ev_slots] [chargers] [cap_kw] [hours]
+"""
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+
+import Config
+from ParkingLot import ParkingLot
+from ParkingApplicationService import ParkingApplicationService
+from PowerBudget import POLICIES
+
+STEP = timedelta(minutes=5)
+STAY_HOURS = (1.0, 10.0)
+OCCUPANCY = 0.8  # target share of EV slots in use
+SERVED_KWH = 20.0  # energy an EV must leave with to count as served
+SEED = 42
+
+
+def simulate(policy, ev_slots, chargers, cap_kw, hours):
+    """Run one policy (None: fixed split) and return its summary figures."""
+    rng = random.Random(SEED)
+    now = [datetime(2026, 1, 1, tzinfo=timezone.utc)]
+    app_service = ParkingApplicationService(ParkingLot(), clock=lambda: now[0])
+    app_service.make_lot(0, ev_slots, 1, "Main", "Boston", chargers)
+    if policy is not None:
+        app_service.set_site_power_budget("Boston", "Main", cap_kw, policy)
+    controller = app_service.charger_controller
+
+    delivered, session_kwh = [0.0], {}
+
+    def on_event(event):
+        if event["type"] in ("charging_full", "charging_stopped"):
+            delivered[0] += event["kwh_delivered"]
+            session_kwh[event["regnum"]] = event["kwh_delivered"]
+
+    app_service.parking_lot.events.subscribe(on_event)
+
+    mean_stay = sum(STAY_HOURS) / 2
+    arrivals_per_step = ev_slots * OCCUPANCY / mean_stay * STEP.total_seconds() / 3600
+    departures = []  # (leave time, slot, regnum)
+    arrived = 0
+    left_kwh = []
+    steps = int(hours * 3600 / STEP.total_seconds())
+
+    for _ in range(steps):
+        now[0] += STEP
+        app_service.process_charging_events()
+        for leave in [d for d in departures if d[0] <= now[0]]:
+            departures.remove(leave)
+            app_service.remove_vehicle_and_process("Boston", "Main", 1, leave[1], True)
+            left_kwh.append(session_kwh.pop(leave[2], 0.0))
+        # Poisson arrivals by inversion of exponential inter-arrival gaps
+        t = rng.expovariate(arrivals_per_step)
+        while t < 1.0:
+            departure = now[0] + timedelta(hours=rng.uniform(*STAY_HOURS))
+            regnum = f"EV{arrived:06d}"
+            arrived += 1
+            ok, _, slot = app_service.park_vehicle_and_assign(
+                "Boston", "Main", 1, regnum, "Kia", "EV6", "White", True, False,
+                departure_time=departure
+            )
+            if ok:
+                departures.append((departure, slot, regnum))
+            t += rng.expovariate(arrivals_per_step)
+
+    delivered_kwh = delivered[0] + sum(
+        controller.get_session_kwh(charger_id) for charger_id in list(controller.charger_usage)
+    )
+    return {
+        "kwh_per_hour": delivered_kwh / hours,
+        "cap_used": delivered_kwh / (cap_kw * hours),
+        "median_kwh": sorted(left_kwh)[len(left_kwh) // 2] if left_kwh else 0.0,
+        "served": sum(1 for kwh in left_kwh if kwh >= SERVED_KWH) / len(left_kwh) if left_kwh else 0.0,
+    }
+
+
+def main(ev_slots=40, chargers=20, cap_kw=60.0, hours=72):
+    rated_kw = Config.CHARGER_RATE_KW
+    Config.CHARGER_RATE_KW = cap_kw / chargers
+    try:
+        results = {"fixed split": simulate(None, ev_slots, chargers, cap_kw, hours)}
+    finally:
+        Config.CHARGER_RATE_KW = rated_kw
+    for policy in POLICIES:
+        results[policy] = simulate(policy, ev_slots, chargers, cap_kw, hours)
+
+    print(f"site                    {ev_slots} EV slots, {chargers} x {rated_kw} kW chargers, "
+          f"{cap_kw:g} kW cap, {hours} h")
+    print(f"{'':20}{'kWh/h':>10}{'cap used':>10}{'median kWh':>12}{'served':>9}")
+    for name, row in results.items():
+        print(f"{name:20}{row['kwh_per_hour']:>10.1f}{row['cap_used']:>10.1%}"
+              f"{row['median_kwh']:>12.1f}{row['served']:>9.1%}")
+    return results
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 40, int(args[1]) if len(args) > 1 else 20,
+         float(args[2]) if len(args) > 2 else 60.0, float(args[3]) if len(args) > 3 else 72)
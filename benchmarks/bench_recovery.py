@@ -0,0 +1,95 @@
+"""
+Recovery time of ParkingPersistence for a large fleet: journal replay only,
+snapshot load after PersistenceManager.snapshot(), and time until the
+mmap'ed snapshot answers its first occupancy query.
+
+Run from the repository root:
+    python -m benchmarks.bench_recovery [vehicles]
+"""
+import sys
+import tempfile
+import time
+
+from ParkingLot import ParkingLot
+from ParkingApplicationService import ParkingApplicationService
+from ParkingPersistence import PersistenceManager
+
+SITES = 10
+EV_SHARE = 0.1
+
+
+def populate(app_service, vehicles):
+    """Create SITES single-level sites and park `vehicles` cars through park_many."""
+    per_site = vehicles // SITES
+    num_ev = int(per_site * EV_SHARE)
+    for s in range(SITES):
+        app_service.make_lot(per_site - num_ev, num_ev, 1, f"S{s}", "Boston", max(1, num_ev // 10))
+    requests = [
+        {
+            "city_name": "Boston",
+            "site_name": f"S{i % SITES}",
+            "level_number": 1,
+            "reg": f"REG{i:07d}",
+            "make": "Toyota",
+            "model": "Camry",
+            "color": "White",
+            "ev_car": (i // SITES) % per_site < num_ev
+        }
+        for i in range(per_site * SITES)
+    ]
+    app_service.park_many(requests)
+
+
+def recover(directory):
+    app_service = ParkingApplicationService(ParkingLot())
+    manager = PersistenceManager(app_service, directory)
+    t0 = time.perf_counter()
+    summary = manager.recover()
+    elapsed = time.perf_counter() - t0
+    manager.close()
+    return elapsed, summary
+
+
+def main(vehicles=100_000):
+    with tempfile.TemporaryDirectory() as directory:
+        app_service = ParkingApplicationService(ParkingLot())
+        manager = PersistenceManager(app_service, directory, snapshot_every=10 ** 9)
+        manager.recover()
+
+        t0 = time.perf_counter()
+        populate(app_service, vehicles)
+        manager.commit()
+        journal_write_s = time.perf_counter() - t0
+
+        journal_recovery_s, summary = recover(directory)
+
+        t0 = time.perf_counter()
+        manager.snapshot()
+        snapshot_write_s = time.perf_counter() - t0
+        manager.close()
+
+        snapshot_recovery_s, _ = recover(directory)
+
+        t0 = time.perf_counter()
+        view = PersistenceManager(None, directory).open_snapshot()
+        view.get_occupancy("Boston", "S0", 1)
+        view.get_vehicle_in_slot("Boston", "S0", 1, 1)
+        snapshot_attach_s = time.perf_counter() - t0
+        view.close()
+
+    results = {
+        "vehicles": summary["vehicles"],
+        "charging_sessions": summary["sessions"],
+        "journaled_park_seconds": round(journal_write_s, 3),
+        "journal_replay_recovery_seconds": round(journal_recovery_s, 3),
+        "snapshot_write_seconds": round(snapshot_write_s, 3),
+        "snapshot_recovery_seconds": round(snapshot_recovery_s, 3),
+        "snapshot_attach_first_query_ms": round(snapshot_attach_s * 1000, 3),
+    }
+    for key, value in results.items():
+        print(f"{key:34} {value}")
+    return results
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,148 @@
+"""
+Load generator for ParkingServer: concurrent keep-alive connections, each
+pipelining park requests and then the matching removes, reporting
+throughput and p50/p99 latency.
+
+Starts a local server subprocess unless --port points at a running one.
+
+Run from the repository root:
+    python -m benchmarks.bench_server [--connections 32] [--depth 8] [--rounds 50]
+"""
+import argparse
+import asyncio
+import json
+import re
+import subprocess
+import sys
+import time
+
+
+async def read_response(reader):
+    """Read one HTTP response; returns (status, decoded JSON body)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Server closed the connection")
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+def encode_request(method, path, payload=None):
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    head = f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Length: {len(body)}\r\n\r\n"
+    return head.encode("latin-1") + body
+
+
+async def pipelined(reader, writer, requests, latencies, statuses):
+    """Write requests back to back, then read the responses in order."""
+    sent = time.perf_counter()
+    writer.write(b"".join(requests))
+    await writer.drain()
+    for _ in requests:
+        status, _ = await read_response(reader)
+        latencies.append(time.perf_counter() - sent)
+        statuses[status] = statuses.get(status, 0) + 1
+
+
+async def connection(host, port, index, args, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for round_no in range(args.rounds):
+            plates = [f"C{index}R{round_no}D{d}" for d in range(args.depth)]
+            await pipelined(reader, writer, [
+                encode_request("POST", "/park", {
+                    "city_name": "Boston", "site_name": f"S{index % args.sites}", "level_number": 1,
+                    "reg": plate, "make": "Toyota", "model": "Camry", "color": "White",
+                    "ev_car": d % 5 == 0
+                })
+                for d, plate in enumerate(plates)
+            ], latencies, statuses)
+            await pipelined(reader, writer, [
+                encode_request("POST", "/remove", {"regnum": plate}) for plate in plates
+            ], latencies, statuses)
+    finally:
+        writer.close()
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def start_server(args):
+    server = subprocess.Popen(
+        [sys.executable, "ParkingServer.py", "--port", "0", "--max-inflight", str(args.max_inflight)],
+        stdout=subprocess.PIPE, text=True
+    )
+    for line in server.stdout:
+        match = re.search(r"http://([\d.]+):(\d+)", line)
+        if match:
+            return server, match.group(1), int(match.group(2))
+    raise RuntimeError("Server did not start")
+
+
+async def run(host, port, args):
+    reader, writer = await asyncio.open_connection(host, port)
+    for s in range(args.sites):
+        writer.write(encode_request("POST", "/lots", {
+            "num_regular": 2000, "num_ev": 500, "levels": 1,
+            "site_name": f"S{s}", "city_name": "Boston", "chargers": 50
+        }))
+        await writer.drain()
+        await read_response(reader)
+    writer.close()
+
+    latencies, statuses = [], {}
+    t0 = time.perf_counter()
+    await asyncio.gather(*(
+        connection(host, port, i, args, latencies, statuses) for i in range(args.connections)
+    ))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+
+    results = {
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        "statuses": statuses,
+    }
+    for key, value in results.items():
+        print(f"{key:22} {value}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="Use a running server instead of starting one")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--depth", type=int, default=8, help="Requests pipelined per batch")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--sites", type=int, default=4)
+    parser.add_argument("--max-inflight", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    server = None
+    host, port = args.host, args.port
+    if port is None:
+        server, host, port = start_server(args)
+    try:
+        return asyncio.run(run(host, port, args))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Gate-burst throughput: one in-process ParkingApplicationService against a
+ShardRouter with cities spread over worker processes.
+
+Each round parks a burst of vehicles in every city with park_many and
+then removes them with remove_many.
+
+Run from the repository root:
+    python -m benchmarks.bench_sharding [shards] [vehicles_per_city]
+"""
+import sys
+import time
+
+from ParkingLot import ParkingLot
+from ParkingApplicationService import ParkingApplicationService
+from ParkingShards import ShardRouter
+
+CITIES = ("Boston", "Denver", "Austin", "Miami", "Seattle", "Chicago", "Phoenix", "Atlanta")
+ROUNDS = 5
+
+
+def run(target, per_city):
+    for city in CITIES:
+        target.make_lot(per_city, per_city // 4, 1, "Main", city, max(1, per_city // 40))
+    t0 = time.perf_counter()
+    operations = 0
+    for round_no in range(ROUNDS):
+        park = [
+            {"city_name": city, "site_name": "Main", "level_number": 1,
+             "reg": f"{city[:3]}{round_no}-{i}", "make": "Toyota", "model": "Camry",
+             "color": "White", "ev_car": i % 5 == 0}
+            for city in CITIES for i in range(per_city)
+        ]
+        parked = target.park_many(park)
+        removed = target.remove_many([
+            {"city_name": request["city_name"], "site_name": "Main", "level_number": 1,
+             "slot_number": slot, "is_ev": request["ev_car"]}
+            for request, (ok, _, slot) in zip(park, parked) if ok
+        ])
+        operations += len(parked) + len(removed)
+    return operations / (time.perf_counter() - t0)
+
+
+def main(shards=4, per_city=5_000):
+    single = run(ParkingApplicationService(ParkingLot()), per_city)
+    with ShardRouter(num_shards=shards) as router:
+        sharded = run(router, per_city)
+    print(f"cities                  {len(CITIES)}")
+    print(f"single process ops/s    {single:,.0f}")
+    print(f"{shards} shards ops/s         {sharded:,.0f}")
+    print(f"speedup                 {sharded / single:.2f}x")
+    return single, sharded
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 4, int(args[1]) if len(args) > 1 else 5_000)
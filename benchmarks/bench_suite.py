@@ -0,0 +1,227 @@
+"""
+Scaling benchmark suite over synthetic fleets (see benchmarks/fleet.py).
+
+For every scale a fresh fleet is built and these operations are timed
+call by call:
+    park_vehicle_and_assign     fills the fleet to --fill
+    find_slots_by_*             random regnum / color / make / model queries
+    get_ev_charge_status        every level (up to --max-levels)
+    remove_vehicle_and_process  random parked vehicles, billing included
+    calculate_total             ExitBillingService, per vehicle
+    calculate_batch             ExitBillingService, one batch of the same sessions
+
+Each operation reports count, ops/s and mean / p50 / p90 / p99 / max
+latency in microseconds. Results are written as JSON for comparison
+between releases.
+
+Run from the repository root:
+    python -m benchmarks.bench_suite [--scales 1k,100k,1m] [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from ParkingLot import ParkingLot
+from ParkingApplicationService import ParkingApplicationService
+from benchmarks.fleet import FleetSpec
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+SEARCH_ATTRS = ("regnum", "color", "make", "model")
+
+
+def summarize(latencies_ns):
+    """Return count, throughput and latency percentiles (µs) of per-call timings."""
+    count = len(latencies_ns)
+    if not count:
+        return {"count": 0}
+    ordered = sorted(latencies_ns)
+    total_s = sum(ordered) / 1e9
+
+    def pct(q):
+        return round(ordered[min(count - 1, int(q * count))] / 1000, 2)
+
+    return {
+        "count": count,
+        "total_seconds": round(total_s, 4),
+        "ops_per_second": round(count / total_s) if total_s else None,
+        "mean_us": round(total_s * 1e6 / count, 2),
+        "p50_us": pct(0.50),
+        "p90_us": pct(0.90),
+        "p99_us": pct(0.99),
+        "max_us": round(ordered[-1] / 1000, 2),
+    }
+
+
+def timed(calls):
+    """Run each zero-argument callable in calls; returns (per-call ns timings, results)."""
+    clock = time.perf_counter_ns
+    latencies, results = [], []
+    for call in calls:
+        t0 = clock()
+        result = call()
+        latencies.append(clock() - t0)
+        results.append(result)
+    return latencies, results
+
+
+def max_rss_mb():
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_scale(name, spec, args):
+    rng = random.Random(args.seed)
+    # Charging clock; moved two hours ahead after parking so sessions have progressed
+    opened = datetime.now(timezone.utc)
+    now = [opened]
+    app_service = ParkingApplicationService(ParkingLot(), clock=lambda: now[0])
+    parking_lot = app_service.parking_lot
+
+    t0 = time.perf_counter()
+    level_keys = spec.build(app_service)
+    build_s = time.perf_counter() - t0
+    operations = {}
+
+    # ---- park ----
+    requests = list(spec.vehicles())
+    latencies, results = timed(
+        (lambda r=r: app_service.park_vehicle_and_assign(
+            r["city_name"], r["site_name"], r["level_number"], r["reg"],
+            r["make"], r["model"], r["color"], r["ev_car"], r["motor"]))
+        for r in requests
+    )
+    operations["park_vehicle_and_assign"] = summarize(latencies)
+    operations["park_vehicle_and_assign"]["failed"] = sum(1 for ok, _, _ in results if not ok)
+    parked = [(r, slot) for r, (ok, _, slot) in zip(requests, results) if ok]
+    now[0] = opened + timedelta(hours=2)
+
+    # ---- searches ----
+    for attr in SEARCH_ATTRS:
+        finder = getattr(parking_lot, f"find_slots_by_{attr}")
+        queries = []
+        for _ in range(args.queries):
+            r, _ = rng.choice(parked)
+            queries.append((r["city_name"], r["site_name"], r["level_number"], r[attr if attr != "regnum" else "reg"]))
+        latencies, _ = timed((lambda q=q: finder(*q)) for q in queries)
+        operations[f"find_slots_by_{attr}"] = summarize(latencies)
+
+    # ---- charge status ----
+    keys = level_keys[:args.max_levels]
+    latencies, rows = timed(
+        (lambda k=k: app_service.get_ev_charge_status(*k)) for k in keys
+    )
+    operations["get_ev_charge_status"] = summarize(latencies)
+    operations["get_ev_charge_status"]["evs_reported"] = sum(len(r) for r in rows)
+
+    # ---- billing (of the vehicles about to leave) ----
+    leaving = rng.sample(parked, min(args.removals, len(parked)))
+    sessions = []
+    for r, slot in leaving:
+        level = parking_lot.get_level(r["city_name"], r["site_name"], r["level_number"])
+        vehicle = level.get_vehicle(slot, r["ev_car"])
+        start_time = level.get_start_time(slot, r["ev_car"])
+        sessions.append((vehicle, start_time, start_time + timedelta(hours=2), 10.0))
+    billing = app_service.billing_service
+    latencies, _ = timed(
+        (lambda s=s: billing.calculate_total(*s)) for s in sessions
+    )
+    operations["calculate_total"] = summarize(latencies)
+    t0 = time.perf_counter()
+    billing.calculate_batch(
+        [s[1] for s in sessions], [s[2] for s in sessions],
+        [s[3] for s in sessions], [s[0].is_ev() for s in sessions]
+    )
+    batch_s = time.perf_counter() - t0
+    operations["calculate_batch"] = {
+        "count": len(sessions),
+        "total_seconds": round(batch_s, 4),
+        "ops_per_second": round(len(sessions) / batch_s) if batch_s else None,
+    }
+
+    # ---- remove ----
+    latencies, results = timed(
+        (lambda r=r, slot=slot: app_service.remove_vehicle_and_process(
+            r["city_name"], r["site_name"], r["level_number"], slot, r["ev_car"]))
+        for r, slot in leaving
+    )
+    operations["remove_vehicle_and_process"] = summarize(latencies)
+    operations["remove_vehicle_and_process"]["failed"] = sum(1 for ok, _, _ in results if not ok)
+
+    return {
+        "scale": name,
+        "fleet": spec.as_dict(),
+        "vehicles_parked": len(parked),
+        "build_seconds": round(build_s, 4),
+        "operations": operations,
+        "max_rss_mb": max_rss_mb(),  # process peak so far, not just this scale
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_table(report):
+    print(f"{'scale':6} {'operation':28} {'count':>8} {'ops/s':>10} {'p50 µs':>9} {'p99 µs':>9}")
+    for result in report["results"]:
+        for op, stats in result["operations"].items():
+            print(f"{result['scale']:6} {op:28} {stats['count']:>8} "
+                  f"{stats.get('ops_per_second') or '-':>10} "
+                  f"{stats.get('p50_us', '-'):>9} {stats.get('p99_us', '-'):>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scaling benchmarks over synthetic fleets")
+    parser.add_argument("--scales", default="1k,100k,1m",
+                        help=f"Comma-separated fleet sizes from {', '.join(SCALES)} or slot counts")
+    parser.add_argument("--ev-share", type=float, default=0.2)
+    parser.add_argument("--fill", type=float, default=0.8)
+    parser.add_argument("--chargers-per-level", type=int, help="Default: one per four EV slots")
+    parser.add_argument("--queries", type=int, default=1_000, help="Searches per attribute")
+    parser.add_argument("--removals", type=int, default=10_000)
+    parser.add_argument("--max-levels", type=int, default=200, help="Levels queried for charge status")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout table only)")
+    args = parser.parse_args(argv)
+
+    report = {
+        "benchmark": "bench_suite",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": [],
+    }
+    for name in args.scales.split(","):
+        name = name.strip().lower()
+        total_slots = SCALES[name] if name in SCALES else int(name)
+        spec = FleetSpec.for_slots(total_slots, ev_share=args.ev_share, fill=args.fill,
+                                   chargers_per_level=args.chargers_per_level, seed=args.seed)
+        report["results"].append(run_scale(name, spec, args))
+
+    print_table(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Import-time budget check for the headless entry points.
+
+Each module is imported in a fresh interpreter with -X importtime (best of
+several runs) and must stay under its budget without loading tkinter.
+Exits with status 1 when a budget is exceeded or Tk is pulled in.
+
+Run from the repository root:
+    python -m benchmarks.check_import_time
+"""
+import subprocess
+import sys
+
+# module -> cumulative import budget in milliseconds
+BUDGETS_MS = {
+    "ParkingLot": 100,
+    "ParkingApplicationService": 100,
+    "ParkingCLI": 150,
+    "ParkingShards": 150,
+    "ParkingServer": 250,
+}
+RUNS = 5
+
+_PROBE = "import sys, {module}; sys.exit(3 if 'tkinter' in sys.modules else 0)"
+
+
+def measure(module):
+    """Return (best cumulative import time in ms, loaded_tkinter) for module."""
+    best = None
+    for _ in range(RUNS):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module)],
+            capture_output=True, text=True
+        )
+        if proc.returncode not in (0, 3):
+            raise RuntimeError(f"Importing {module} failed:\n{proc.stderr}")
+        for line in proc.stderr.splitlines():
+            # "import time: self [us] | cumulative | imported package"
+            parts = line.split("|")
+            if len(parts) == 3 and parts[2].strip() == module and not parts[2].startswith("  "):
+                cumulative_ms = int(parts[1]) / 1000
+                best = cumulative_ms if best is None else min(best, cumulative_ms)
+        if proc.returncode == 3:
+            return best, True
+    return best, False
+
+
+def main():
+    failures = 0
+    for module, budget in BUDGETS_MS.items():
+        try:
+            elapsed, loaded_tk = measure(module)
+        except RuntimeError as e:
+            # Last stderr line is the import error itself
+            elapsed, loaded_tk, note = None, False, f" ({str(e).strip().splitlines()[-1]})"
+        else:
+            note = " (imports tkinter)" if loaded_tk else ""
+            if elapsed is None:
+                note = " (no import timing reported)"
+        ok = elapsed is not None and elapsed <= budget and not loaded_tk
+        failures += not ok
+        shown = f"{elapsed:8.1f}" if elapsed is not None else f"{'n/a':>8}"
+        print(f"{module:28} {shown} ms  budget {budget:4d} ms  {'OK' if ok else 'FAIL'}{note}")
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
@@ -0,0 +1,148 @@
+"""
+Synthetic fleet generator for benchmarks: a configurable grid of cities,
+sites and levels plus a deterministic stream of vehicles to park in it.
+
+City and site names are chosen so every level's generated charger IDs
+(city[:3] + site[:2] + level) are unique across the fleet.
+"""
+from itertools import product
+import random
+import string
+
+import Config
+
+MAKES_MODELS = (
+    ("Toyota", "Camry"), ("Toyota", "Corolla"), ("Honda", "Civic"), ("Ford", "F-150"),
+    ("Tesla", "Model 3"), ("BYD", "Seagull"), ("BYD", "e2"), ("Kia", "EV6"),
+)
+COLORS = ("White", "Black", "Gray", "Silver", "Blue", "Red", "Green")
+MAX_LEVEL_SLOTS = 10_000
+
+
+def city_names(count):
+    """Return count city names with distinct 3-character prefixes."""
+    names = list(Config.CITY_LIST[:count])
+    names += [f"T{i:02d} City" for i in range(count - len(names))]
+    return names
+
+
+def site_names(count):
+    """Return count site names with distinct 2-character prefixes."""
+    return ["".join(pair) for pair, _ in zip(product(string.ascii_uppercase, repeat=2), range(count))]
+
+
+class FleetSpec:
+    """
+    Shape of a synthetic fleet.
+
+    Args:
+        cities (int): Number of cities.
+        sites_per_city (int): Sites in every city.
+        levels_per_site (int): Levels in every site.
+        slots_per_level (int): Regular plus EV slots per level.
+        ev_share (float): Fraction of slots and of vehicles that are EV.
+        chargers_per_level (int, optional): Defaults to one per four EV slots.
+        fill (float): Fraction of the slots the vehicle stream fills.
+        seed (int): Seed of the vehicle stream.
+    """
+
+    def __init__(self, cities=1, sites_per_city=1, levels_per_site=1, slots_per_level=1000,
+                 ev_share=0.2, chargers_per_level=None, fill=0.8, seed=42):
+        self.cities = cities
+        self.sites_per_city = sites_per_city
+        self.levels_per_site = levels_per_site
+        self.slots_per_level = slots_per_level
+        self.ev_share = ev_share
+        self.ev_slots_per_level = int(slots_per_level * ev_share)
+        self.regular_slots_per_level = slots_per_level - self.ev_slots_per_level
+        if chargers_per_level is None:
+            chargers_per_level = max(1, self.ev_slots_per_level // 4) if self.ev_slots_per_level else 0
+        self.chargers_per_level = chargers_per_level
+        self.fill = fill
+        self.seed = seed
+
+    @classmethod
+    def for_slots(cls, total_slots, **overrides):
+        """
+        Return a spec of about total_slots slots: levels of at most
+        MAX_LEVEL_SLOTS slots, up to 10 levels per site and 10 sites per city.
+        """
+        levels = max(1, -(-total_slots // MAX_LEVEL_SLOTS))
+        levels_per_site = min(levels, 10)
+        sites = -(-levels // levels_per_site)
+        sites_per_city = min(sites, 10)
+        cities = -(-sites // sites_per_city)
+        shape = {
+            "cities": cities,
+            "sites_per_city": sites_per_city,
+            "levels_per_site": levels_per_site,
+            "slots_per_level": total_slots // (cities * sites_per_city * levels_per_site),
+        }
+        shape.update(overrides)
+        return cls(**shape)
+
+    @property
+    def num_levels(self):
+        return self.cities * self.sites_per_city * self.levels_per_site
+
+    @property
+    def total_slots(self):
+        return self.num_levels * self.slots_per_level
+
+    def level_keys(self):
+        """Return (city_name, site_name, level_number) of every level."""
+        return [
+            (city_name, site_name, level_number)
+            for city_name in city_names(self.cities)
+            for site_name in site_names(self.sites_per_city)
+            for level_number in range(1, self.levels_per_site + 1)
+        ]
+
+    def build(self, app_service):
+        """Create every lot of the fleet through make_lot; returns the level keys."""
+        for city_name in city_names(self.cities):
+            for site_name in site_names(self.sites_per_city):
+                success, msg = app_service.make_lot(
+                    self.regular_slots_per_level, self.ev_slots_per_level, self.levels_per_site,
+                    site_name, city_name, self.chargers_per_level
+                )
+                if not success:
+                    raise RuntimeError(msg)
+        return self.level_keys()
+
+    def vehicles(self, count=None):
+        """
+        Yield park_many-style request dicts for count vehicles (default: fill
+        of the fleet), dealt round-robin over the levels.
+        """
+        rng = random.Random(self.seed)
+        keys = self.level_keys()
+        if count is None:
+            count = int(self.total_slots * self.fill)
+        for i in range(count):
+            city_name, site_name, level_number = keys[i % len(keys)]
+            make, model = rng.choice(MAKES_MODELS)
+            yield {
+                "city_name": city_name,
+                "site_name": site_name,
+                "level_number": level_number,
+                "reg": f"SYN{i:07d}",
+                "make": make,
+                "model": model,
+                "color": rng.choice(COLORS),
+                "ev_car": rng.random() < self.ev_share,
+                "motor": False,
+            }
+
+    def as_dict(self):
+        return {
+            "cities": self.cities,
+            "sites_per_city": self.sites_per_city,
+            "levels_per_site": self.levels_per_site,
+            "levels": self.num_levels,
+            "slots_per_level": self.slots_per_level,
+            "total_slots": self.total_slots,
+            "ev_share": self.ev_share,
+            "chargers_per_level": self.chargers_per_level,
+            "fill": self.fill,
+        }
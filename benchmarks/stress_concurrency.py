@@ -0,0 +1,272 @@
+"""
+Multithreaded stress test of parking and charging.
+
+Gate threads park and remove vehicles drawn from a shared plate pool on a
+few shared levels (plates collide on purpose), a charging thread fires
+completions on an accelerated clock, and a reader thread polls status
+without locks. A journal is written throughout. Afterwards the occupancy,
+index, charger and waiting-queue invariants are checked and the lot is
+recovered from disk and compared with the live one. The rolling occupancy
+and charge-state counters must match a recount.
+
+Exits with status 1 on any violation.
+
+Run from the repository root:
+    python -m benchmarks.stress_concurrency [gates] [seconds]
+"""
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+
+from ParkingLot import ParkingLot
+from ParkingApplicationService import ParkingApplicationService
+from ParkingPersistence import PersistenceManager
+
+CITY = "Boston"
+SITES = ("North", "South")
+LEVELS = 2
+REGULAR, EV, CHARGERS = 40, 12, 4
+SPEEDUP = 3600  # one simulated hour per real second
+
+
+class AcceleratedClock:
+    """Thread-safe clock running SPEEDUP times faster than real time; can be frozen."""
+
+    def __init__(self):
+        self._origin = datetime.now(timezone.utc)
+        self._t0 = time.monotonic()
+        self.frozen = None
+
+    def __call__(self):
+        if self.frozen is not None:
+            return self.frozen
+        return self._origin + timedelta(seconds=(time.monotonic() - self._t0) * SPEEDUP)
+
+    def freeze(self):
+        self.frozen = self()
+
+
+def build(clock):
+    return ParkingApplicationService(ParkingLot(), clock=clock)
+
+
+def iter_levels(parking_lot):
+    for city in parking_lot.cities.values():
+        for site in city.sites.values():
+            yield from site.levels.values()
+
+
+def gate(app_service, plates, seconds, seed, counts, errors):
+    rng = random.Random(seed)
+    keys = [(CITY, site, n) for site in SITES for n in range(1, LEVELS + 1)]
+    deadline = time.monotonic() + seconds
+    ops = 0
+    try:
+        while time.monotonic() < deadline:
+            reg = rng.choice(plates)
+            if rng.random() < 0.55:
+                city, site, level_number = rng.choice(keys)
+                app_service.park_vehicle_and_assign(
+                    city, site, level_number, reg, "Tesla", "3", rng.choice(("Red", "Blue")),
+                    ev_car=reg.startswith("EV"), motor=False
+                )
+            else:
+                app_service.remove_vehicle_by_regnum(reg)
+            ops += 1
+    except Exception as e:  # surfaced as a violation
+        errors.append(f"gate {seed}: {e!r}")
+    counts.append(ops)
+
+
+def charging_loop(app_service, stop, errors):
+    try:
+        while not stop.is_set():
+            app_service.process_charging_events()
+            time.sleep(0.001)
+    except Exception as e:
+        errors.append(f"charging: {e!r}")
+
+
+def reader(app_service, stop, counts, errors):
+    parking_lot = app_service.parking_lot
+    reads = 0
+    try:
+        while not stop.is_set():
+            for level in iter_levels(parking_lot):
+                if not (0 <= level.num_occupied_regular <= level.num_regular_slots
+                        and 0 <= level.num_occupied_ev <= level.num_ev_slots):
+                    errors.append(f"reader: occupancy out of range on {level.site_name}/{level.level_number}")
+                status = parking_lot.get_parking_status(level.city_name, level.site_name, level.level_number)
+                if len(status["regular"]) > level.num_regular_slots or len(status["ev"]) > level.num_ev_slots:
+                    errors.append("reader: status lists longer than the level")
+                app_service.get_ev_charge_status(level.city_name, level.site_name, level.level_number)
+                for charger_id in level.charger_ids:
+                    app_service.get_charger_status(charger_id)
+                reads += 1
+    except Exception as e:
+        errors.append(f"reader: {e!r}")
+    counts.append(reads)
+
+
+def check_pooled_chargers(level, controller):
+    """Every pooled charger is either free or plugged into the EV of its session."""
+    violations = []
+    name = f"{level.site_name}/{level.level_number}"
+    busy = {cid for cid in level.charger_ids if cid in controller.charger_usage}
+    free = set(level.free_chargers)
+    if busy & free or busy | free != set(level.charger_ids):
+        violations.append(f"{name}: free chargers {sorted(free)} but busy {sorted(busy)}")
+    for charger_id in busy:
+        if level.plugged_slots.get(charger_id) != controller.charger_usage[charger_id].slot:
+            violations.append(f"{charger_id}: not plugged into its session's slot")
+    if free:
+        for slot in level.pooled_waiting_queue:
+            vehicle = level.get_vehicle(slot, True)
+            if vehicle and not vehicle.ev_behavior.is_fully_charged():
+                violations.append(f"{name}: slot {slot} waits while {len(free)} chargers are free")
+                break
+    return violations
+
+
+def check_invariants(app_service):
+    """Return a list of invariant violations of a quiescent lot."""
+    parking_lot = app_service.parking_lot
+    controller = app_service.charger_controller
+    violations = []
+    parked = 0
+    summed = {}
+
+    for level in iter_levels(parking_lot):
+        name = f"{level.site_name}/{level.level_number}"
+        for is_ev, total, occupied, free in (
+            (False, level.num_regular_slots, level.num_occupied_regular, level.free_regular_slots),
+            (True, level.num_ev_slots, level.num_occupied_ev, level.free_ev_slots),
+        ):
+            taken = {slot for slot, _ in level.iter_vehicles(is_ev)}
+            if occupied != len(taken):
+                violations.append(f"{name}: counter {occupied} != {len(taken)} stored (ev={is_ev})")
+            free_slots = {idx + 1 for idx in free}
+            if len(free_slots) != len(free):
+                violations.append(f"{name}: duplicate free slots (ev={is_ev})")
+            if free_slots & taken or len(free_slots) + len(taken) != total:
+                violations.append(f"{name}: free heap does not complement occupancy (ev={is_ev})")
+            for slot, vehicle in level.iter_vehicles(is_ev):
+                parked += 1
+                location = parking_lot.locate_vehicle(vehicle.get_regnum())
+                if not location or (location["site_name"], location["level_number"],
+                                    location["slot_number"], location["is_ev"]) != (
+                                        level.site_name, level.level_number, slot, is_ev):
+                    violations.append(f"{name}: {vehicle.get_regnum()} location mismatch")
+                reg_slots, ev_slots = level.find_slots("regnum", vehicle.get_regnum())
+                if slot not in (ev_slots if is_ev else reg_slots):
+                    violations.append(f"{name}: {vehicle.get_regnum()} missing from search index")
+
+        states = {"charging": 0, "waiting": 0, "full": 0}
+        for row in app_service.get_ev_charge_status(level.city_name, level.site_name, level.level_number):
+            states["waiting" if row["charge_status"] == "stopped" else row["charge_status"]] += 1
+        counted = level.counters.as_dict()
+        if any(counted[state] != n for state, n in states.items()):
+            violations.append(f"{name}: charge-state counters {counted} != {states}")
+        summed.update({key: summed.get(key, 0) + value for key, value in counted.items()})
+
+        if level.pooled_chargers:
+            violations.extend(check_pooled_chargers(level, controller))
+        for charger_id, queue in level.charger_waiting_queue.items():
+            for slot in queue:
+                if level.get_vehicle(slot, True) is None:
+                    violations.append(f"{charger_id}: departed slot {slot} still queued")
+            if charger_id in controller.charger_usage:
+                continue
+            for slot in queue:
+                vehicle = level.get_vehicle(slot, True)
+                if vehicle and not vehicle.ev_behavior.is_fully_charged():
+                    violations.append(f"{charger_id}: idle while slot {slot} waits")
+
+    if parking_lot.get_occupancy() != summed:
+        violations.append("fleet occupancy counters differ from the sum of the levels")
+    if parked != len(parking_lot.vehicle_locations):
+        violations.append(f"{len(parking_lot.vehicle_locations)} plates located but {parked} parked")
+    if None in parking_lot.vehicle_locations.values():
+        violations.append("plate reservation left behind")
+
+    charging = set()
+    for charger_id, session in controller.charger_usage.items():
+        level = parking_lot._find_level_by_charger(charger_id)
+        if level.get_vehicle(session.slot, True) is not session.vehicle:
+            violations.append(f"{charger_id}: session for a vehicle that is not in slot {session.slot}")
+        if session.vehicle_reg in charging:
+            violations.append(f"{session.vehicle_reg}: charging on two chargers")
+        charging.add(session.vehicle_reg)
+    return violations
+
+
+def lot_signature(app_service):
+    parking_lot = app_service.parking_lot
+    return (
+        dict(parking_lot.vehicle_locations),
+        parking_lot.get_occupancy(),
+        {cid: s.vehicle_reg for cid, s in app_service.charger_controller.charger_usage.items()},
+    )
+
+
+def main(gates=8, seconds=5.0):
+    clock = AcceleratedClock()
+    app_service = build(clock)
+    capacity = len(SITES) * LEVELS * (REGULAR + EV)
+    plates = [f"EV{i:04d}" for i in range(capacity // 3)] + [f"CAR{i:04d}" for i in range(capacity)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        persistence = PersistenceManager(app_service, directory, snapshot_every=2_000)
+        persistence.recover()
+        for site in SITES:
+            # One site shares its chargers level-wide, the other maps them to fixed slots
+            app_service.make_lot(REGULAR, EV, LEVELS, site, CITY, CHARGERS, pooled_chargers=site == "South")
+
+        errors, gate_ops, reads = [], [], []
+        stop = threading.Event()
+        background = [
+            threading.Thread(target=charging_loop, args=(app_service, stop, errors)),
+            threading.Thread(target=reader, args=(app_service, stop, reads, errors)),
+        ]
+        gate_threads = [
+            threading.Thread(target=gate, args=(app_service, plates, seconds, seed, gate_ops, errors))
+            for seed in range(gates)
+        ]
+        t0 = time.perf_counter()
+        for thread in background + gate_threads:
+            thread.start()
+        for thread in gate_threads:
+            thread.join()
+        stop.set()
+        for thread in background:
+            thread.join()
+        elapsed = time.perf_counter() - t0
+
+        clock.freeze()
+        app_service.process_charging_events()
+        violations = errors + check_invariants(app_service)
+        persistence.close()
+
+        recovered = build(lambda: clock.frozen)
+        PersistenceManager(recovered, directory).recover()
+        if lot_signature(recovered) != lot_signature(app_service):
+            violations.append("recovered lot differs from the live lot")
+
+    print(f"gates                 {gates}")
+    print(f"gate operations/s     {sum(gate_ops) / elapsed:,.0f}")
+    print(f"lock-free status scans {sum(reads)}")
+    print(f"vehicles parked       {len(app_service.parking_lot.vehicle_locations)}")
+    print(f"charging sessions     {len(app_service.charger_controller.charger_usage)}")
+    for violation in violations[:20]:
+        print("VIOLATION:", violation)
+    print("OK" if not violations else f"{len(violations)} violation(s)")
+    return not violations
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    ok = main(int(args[0]) if args else 8, float(args[1]) if len(args) > 1 else 5.0)
+    sys.exit(0 if ok else 1)